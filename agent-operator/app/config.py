@@ -1,3 +1,34 @@
 # 공통 설정
+import os
+
 NAMESPACE = "agent-env"                # 쿠버네티스 네임스페이스
 AGENT_IMAGE = "chano01794/agent:latest"   # Jenkins가 최신 push 하는 agent 이미지
+AGENT_PORT = 8001                      # agent 컨테이너(uvicorn) 포트
+AGENT_READY_PATH = "/ready"            # agent 준비 상태 엔드포인트 (MCP 서버 연결·도구 목록 조회 완료 시 200)
+# MCP 도구 목록 캐시 (노드 단위 hostPath로 같은 노드의 agent Pod끼리 공유, 빈 값이면 마운트하지 않음)
+AGENT_TOOL_CACHE_HOST_PATH = os.getenv("AGENT_TOOL_CACHE_HOST_PATH", "/var/cache/agent-mcp-tools")
+AGENT_TOOL_CACHE_MOUNT_PATH = "/var/cache/agent/mcp-tools"   # agent의 MCP_TOOL_CACHE_DIR 기본값
+# 자격 증명이 필요 없는 MCP 서버를 제공하는 공유 gateway (빈 값이면 agent Pod 안에서 직접 실행)
+MCP_GATEWAY_URL = os.getenv("MCP_GATEWAY_URL", "http://mcp-gateway.agent-env.svc.cluster.local")
+# backend가 실행 중인 agent에 MCP 선택·환경 변수 변경을 직접 반영할 때 쓰는 토큰 (빈 값이면 항상 재배포로 반영)
+AGENT_CONTROL_TOKEN = os.getenv("AGENT_CONTROL_TOKEN", "")
+
+# 웜 풀 설정 (사용자 설정 없이 미리 띄워 둔 범용 agent Pod)
+WARM_POOL_SIZE = int(os.getenv("WARM_POOL_SIZE", "2"))                            # 유지할 대기 Pod 수 (0이면 비활성화)
+WARM_POOL_REFILL_INTERVAL = float(os.getenv("WARM_POOL_REFILL_INTERVAL", "10"))   # 풀 보충 주기 (초)
+WARM_POOL_CONFIG_TIMEOUT = float(os.getenv("WARM_POOL_CONFIG_TIMEOUT", "90"))     # runtime config 적용(MCP 연결) 대기 시간 (초, agent의 MCP 서버별 최대 제한 시간보다 길게)
+
+# 라벨/어노테이션 키
+POOL_LABEL = "agentPool"                   # 웜 풀 Pod 상태 라벨 (warm → claiming → claimed)
+CONFIG_HASH_ANNOTATION = "agentConfigHash" # 배포 설정 내용 해시
+LIVE_CONFIG_HASH_ANNOTATION = "agentLiveConfigHash"  # 재배포 없이 실행 중인 Pod에 반영된 설정 해시 (배포 설정보다 우선)
+
+# 배포 작업 큐 / Kubernetes API 클라이언트
+DEPLOY_WORKERS = int(os.getenv("DEPLOY_WORKERS", "32"))                    # 동시에 처리하는 배포 작업 수
+DEPLOY_QUEUE_SIZE = int(os.getenv("DEPLOY_QUEUE_SIZE", "500"))             # 대기 가능한 배포 작업 수 (초과 시 503)
+DEPLOY_POD_TIMEOUT = int(os.getenv("DEPLOY_POD_TIMEOUT", "120"))           # 새 Pod가 준비(MCP 연결 완료)될 때까지 대기 시간 (초)
+K8S_CONNECTION_POOL_SIZE = int(os.getenv("K8S_CONNECTION_POOL_SIZE", "64")) # API 서버 커넥션 수 (watch가 작업당 하나씩 사용)
+
+# 공유 캐시 (Deployment/Pod/Service informer)
+INFORMER_WATCH_TIMEOUT = int(os.getenv("INFORMER_WATCH_TIMEOUT", "300"))   # watch 요청 하나의 최대 유지 시간 (초, 끊기면 이어서 재개)
+INFORMER_SYNC_TIMEOUT = float(os.getenv("INFORMER_SYNC_TIMEOUT", "30"))    # 시작 시 첫 목록 조회 대기 시간 (초)
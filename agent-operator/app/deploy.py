@@ -1,18 +1,70 @@
-import asyncio
-from kubernetes import client, watch
+import hashlib, json, logging
 from datetime import datetime
-from app.config import NAMESPACE, AGENT_IMAGE
-from kubernetes import config
+from kubernetes_asyncio import client
+from app.config import (
+    NAMESPACE, AGENT_IMAGE, AGENT_PORT, POOL_LABEL, CONFIG_HASH_ANNOTATION, LIVE_CONFIG_HASH_ANNOTATION,
+    DEPLOY_POD_TIMEOUT, MCP_GATEWAY_URL, AGENT_CONTROL_TOKEN
+)
+from app.informer import cluster_cache
+from app.kube import kube
+from app.warm_pool import (
+    warm_pool, is_pod_ready, readiness_probe, tool_cache_volume, runtime_volume, agent_runtime_env, POOL_CLAIMED
+)
 
-# 클러스터 내부 설정 로드
-config.load_incluster_config()
+logger = logging.getLogger(__name__)
+
+def compute_config_hash(env_vars: list) -> str:
+    """이미지와 환경 변수(MCP_SERVICES 포함)로 배포 설정의 내용 해시를 계산합니다. 순서와 무관합니다."""
+    content = {
+        "image": AGENT_IMAGE,
+        "port": AGENT_PORT,
+        "gateway": MCP_GATEWAY_URL,
+        # 토큰이 바뀌면 이전 토큰을 가진 Pod는 설정 변경을 받을 수 없으므로 재배포
+        "control": hashlib.sha256(AGENT_CONTROL_TOKEN.encode()).hexdigest(),
+        "env": sorted([e["name"], e["value"]] for e in env_vars)
+    }
+    return hashlib.sha256(json.dumps(content, sort_keys=True).encode()).hexdigest()
+
+def _is_deployment_ready(deployment) -> bool:
+    """롤아웃이 끝났고 준비된 replica가 있는 Deployment인지 확인합니다."""
+    status = deployment.status
+    replicas = deployment.spec.replicas or 0
+    return (
+        replicas > 0
+        and (status.observed_generation or 0) >= (deployment.metadata.generation or 0)
+        and (status.updated_replicas or 0) >= replicas
+        and (status.ready_replicas or 0) >= replicas
+    )
 
 async def deploy_agent(user_id: str, env_vars: list) -> str:
     name = f"agent-{user_id}"
-    apps_v1 = client.AppsV1Api()
-    core_v1 = client.CoreV1Api()
+    config_hash = compute_config_hash(env_vars)
+
+    # 0) 같은 설정으로 이미 준비된 Pod(Deployment 또는 웜 풀에서 할당된 Pod)가 있으면 재배포 없이 반환
+    ready_pod = (
+        _find_ready_pod_with_hash(name, config_hash)
+        or _find_claimed_pod_with_hash(name, config_hash)
+        or _find_live_pod_with_hash(name, config_hash)
+    )
+    if ready_pod:
+        await _ensure_service(name)
+        logger.info(f"설정 변경 없음, 기존 Pod 재사용: {ready_pod}")
+        return ready_pod
+
+    # 설정이 바뀌었으므로 이전에 할당된 웜 풀 Pod는 폐기
+    await warm_pool.release_user_pods(user_id)
 
-    # 1) Deployment 객체 정의 (생성/업데이트 공통)
+    # 1) 웜 풀에서 대기 Pod를 할당받으면 Deployment 생성/롤링 업데이트 없이 바로 사용
+    claimed_pod = await warm_pool.claim(user_id, env_vars, config_hash)
+    if claimed_pod:
+        await _ensure_service(name)
+        # 이전 설정의 Deployment가 남아 있으면 Service가 두 Pod로 분산되지 않도록 삭제
+        await _delete_deployment(name)
+        return claimed_pod
+
+    # 2) Deployment 객체 정의 (생성/업데이트 공통) - 웜 풀 미스 시 대체 경로
+    cache_volumes, cache_mounts = tool_cache_volume()
+    runtime_volumes, runtime_mounts = runtime_volume()
     deployment = client.V1Deployment(
         metadata=client.V1ObjectMeta(name=name, labels={"app": name}),
         spec=client.V1DeploymentSpec(
@@ -29,7 +81,9 @@ async def deploy_agent(user_id: str, env_vars: list) -> str:
                 metadata=client.V1ObjectMeta(
                     labels={"app": name},
                     annotations={
-                        # 롤링 업데이트 강제 트리거용 타임스탬프
+                        # 설정이 같으면 재배포를 건너뛰기 위한 내용 해시
+                        CONFIG_HASH_ANNOTATION: config_hash,
+                        # 롤링 업데이트 강제 트리거용 타임스탬프 (실제로 재배포할 때만 바뀜)
                         "redeployTimestamp": datetime.utcnow().isoformat()
                     }
                 ),
@@ -38,78 +92,175 @@ async def deploy_agent(user_id: str, env_vars: list) -> str:
                         client.V1Container(
                             name="agent",
                             image=AGENT_IMAGE,
-                            ports=[client.V1ContainerPort(container_port=8002)],
-                            env=[client.V1EnvVar(name=e["name"], value=e["value"]) for e in env_vars],
+                            ports=[client.V1ContainerPort(container_port=AGENT_PORT)],
+                            env=[client.V1EnvVar(name=e["name"], value=e["value"]) for e in env_vars] + agent_runtime_env() + [
+                                # 사용자 설정에서 온 환경 변수 이름 (실행 중 설정 변경 시 삭제된 키를 지우는 데 사용)
+                                client.V1EnvVar(name="AGENT_USER_ENV", value=",".join(e["name"] for e in env_vars))
+                            ],
+                            readiness_probe=readiness_probe(),
+                            # 실행 중에 바뀐 설정(/control)을 컨테이너 재시작 후에도 유지
+                            volume_mounts=runtime_mounts + cache_mounts,
                         )
-                    ]
+                    ],
+                    volumes=runtime_volumes + cache_volumes
                 )
             )
         )
     )
 
-    # 2) 기존 Pod 목록 스냅샷
-    existing = await asyncio.to_thread(
-        lambda: {p.metadata.name for p in core_v1.list_namespaced_pod(
-            namespace=NAMESPACE,
-            label_selector=f"app={name}"
-        ).items}
-    )
+    # 3) 기존 Pod 목록 스냅샷 (공유 캐시)
+    existing = {p.metadata.name for p in cluster_cache.pods_with_labels({"app": name})}
 
-    # 3) Deployment 생성 또는 교체
+    # 4) Deployment 생성 또는 교체
     try:
-        await asyncio.to_thread(
-            apps_v1.replace_namespaced_deployment,
-            name=name,
-            namespace=NAMESPACE,
-            body=deployment
-        )
-        first_create = False
+        await kube.apps_v1.replace_namespaced_deployment(name=name, namespace=NAMESPACE, body=deployment)
     except client.exceptions.ApiException as e:
         if e.status == 404:
-            await asyncio.to_thread(
-                apps_v1.create_namespaced_deployment,
-                namespace=NAMESPACE,
-                body=deployment
-            )
-            first_create = True
+            await kube.apps_v1.create_namespaced_deployment(namespace=NAMESPACE, body=deployment)
         else:
             raise
 
-    # 4) 첫 생성일 때만 Service 생성
-    if first_create:
-        service = client.V1Service(
-            metadata=client.V1ObjectMeta(name=name),
-            spec=client.V1ServiceSpec(
-                selector={"app": name},
-                ports=[client.V1ServicePort(port=80, target_port=8002)],
-                type="ClusterIP"
-            )
+    # 5) Service 생성 (backend가 ClusterIP로 직접 호출하므로 targetPort를 agent 포트와 맞춤)
+    await _ensure_service(name)
+
+    # 6) 캐시 이벤트로 새 Pod 감지
+    return await _wait_new_ready_pod(name, existing)
+
+async def _wait_new_ready_pod(name: str, existing: set) -> str:
+    """
+    기존에 없던 Pod가 준비 상태(readinessProbe 통과 = MCP 서버 연결 완료)가 될 때까지
+    공유 캐시의 Pod 이벤트로 기다립니다 (요청별 watch를 열지 않음).
+    """
+    def _is_new_ready(pod) -> bool:
+        return (
+            (pod.metadata.labels or {}).get("app") == name
+            and pod.metadata.name not in existing
+            and is_pod_ready(pod)
         )
-        await asyncio.to_thread(
-            lambda: core_v1.create_namespaced_service(namespace=NAMESPACE, body=service)
-            if not any(s.metadata.name == name for s in core_v1.list_namespaced_service(namespace=NAMESPACE).items)
-            else None
+
+    pod = await cluster_cache.wait_for_pod(_is_new_ready, timeout=DEPLOY_POD_TIMEOUT)
+    if pod is None:
+        # 타임아웃 시 예외
+        raise RuntimeError(f"새로운 준비 상태 Pod를 찾지 못했습니다 (existing={existing})")
+    return pod.metadata.name
+
+async def scale_down_agent(user_id: str) -> bool:
+    """
+    유휴 사용자의 agent를 중지합니다. Deployment는 replica 0으로 줄여 설정을 남겨 두고,
+    웜 풀에서 할당된 Pod는 삭제합니다. 다음 배포 요청에서 다시 띄웁니다.
+    """
+    name = f"agent-{user_id}"
+    try:
+        await kube.apps_v1.patch_namespaced_deployment_scale(
+            name=name, namespace=NAMESPACE, body={"spec": {"replicas": 0}}
         )
+        scaled = True
+    except client.exceptions.ApiException as e:
+        if e.status != 404:
+            raise
+        scaled = False
+    await warm_pool.release_user_pods(user_id)
+    logger.info(f"agent 중지 - 사용자: {user_id}, Deployment 축소: {scaled}")
+    return scaled
 
-    # 5) Watch로 새 Pod 감지
-    def _watch_new_pod():
-        w = watch.Watch()
-        for event in w.stream(
-            core_v1.list_namespaced_pod,
-            namespace=NAMESPACE,
-            label_selector=f"app={name}",
-            timeout_seconds=120,
-        ):
-            pod = event['object']
-            pod_name = pod.metadata.name
+def _find_ready_pod_with_hash(name: str, config_hash: str):
+    """
+    Deployment의 설정 해시가 같고 롤아웃이 끝난 상태면 준비된 Pod 이름을 반환합니다.
+    조건을 만족하지 않으면 None (재배포 필요). 공유 캐시에서 조회합니다.
+    """
+    deployment = cluster_cache.deployments.get(name)
+    if deployment is None:
+        return None
 
-            # 기존에 없던 Pod 이름이고, Running 상태라면 리턴
-            if pod_name not in existing and pod.status.phase == "Running":
-                w.stop()
-                return pod_name
+    annotations = deployment.spec.template.metadata.annotations or {}
+    if annotations.get(CONFIG_HASH_ANNOTATION) != config_hash or not _is_deployment_ready(deployment):
+        return None
 
-        # 타임아웃 시 예외
-        raise RuntimeError(f"새로운 Running 상태 Pod를 찾지 못했습니다 (existing={existing})")
+    # 웜 풀에서 할당된 Pod는 Deployment 소유가 아니므로 제외
+    pods = cluster_cache.pods_with_labels({"app": name}, without=(POOL_LABEL,))
+    # 실행 중에 다른 설정이 반영된 Pod는 Deployment 설정과 다르므로 제외
+    ready = [p for p in pods if is_pod_ready(p) and _live_config_hash(p) in (None, config_hash)]
+    if not ready:
+        return None
+    # 롤링 업데이트 직후 이전 Pod가 남아 있을 수 있으므로 가장 최근 Pod 선택
+    return max(ready, key=lambda p: p.metadata.creation_timestamp).metadata.name
+
+def _find_claimed_pod_with_hash(name: str, config_hash: str):
+    """웜 풀에서 같은 설정으로 할당된 준비 상태 Pod 이름을 반환합니다. 없으면 None."""
+    pods = cluster_cache.pods_with_labels({"app": name, POOL_LABEL: POOL_CLAIMED})
+    for pod in pods:
+        annotations = pod.metadata.annotations or {}
+        if is_pod_ready(pod) and annotations.get(LIVE_CONFIG_HASH_ANNOTATION, annotations.get(CONFIG_HASH_ANNOTATION)) == config_hash:
+            return pod.metadata.name
+    return None
 
-    pod_name = await asyncio.to_thread(_watch_new_pod)
-    return pod_name
+def _live_config_hash(pod):
+    return (pod.metadata.annotations or {}).get(LIVE_CONFIG_HASH_ANNOTATION)
+
+def _find_live_pod_with_hash(name: str, config_hash: str):
+    """실행 중에 같은 설정이 반영된(record_live_config) 준비 상태 Pod 이름을 반환합니다. 없으면 None."""
+    for pod in cluster_cache.pods_with_labels({"app": name}):
+        if is_pod_ready(pod) and _live_config_hash(pod) == config_hash:
+            return pod.metadata.name
+    return None
+
+async def record_live_config(user_id: str, env_vars: list) -> list:
+    """
+    backend가 실행 중인 agent에 설정 변경을 직접 반영한 뒤 호출합니다.
+    준비된 Pod에 반영된 설정 해시를 기록해, 같은 설정의 다음 배포 요청이 재배포 없이 이 Pod를 재사용하게 합니다.
+    Pod가 교체되면 기록도 사라지므로 그 뒤의 배포 요청은 새 설정으로 재배포합니다.
+    """
+    name = f"agent-{user_id}"
+    config_hash = compute_config_hash(env_vars)
+    patched = []
+    for pod in cluster_cache.pods_with_labels({"app": name}):
+        if not is_pod_ready(pod):
+            continue
+        try:
+            await kube.core_v1.patch_namespaced_pod(
+                name=pod.metadata.name,
+                namespace=NAMESPACE,
+                body={"metadata": {"annotations": {LIVE_CONFIG_HASH_ANNOTATION: config_hash}}}
+            )
+        except client.exceptions.ApiException as e:
+            # 조회와 패치 사이에 삭제된 Pod
+            if e.status != 404:
+                raise
+            continue
+        patched.append(pod.metadata.name)
+    logger.info(f"실행 중 설정 반영 기록 - 사용자: {user_id}, Pod: {patched}")
+    return patched
+
+async def _delete_deployment(name: str):
+    try:
+        await kube.apps_v1.delete_namespaced_deployment(name=name, namespace=NAMESPACE, propagation_policy="Background")
+    except client.exceptions.ApiException as e:
+        if e.status != 404:
+            raise
+
+async def _ensure_service(name: str):
+    """agent Service를 생성하거나, 잘못된 targetPort로 만들어진 Service를 보정합니다."""
+    service = client.V1Service(
+        metadata=client.V1ObjectMeta(name=name),
+        spec=client.V1ServiceSpec(
+            selector={"app": name},
+            ports=[client.V1ServicePort(port=80, target_port=AGENT_PORT)],
+            type="ClusterIP"
+        )
+    )
+    existing_svc = cluster_cache.services.get(name)
+    if existing_svc is None:
+        try:
+            await kube.core_v1.create_namespaced_service(namespace=NAMESPACE, body=service)
+        except client.exceptions.ApiException as e:
+            # 캐시에 아직 반영되지 않았거나 다른 작업이 먼저 생성한 경우
+            if e.status != 409:
+                raise
+        return
+    # 이전 버전에서 잘못된 targetPort로 만들어진 Service 보정
+    if any(p.target_port != AGENT_PORT for p in existing_svc.spec.ports):
+        await kube.core_v1.patch_namespaced_service(
+            name=name,
+            namespace=NAMESPACE,
+            body={"spec": {"ports": [{"port": 80, "targetPort": AGENT_PORT}]}}
+        )
@@ -0,0 +1,135 @@
+import asyncio, logging, time
+from collections import deque
+from typing import Any, Dict, List, Optional, Tuple
+from app.config import DEPLOY_WORKERS, DEPLOY_QUEUE_SIZE
+from app.deploy import deploy_agent, compute_config_hash
+from app.warm_pool import percentile
+
+logger = logging.getLogger(__name__)
+
+class DeployQueueFull(Exception):
+    """배포 대기열이 가득 찬 경우 (503으로 응답)"""
+    pass
+
+class DeployQueue:
+    """
+    크기가 제한된 배포 작업 큐.
+
+    고정된 수의 워커가 배포를 처리하므로 로그인이 몰려도 API 서버 커넥션과 watch 수가 제한되고,
+    같은 사용자·같은 설정의 요청은 진행 중인 작업에 합류해 결과를 함께 받습니다.
+    설정이 다른 같은 사용자의 요청은 사용자별 락으로 순서대로 처리합니다.
+    """
+
+    def __init__(self, workers: int = DEPLOY_WORKERS, maxsize: int = DEPLOY_QUEUE_SIZE):
+        self.workers = workers
+        self.maxsize = maxsize
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker_tasks: List[asyncio.Task] = []
+        # (user_id, config_hash) -> 진행 중인 작업 결과
+        self._inflight: Dict[Tuple[str, str], asyncio.Future] = {}
+        # user_id -> [락, 사용 중인 작업 수]
+        self._user_locks: Dict[str, list] = {}
+        # 메트릭
+        self.submitted = 0
+        self.joined = 0
+        self.rejected = 0
+        self.completed = 0
+        self.failed = 0
+        self.busy = 0
+        self._latency_ms = deque(maxlen=1000)
+
+    def start(self):
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self.maxsize)
+            self._worker_tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        self._worker_tasks = []
+        # 처리되지 못한 작업은 실패로 응답
+        for future in self._inflight.values():
+            if not future.done():
+                future.set_exception(RuntimeError("operator가 종료되어 배포가 중단되었습니다."))
+        self._inflight.clear()
+        self._queue = None
+
+    async def submit(self, user_id: str, env_vars: list) -> str:
+        """
+        배포 작업을 등록하고 완료될 때까지 기다린 뒤 Pod 이름을 반환합니다.
+        호출한 요청이 취소돼도(클라이언트 연결 끊김) 작업은 계속 진행되어 합류한 다른 요청이 결과를 받습니다.
+
+        Raises:
+            DeployQueueFull: 대기열이 가득 찬 경우
+        """
+        key = (user_id, compute_config_hash(env_vars))
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.get_running_loop().create_future()
+            # 기다리던 요청이 모두 취소된 경우에도 예외가 처리되지 않았다는 경고가 남지 않도록 조회
+            future.add_done_callback(lambda f: f.cancelled() or f.exception())
+            try:
+                self._queue.put_nowait((key, user_id, env_vars, future, time.perf_counter()))
+            except asyncio.QueueFull:
+                self.rejected += 1
+                raise DeployQueueFull("배포 요청이 많아 잠시 후 다시 시도해주세요.")
+            self._inflight[key] = future
+            self.submitted += 1
+        else:
+            self.joined += 1
+            logger.info(f"진행 중인 배포에 합류 - 사용자: {user_id}")
+        return await asyncio.shield(future)
+
+    async def _worker(self):
+        while True:
+            key, user_id, env_vars, future, queued_at = await self._queue.get()
+            self.busy += 1
+            entry = self._user_locks.setdefault(user_id, [asyncio.Lock(), 0])
+            entry[1] += 1
+            try:
+                async with entry[0]:
+                    pod_name = await deploy_agent(user_id, env_vars)
+                if not future.done():
+                    future.set_result(pod_name)
+                self.completed += 1
+            except asyncio.CancelledError:
+                if not future.done():
+                    future.set_exception(RuntimeError("operator가 종료되어 배포가 중단되었습니다."))
+                raise
+            except Exception as e:
+                self.failed += 1
+                logger.error(f"배포 실패 - 사용자: {user_id}, 오류: {str(e)}")
+                if not future.done():
+                    future.set_exception(e)
+            finally:
+                self.busy -= 1
+                entry[1] -= 1
+                if entry[1] == 0:
+                    self._user_locks.pop(user_id, None)
+                if self._inflight.get(key) is future:
+                    del self._inflight[key]
+                self._latency_ms.append((time.perf_counter() - queued_at) * 1000)
+                self._queue.task_done()
+
+    def metrics(self) -> Dict[str, Any]:
+        latency = list(self._latency_ms)
+        return {
+            "workers": self.workers,
+            "busy": self.busy,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "queue_size": self.maxsize,
+            "submitted": self.submitted,
+            "joined": self.joined,
+            "rejected": self.rejected,
+            "completed": self.completed,
+            "failed": self.failed,
+            "latency_ms": {
+                "p50": round(percentile(latency, 0.5), 1),
+                "p95": round(percentile(latency, 0.95), 1),
+                "max": round(max(latency), 1) if latency else 0.0
+            }
+        }
+
+# 전역 인스턴스
+deploy_queue = DeployQueue()
@@ -0,0 +1,180 @@
+import asyncio, logging
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+from kubernetes_asyncio import client, watch
+from app.config import NAMESPACE, INFORMER_WATCH_TIMEOUT, INFORMER_SYNC_TIMEOUT
+from app.kube import kube
+
+logger = logging.getLogger(__name__)
+
+class Informer:
+    """
+    한 종류의 리소스를 list + watch로 메모리에 유지하는 캐시.
+
+    처음에 한 번 목록을 받은 뒤 resourceVersion부터 watch를 이어 가며 변경을 반영하고,
+    watch가 끊기면 마지막 resourceVersion에서 재개합니다 (410 Gone이면 다시 목록 조회).
+    wait_for()로 조건을 만족하는 객체가 나타날 때까지 이벤트 기반으로 기다릴 수 있습니다.
+    """
+
+    def __init__(self, kind: str, list_func: Callable):
+        self.kind = kind
+        self._list_func = list_func
+        self.store: Dict[str, Any] = {}
+        self.resource_version: Optional[str] = None
+        self.synced = asyncio.Event()
+        self._waiters: Set[Tuple[Callable[[Any], bool], asyncio.Future]] = set()
+        self._task: Optional[asyncio.Task] = None
+        # 메트릭
+        self.events = 0
+        self.relists = 0
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def get(self, name: str) -> Optional[Any]:
+        return self.store.get(name)
+
+    def list(self, predicate: Optional[Callable[[Any], bool]] = None) -> List[Any]:
+        return [obj for obj in self.store.values() if predicate is None or predicate(obj)]
+
+    async def wait_for(self, predicate: Callable[[Any], bool], timeout: float) -> Optional[Any]:
+        """조건을 만족하는 객체를 반환합니다. timeout 안에 나타나지 않으면 None."""
+        for obj in self.store.values():
+            if predicate(obj):
+                return obj
+        waiter = (predicate, asyncio.get_running_loop().create_future())
+        self._waiters.add(waiter)
+        try:
+            return await asyncio.wait_for(waiter[1], timeout=timeout)
+        except asyncio.TimeoutError:
+            return None
+        finally:
+            self._waiters.discard(waiter)
+
+    def _notify(self, obj: Any):
+        for predicate, future in list(self._waiters):
+            if not future.done() and predicate(obj):
+                future.set_result(obj)
+
+    def _apply(self, event_type: str, obj: Any):
+        self.events += 1
+        if event_type == "DELETED":
+            self.store.pop(obj.metadata.name, None)
+            return
+        self.store[obj.metadata.name] = obj
+        self._notify(obj)
+
+    async def _relist(self):
+        result = await self._list_func(namespace=NAMESPACE)
+        self.store = {obj.metadata.name: obj for obj in result.items}
+        self.resource_version = result.metadata.resource_version
+        self.relists += 1
+        self.synced.set()
+        # 목록을 다시 받는 동안 놓친 이벤트가 있을 수 있으므로 대기 중인 조건을 다시 확인
+        for obj in self.store.values():
+            self._notify(obj)
+
+    async def _run(self):
+        retry_delay = 1
+        while True:
+            try:
+                if self.resource_version is None:
+                    await self._relist()
+                async with watch.Watch().stream(
+                    self._list_func,
+                    namespace=NAMESPACE,
+                    resource_version=self.resource_version,
+                    allow_watch_bookmarks=True,
+                    timeout_seconds=INFORMER_WATCH_TIMEOUT,
+                ) as stream:
+                    async for event in stream:
+                        event_type, obj = event["type"], event["object"]
+                        if event_type == "ERROR":
+                            # 보관 기간이 지난 resourceVersion (410 Gone) 등 - 목록부터 다시
+                            logger.info(f"{self.kind} watch 오류 이벤트, 목록 재조회: {obj}")
+                            self.resource_version = None
+                            break
+                        if event_type != "BOOKMARK":
+                            self._apply(event_type, obj)
+                        self.resource_version = obj.metadata.resource_version
+                retry_delay = 1
+            except asyncio.CancelledError:
+                raise
+            except client.exceptions.ApiException as e:
+                if e.status == 410:
+                    self.resource_version = None
+                    continue
+                logger.warning(f"{self.kind} watch 실패, {retry_delay}초 후 재시도: {e.status} {e.reason}")
+                await asyncio.sleep(retry_delay)
+                retry_delay = min(retry_delay * 2, 30)
+            except Exception as e:
+                logger.warning(f"{self.kind} watch 실패, {retry_delay}초 후 재시도: {str(e)}")
+                await asyncio.sleep(retry_delay)
+                retry_delay = min(retry_delay * 2, 30)
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "objects": len(self.store),
+            "synced": self.synced.is_set(),
+            "events": self.events,
+            "relists": self.relists,
+            "waiters": len(self._waiters)
+        }
+
+def _has_labels(obj: Any, labels: Dict[str, str], without: Tuple[str, ...]) -> bool:
+    current = obj.metadata.labels or {}
+    return (
+        all(current.get(key) == value for key, value in labels.items())
+        and not any(key in current for key in without)
+    )
+
+class ClusterCache:
+    """agent-env 네임스페이스의 Deployment, Pod, Service 공유 캐시."""
+
+    def __init__(self):
+        self.deployments: Optional[Informer] = None
+        self.pods: Optional[Informer] = None
+        self.services: Optional[Informer] = None
+
+    def _informers(self) -> List[Informer]:
+        return [i for i in (self.deployments, self.pods, self.services) if i is not None]
+
+    async def start(self):
+        """watch를 시작하고 첫 목록 조회가 끝날 때까지 기다립니다."""
+        self.deployments = Informer("deployments", kube.apps_v1.list_namespaced_deployment)
+        self.pods = Informer("pods", kube.core_v1.list_namespaced_pod)
+        self.services = Informer("services", kube.core_v1.list_namespaced_service)
+        for informer in self._informers():
+            informer.start()
+        await asyncio.wait_for(
+            asyncio.gather(*(informer.synced.wait() for informer in self._informers())),
+            timeout=INFORMER_SYNC_TIMEOUT
+        )
+        logger.info(f"캐시 동기화 완료 - Deployment: {len(self.deployments.store)}, "
+                    f"Pod: {len(self.pods.store)}, Service: {len(self.services.store)}")
+
+    async def stop(self):
+        for informer in self._informers():
+            await informer.stop()
+
+    def pods_with_labels(self, labels: Dict[str, str], without: Tuple[str, ...] = ()) -> List[Any]:
+        """라벨이 모두 일치하고 without 라벨이 없는 Pod 목록 (app=x,!y 셀렉터에 해당)"""
+        return self.pods.list(lambda pod: _has_labels(pod, labels, without))
+
+    async def wait_for_pod(self, predicate: Callable[[Any], bool], timeout: float) -> Optional[Any]:
+        return await self.pods.wait_for(predicate, timeout)
+
+    def metrics(self) -> Dict[str, Any]:
+        return {informer.kind: informer.metrics() for informer in self._informers()}
+
+# 전역 인스턴스
+cluster_cache = ClusterCache()
@@ -0,0 +1,33 @@
+from typing import Optional
+from kubernetes_asyncio import client, config
+from app.config import K8S_CONNECTION_POOL_SIZE
+
+class KubeClients:
+    """
+    프로세스 전체에서 공유하는 비동기 Kubernetes API 클라이언트.
+
+    aiohttp 커넥션 풀 하나를 사용하므로 배포 요청마다 스레드를 점유하지 않습니다.
+    """
+
+    def __init__(self):
+        self.api_client: Optional[client.ApiClient] = None
+        self.core_v1: Optional[client.CoreV1Api] = None
+        self.apps_v1: Optional[client.AppsV1Api] = None
+
+    async def start(self, configuration: Optional[client.Configuration] = None):
+        """클러스터 내부 설정으로 클라이언트를 만듭니다. 부하 테스트 등에서는 configuration을 직접 전달합니다."""
+        if configuration is None:
+            config.load_incluster_config()
+            configuration = client.Configuration.get_default_copy()
+        configuration.connection_pool_maxsize = K8S_CONNECTION_POOL_SIZE
+        self.api_client = client.ApiClient(configuration)
+        self.core_v1 = client.CoreV1Api(self.api_client)
+        self.apps_v1 = client.AppsV1Api(self.api_client)
+
+    async def close(self):
+        if self.api_client is not None:
+            await self.api_client.close()
+            self.api_client = None
+
+# 전역 인스턴스
+kube = KubeClients()
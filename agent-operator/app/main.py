@@ -1,19 +1,68 @@
 from fastapi import FastAPI, Request, HTTPException
-from app.deploy import deploy_agent
+from app.deploy import scale_down_agent, record_live_config
+from app.deploy_queue import deploy_queue, DeployQueueFull
+from app.informer import cluster_cache
+from app.kube import kube
+from app.warm_pool import warm_pool
 
 app = FastAPI()
 
+@app.on_event("startup")
+async def startup_event():
+    await kube.start()
+    # Deployment/Pod/Service 공유 캐시 동기화 후 배포 처리 시작
+    await cluster_cache.start()
+    deploy_queue.start()
+    # 웜 풀 보충 루프 시작 (WARM_POOL_SIZE가 0이면 비활성화)
+    warm_pool.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await warm_pool.stop()
+    await deploy_queue.stop()
+    await cluster_cache.stop()
+    await kube.close()
+
 @app.get("/health")
 def health_check():
     return {"status": "ok"}
 
+@app.get("/metrics")
+def metrics():
+    return {
+        "deploy_queue": deploy_queue.metrics(),
+        "warm_pool": warm_pool.metrics(),
+        "cluster_cache": cluster_cache.metrics()
+    }
+
 @app.post("/deploy")
 async def deploy_user_server(request: Request):
     try:
         data = await request.json()
         user_id = data["user_id"]
         env_vars = data.get("env", [])
-        pod_name = await deploy_agent(user_id, env_vars)
+        pod_name = await deploy_queue.submit(user_id, env_vars)
         return {"pod_name": pod_name}
+    except DeployQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+# backend가 실행 중인 agent에 설정 변경을 직접 반영한 뒤 호출 (다음 배포 요청에서 재배포하지 않도록 기록)
+@app.post("/live-config")
+async def record_live_user_config(request: Request):
+    try:
+        data = await request.json()
+        pods = await record_live_config(data["user_id"], data.get("env", []))
+        return {"pods": pods}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/scale-down")
+async def scale_down_user_server(request: Request):
+    try:
+        data = await request.json()
+        scaled = await scale_down_agent(data["user_id"])
+        return {"scaled_down": scaled}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,328 @@
+import asyncio, logging, time
+from collections import deque
+from typing import List, Optional, Tuple
+import httpx
+from kubernetes_asyncio import client
+from app.config import (
+    NAMESPACE, AGENT_IMAGE, AGENT_PORT, AGENT_READY_PATH, AGENT_TOOL_CACHE_HOST_PATH, AGENT_TOOL_CACHE_MOUNT_PATH,
+    MCP_GATEWAY_URL, AGENT_CONTROL_TOKEN, WARM_POOL_SIZE, WARM_POOL_REFILL_INTERVAL,
+    WARM_POOL_CONFIG_TIMEOUT, POOL_LABEL, CONFIG_HASH_ANNOTATION
+)
+from app.informer import cluster_cache
+from app.kube import kube
+
+logger = logging.getLogger(__name__)
+
+# 웜 풀 Pod 상태 라벨 값
+POOL_WARM = "warm"
+POOL_CLAIMING = "claiming"
+POOL_CLAIMED = "claimed"
+
+# 대기 Pod가 어떤 이미지로 만들어졌는지 기록 (이미지가 바뀌면 교체)
+IMAGE_ANNOTATION = "agentImage"
+# claiming으로 예약한 시각 (epoch 초), 설정 주입 중 operator가 종료돼 남은 Pod 정리용
+CLAIM_STARTED_ANNOTATION = "agentClaimStartedAt"
+
+def is_pod_ready(pod) -> bool:
+    return (
+        pod.metadata.deletion_timestamp is None
+        and pod.status.phase == "Running"
+        and all(cs.ready for cs in (pod.status.container_statuses or []))
+    )
+
+def readiness_probe() -> client.V1Probe:
+    """agent의 /ready로 MCP 서버 연결까지 끝난 Pod만 준비 상태로 판단합니다 (준비 전에는 Service 대상에서 제외)."""
+    return client.V1Probe(
+        http_get=client.V1HTTPGetAction(path=AGENT_READY_PATH, port=AGENT_PORT),
+        period_seconds=2,
+        failure_threshold=3
+    )
+
+def tool_cache_volume() -> Tuple[List[client.V1Volume], List[client.V1VolumeMount]]:
+    """MCP 도구 목록 캐시 볼륨. 지연 시작 모드의 agent가 MCP 프로세스 없이 도구 목록을 제공하는 데 사용합니다."""
+    if not AGENT_TOOL_CACHE_HOST_PATH:
+        return [], []
+    return (
+        [client.V1Volume(
+            name="mcp-tool-cache",
+            host_path=client.V1HostPathVolumeSource(path=AGENT_TOOL_CACHE_HOST_PATH, type="DirectoryOrCreate")
+        )],
+        [client.V1VolumeMount(name="mcp-tool-cache", mount_path=AGENT_TOOL_CACHE_MOUNT_PATH)]
+    )
+
+def runtime_volume() -> Tuple[List[client.V1Volume], List[client.V1VolumeMount]]:
+    """주입받거나 실행 중에 바뀐 사용자 설정을 컨테이너가 재시작돼도 다시 읽을 수 있도록 저장하는 emptyDir."""
+    return (
+        [client.V1Volume(name="runtime", empty_dir=client.V1EmptyDirVolumeSource())],
+        [client.V1VolumeMount(name="runtime", mount_path="/var/run/agent")]
+    )
+
+def agent_runtime_env() -> List[client.V1EnvVar]:
+    """사용자 설정과 무관하게 operator가 모든 agent Pod에 넣는 환경 변수."""
+    env = []
+    if MCP_GATEWAY_URL:
+        env.append(client.V1EnvVar(name="MCP_GATEWAY_URL", value=MCP_GATEWAY_URL))
+    if AGENT_CONTROL_TOKEN:
+        env.append(client.V1EnvVar(name="AGENT_CONTROL_TOKEN", value=AGENT_CONTROL_TOKEN))
+    return env
+
+def percentile(values, p: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * p), len(ordered) - 1)] if ordered else 0.0
+
+class WarmPool:
+    """
+    사용자 설정 없이 미리 실행해 둔 범용 agent Pod 풀.
+
+    로그인 시 새 Deployment를 만드는 대신 준비된 대기 Pod 하나를 골라
+    agent의 runtime config 엔드포인트로 사용자 환경 변수(MCP_SERVICES 포함)를 주입하고,
+    라벨을 app=agent-{user_id}로 바꿔 사용자 Service에 연결합니다.
+    사용된 Pod는 백그라운드 루프가 비동기로 보충합니다.
+    """
+
+    def __init__(self, size: int = WARM_POOL_SIZE):
+        self.size = size
+        self._lock = asyncio.Lock()
+        self._refill_event = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._http: Optional[httpx.AsyncClient] = None
+        # 메트릭
+        self.claims = 0
+        self.misses = 0
+        self.failures = 0
+        self.ready_count = 0
+        self.pending_count = 0
+        self._claim_latency_ms = deque(maxlen=500)
+        # 생성했지만 아직 캐시에 반영되지 않은 Pod (이름 -> 생성 시각), 중복 생성 방지용
+        self._created = {}
+        # 이 프로세스에서 설정을 주입 중인 Pod (오래된 claiming Pod 정리에서 제외)
+        self._claiming = set()
+
+    @property
+    def enabled(self) -> bool:
+        # 대기 Pod의 /runtime/config는 control 토큰으로만 호출할 수 있음
+        return self.size > 0 and bool(AGENT_CONTROL_TOKEN)
+
+    def start(self):
+        if self.size > 0 and not AGENT_CONTROL_TOKEN:
+            logger.warning("AGENT_CONTROL_TOKEN이 설정되지 않아 웜 풀을 사용하지 않습니다.")
+        if self.enabled and (self._task is None or self._task.done()):
+            self._http = httpx.AsyncClient(timeout=httpx.Timeout(WARM_POOL_CONFIG_TIMEOUT, connect=3))
+            self._task = asyncio.create_task(self._refill_loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+    def _pod_manifest(self) -> client.V1Pod:
+        cache_volumes, cache_mounts = tool_cache_volume()
+        runtime_volumes, runtime_mounts = runtime_volume()
+        return client.V1Pod(
+            metadata=client.V1ObjectMeta(
+                generate_name="agent-warm-",
+                labels={POOL_LABEL: POOL_WARM},
+                annotations={IMAGE_ANNOTATION: AGENT_IMAGE}
+            ),
+            spec=client.V1PodSpec(
+                containers=[
+                    client.V1Container(
+                        name="agent",
+                        image=AGENT_IMAGE,
+                        ports=[client.V1ContainerPort(container_port=AGENT_PORT)],
+                        # 사용자 설정을 받을 때까지 MCP 서버를 띄우지 않고 대기
+                        env=[client.V1EnvVar(name="AGENT_WARM_POOL", value="true")] + agent_runtime_env(),
+                        # 설정 주입 대기 중에는 준비 상태, 재시작 후 설정을 복원하는 동안에는 미준비
+                        readiness_probe=readiness_probe(),
+                        # 컨테이너가 재시작돼도 주입된 사용자 설정을 다시 읽을 수 있도록 emptyDir에 저장
+                        volume_mounts=runtime_mounts + cache_mounts
+                    )
+                ],
+                volumes=runtime_volumes + cache_volumes
+            )
+        )
+
+    async def _refill_loop(self):
+        while True:
+            try:
+                await self._refill()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"웜 풀 보충 실패: {str(e)}")
+            try:
+                await asyncio.wait_for(self._refill_event.wait(), timeout=WARM_POOL_REFILL_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            self._refill_event.clear()
+
+    async def _refill(self):
+        """대기 Pod 수를 확인하고 모자란 만큼 생성합니다. 이미지가 바뀐 대기 Pod는 교체합니다."""
+        await self._reap_stale_claims()
+        pods = cluster_cache.pods_with_labels({POOL_LABEL: POOL_WARM})
+
+        alive = []
+        for pod in pods:
+            if pod.metadata.deletion_timestamp is not None:
+                continue
+            outdated = (pod.metadata.annotations or {}).get(IMAGE_ANNOTATION) != AGENT_IMAGE
+            if outdated or pod.status.phase in ("Failed", "Succeeded"):
+                await self._delete_pod(pod.metadata.name)
+                continue
+            alive.append(pod)
+
+        known = {pod.metadata.name for pod in pods}
+        now = time.monotonic()
+        self._created = {n: t for n, t in self._created.items() if n not in known and now - t < 30}
+
+        self.ready_count = sum(1 for pod in alive if is_pod_ready(pod))
+        self.pending_count = len(alive) - self.ready_count + len(self._created)
+        missing = self.size - len(alive) - len(self._created)
+        for _ in range(missing):
+            pod = await kube.core_v1.create_namespaced_pod(namespace=NAMESPACE, body=self._pod_manifest())
+            self._created[pod.metadata.name] = time.monotonic()
+        if missing > 0:
+            logger.info(f"웜 풀 보충 - 대기 중: {len(alive)}, 생성: {missing}")
+
+    async def _reap_stale_claims(self):
+        """설정 주입 제한 시간이 지나도록 claiming 상태인 Pod를 삭제합니다 (주입 중 operator 종료·취소로 남은 Pod)."""
+        now = time.time()
+        for pod in cluster_cache.pods_with_labels({POOL_LABEL: POOL_CLAIMING}):
+            name = pod.metadata.name
+            if name in self._claiming or pod.metadata.deletion_timestamp is not None:
+                continue
+            try:
+                claimed_at = float((pod.metadata.annotations or {}).get(CLAIM_STARTED_ANNOTATION, 0))
+            except ValueError:
+                claimed_at = 0
+            if now - claimed_at > WARM_POOL_CONFIG_TIMEOUT:
+                logger.warning(f"설정 주입이 끝나지 않은 웜 풀 Pod 삭제 - Pod: {name}, 예약 대상: {(pod.metadata.labels or {}).get('claimedFor')}")
+                await self._delete_pod(name)
+
+    @staticmethod
+    async def _delete_pod(name: str):
+        try:
+            await kube.core_v1.delete_namespaced_pod(name=name, namespace=NAMESPACE, grace_period_seconds=5)
+        except client.exceptions.ApiException as e:
+            if e.status != 404:
+                raise
+
+    async def _reserve(self, name: str) -> Optional[client.V1Pod]:
+        """준비된 대기 Pod 하나를 claiming 상태로 바꿔 예약합니다. resourceVersion 조건으로 중복 예약을 막습니다."""
+        pods = cluster_cache.pods_with_labels({POOL_LABEL: POOL_WARM})
+        ready = [
+            p for p in pods
+            if is_pod_ready(p) and (p.metadata.annotations or {}).get(IMAGE_ANNOTATION) == AGENT_IMAGE
+        ]
+        # 오래 대기한 Pod부터 사용 (캐시가 늦어 이미 예약된 Pod면 resourceVersion 충돌로 건너뜀)
+        ready.sort(key=lambda p: p.metadata.creation_timestamp)
+        for pod in ready:
+            try:
+                return await kube.core_v1.patch_namespaced_pod(
+                    name=pod.metadata.name,
+                    namespace=NAMESPACE,
+                    body={"metadata": {
+                        "resourceVersion": pod.metadata.resource_version,
+                        "labels": {POOL_LABEL: POOL_CLAIMING, "claimedFor": name},
+                        "annotations": {CLAIM_STARTED_ANNOTATION: str(int(time.time()))}
+                    }}
+                )
+            except client.exceptions.ApiException as e:
+                # 다른 요청이 먼저 예약했거나 삭제된 Pod
+                if e.status in (404, 409):
+                    continue
+                raise
+        return None
+
+    async def claim(self, user_id: str, env_vars: list, config_hash: str) -> Optional[str]:
+        """
+        대기 Pod에 사용자 설정을 주입하고 사용자 Pod로 전환합니다.
+        사용할 수 있는 대기 Pod가 없거나 설정 주입에 실패하면 None을 반환합니다 (Deployment 방식으로 대체).
+        """
+        if not self.enabled:
+            return None
+
+        name = f"agent-{user_id}"
+        started = time.perf_counter()
+
+        async with self._lock:
+            pod = await self._reserve(name)
+            if pod is not None:
+                self._claiming.add(pod.metadata.name)
+        self._refill_event.set()
+        if pod is None:
+            self.misses += 1
+            logger.info(f"웜 풀 미스 - 사용자: {user_id}")
+            return None
+
+        pod_name = pod.metadata.name
+        try:
+            response = await self._http.post(
+                f"http://{pod.status.pod_ip}:{AGENT_PORT}/runtime/config",
+                json={"user_id": user_id, "env": env_vars},
+                headers={"Authorization": f"Bearer {AGENT_CONTROL_TOKEN}"}
+            )
+            response.raise_for_status()
+            await kube.core_v1.patch_namespaced_pod(
+                name=pod_name,
+                namespace=NAMESPACE,
+                body={"metadata": {
+                    "labels": {"app": name, POOL_LABEL: POOL_CLAIMED, "claimedFor": None},
+                    "annotations": {CONFIG_HASH_ANNOTATION: config_hash}
+                }}
+            )
+        except BaseException as e:
+            # 설정이 일부만 적용됐을 수 있으므로 Pod를 재사용하지 않고 폐기 (작업 취소 시에도 claiming으로 남기지 않음)
+            self.failures += 1
+            logger.warning(f"웜 풀 Pod 설정 주입 실패 - 사용자: {user_id}, Pod: {pod_name}, 오류: {e!r}")
+            try:
+                await self._delete_pod(pod_name)
+            except Exception as delete_error:
+                logger.warning(f"웜 풀 Pod 삭제 실패 - Pod: {pod_name}, 오류: {str(delete_error)}")
+            if not isinstance(e, Exception):
+                raise
+            return None
+        finally:
+            self._claiming.discard(pod_name)
+
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self.claims += 1
+        self._claim_latency_ms.append(elapsed_ms)
+        logger.info(f"웜 풀 Pod 할당 - 사용자: {user_id}, Pod: {pod_name}, 소요: {elapsed_ms:.1f}ms")
+        return pod_name
+
+    async def release_user_pods(self, user_id: str, keep: Optional[str] = None):
+        """사용자에게 할당됐던 웜 풀 Pod를 삭제합니다 (설정이 바뀌었거나 Deployment로 전환하는 경우)."""
+        pods = cluster_cache.pods_with_labels({"app": f"agent-{user_id}", POOL_LABEL: POOL_CLAIMED})
+        for pod in pods:
+            if pod.metadata.name != keep:
+                await self._delete_pod(pod.metadata.name)
+
+    def metrics(self) -> dict:
+        requests = self.claims + self.misses + self.failures
+        latency = list(self._claim_latency_ms)
+        return {
+            "enabled": self.enabled,
+            "target_size": self.size,
+            "ready": self.ready_count,
+            "pending": self.pending_count,
+            "claims": self.claims,
+            "misses": self.misses,
+            "failures": self.failures,
+            "miss_rate": round((self.misses + self.failures) / requests, 4) if requests else 0.0,
+            "claim_latency_ms": {
+                "p50": round(percentile(latency, 0.5), 1),
+                "p95": round(percentile(latency, 0.95), 1),
+                "max": round(max(latency), 1) if latency else 0.0
+            }
+        }
+
+# 전역 인스턴스
+warm_pool = WarmPool()
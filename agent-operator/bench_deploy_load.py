@@ -0,0 +1,381 @@
+"""
+가짜 Kubernetes API 서버를 대상으로 agent-operator의 배포 처리량을 측정하는 부하 테스트 스크립트
+
+aiohttp로 만든 가짜 API 서버가 Deployment/Service/Pod REST 요청과 list + watch 스트림을 흉내 내며,
+Deployment가 생성·교체되면 지정한 지연 후 새 Pod를 Pending → Running으로 전환합니다.
+실제 cluster_cache / deploy_queue / deploy_agent 코드가 이 서버에 비동기 클라이언트로 요청합니다 (웜 풀은 비활성화).
+
+요청의 일부는 같은 사용자·같은 설정으로 보내 진행 중인 배포에 합류(중복 제거)되는지도 확인합니다.
+기존 사용자 수를 지정하면 네임스페이스에 그만큼의 Deployment/Pod/Service를 미리 만들어 두어
+배포 지연이 네임스페이스 크기와 무관한지 비교할 수 있습니다.
+
+사용법 (agent-operator 디렉터리에서 실행):
+    python bench_deploy_load.py [동시 요청 수] [사용자 수] [Pod 기동 지연(초)] [기존 사용자 수]
+"""
+import asyncio
+import json
+import os
+import sys
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timezone
+
+# 앱 모듈이 설정을 읽기 전에 지정
+os.environ.setdefault("WARM_POOL_SIZE", "0")
+
+from aiohttp import web
+from kubernetes_asyncio import client
+from app.deploy_queue import deploy_queue
+from app.informer import cluster_cache
+from app.kube import kube
+from app.warm_pool import percentile
+
+NAMESPACE = "agent-env"
+
+def _now() -> str:
+    return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+def _match(selector: str, labels: dict) -> bool:
+    """k=v, !k, k 형식의 라벨 셀렉터만 지원합니다."""
+    for term in filter(None, (selector or "").split(",")):
+        if term.startswith("!"):
+            if term[1:] in labels:
+                return False
+        elif "=" in term:
+            key, value = term.split("=", 1)
+            if labels.get(key) != value:
+                return False
+        elif term not in labels:
+            return False
+    return True
+
+def _status(code: int, reason: str) -> web.Response:
+    return web.json_response(
+        {"kind": "Status", "apiVersion": "v1", "status": "Failure", "reason": reason, "code": code},
+        status=code
+    )
+
+class FakeKubeApi:
+    def __init__(self, pod_start_delay: float):
+        self.pod_start_delay = pod_start_delay
+        self.deployments = {}
+        self.services = {}
+        self.pods = {}
+        self.resource_version = 0
+        # 종류별 이벤트 기록 (resourceVersion, JSON 한 줄) - resourceVersion부터 watch 재개용
+        self.event_log = {"deployments": [], "pods": [], "services": []}
+        self.watchers = []
+        self.requests = Counter()
+        self.active_watches = 0
+        self.max_watches = 0
+
+    def _rv(self) -> str:
+        self.resource_version += 1
+        return str(self.resource_version)
+
+    def _emit(self, kind: str, event_type: str, obj: dict):
+        if event_type == "DELETED":
+            obj["metadata"]["resourceVersion"] = self._rv()
+        # 객체는 이후에 수정되므로 이벤트 시점의 내용으로 직렬화
+        line = (json.dumps({"type": event_type, "object": obj}) + "\n").encode()
+        self.event_log[kind].append((int(obj["metadata"]["resourceVersion"]), line))
+        for watch_kind, selector, queue in self.watchers:
+            if watch_kind == kind and _match(selector, obj["metadata"].get("labels", {})):
+                queue.put_nowait(line)
+
+    def populate(self, user_count: int):
+        """이미 배포된 사용자 agent(Deployment, Running Pod, Service)를 미리 만들어 둡니다."""
+        for index in range(user_count):
+            name = f"agent-existing-{index:05d}"
+            labels = {"app": name}
+            self.deployments[name] = {
+                "apiVersion": "apps/v1", "kind": "Deployment",
+                "metadata": {"name": name, "namespace": NAMESPACE, "generation": 1, "resourceVersion": self._rv()},
+                "spec": {
+                    "replicas": 1, "selector": {"matchLabels": labels},
+                    "template": {"metadata": {"labels": labels}, "spec": {"containers": [{"name": "agent", "image": "agent"}]}}
+                },
+                "status": {"observedGeneration": 1, "replicas": 1, "updatedReplicas": 1, "readyReplicas": 1}
+            }
+            pod_name = f"{name}-0"
+            self.pods[pod_name] = {
+                "apiVersion": "v1", "kind": "Pod",
+                "metadata": {
+                    "name": pod_name, "namespace": NAMESPACE, "labels": dict(labels),
+                    "creationTimestamp": _now(), "resourceVersion": self._rv()
+                },
+                "spec": {"containers": [{"name": "agent", "image": "agent"}]},
+                "status": {"phase": "Running", "podIP": "10.0.0.2"}
+            }
+            self.services[name] = {
+                "apiVersion": "v1", "kind": "Service",
+                "metadata": {"name": name, "namespace": NAMESPACE, "resourceVersion": self._rv()},
+                "spec": {"selector": dict(labels), "ports": [{"port": 80, "targetPort": 8001}], "type": "ClusterIP"}
+            }
+
+    def app(self) -> web.Application:
+        base_apps = f"/apis/apps/v1/namespaces/{NAMESPACE}/deployments"
+        base_core = f"/api/v1/namespaces/{NAMESPACE}"
+
+        @web.middleware
+        async def count_requests(request, handler):
+            resource = request.match_info.route.resource
+            self.requests[f"{request.method} {resource.canonical if resource else request.path}"] += 1
+            return await handler(request)
+
+        app = web.Application(middlewares=[count_requests])
+        app.router.add_get(base_apps, self.list_deployments)
+        app.router.add_get(f"{base_apps}/{{name}}", self.read_deployment)
+        app.router.add_put(f"{base_apps}/{{name}}", self.replace_deployment)
+        app.router.add_post(base_apps, self.create_deployment)
+        app.router.add_delete(f"{base_apps}/{{name}}", self.delete_deployment)
+        app.router.add_patch(f"{base_apps}/{{name}}/scale", self.scale_deployment)
+        app.router.add_get(f"{base_core}/pods", self.list_pods)
+        app.router.add_delete(f"{base_core}/pods/{{name}}", self.delete_pod)
+        app.router.add_get(f"{base_core}/services", self.list_services)
+        app.router.add_get(f"{base_core}/services/{{name}}", self.read_service)
+        app.router.add_post(f"{base_core}/services", self.create_service)
+        return app
+
+    async def _list_or_watch(self, request, kind: str, objects: dict, list_kind: str):
+        selector = request.query.get("labelSelector", "")
+        if request.query.get("watch", "").lower() == "true":
+            return await self._watch(request, kind, objects, selector)
+        items = [o for o in objects.values() if _match(selector, o["metadata"].get("labels", {}))]
+        return web.json_response({
+            "apiVersion": "v1", "kind": list_kind,
+            "metadata": {"resourceVersion": str(self.resource_version)}, "items": items
+        })
+
+    async def _watch(self, request, kind: str, objects: dict, selector: str):
+        timeout = float(request.query.get("timeoutSeconds", "120"))
+        since = request.query.get("resourceVersion")
+        queue = asyncio.Queue()
+        watcher = (kind, selector, queue)
+        if since:
+            # 지정한 resourceVersion 이후의 이벤트부터 재개
+            for rv, line in self.event_log[kind]:
+                if rv > int(since):
+                    queue.put_nowait(line)
+        else:
+            # resourceVersion 없이 시작한 watch는 현재 객체를 ADDED로 먼저 보냄
+            for obj in objects.values():
+                if _match(selector, obj["metadata"].get("labels", {})):
+                    queue.put_nowait((json.dumps({"type": "ADDED", "object": obj}) + "\n").encode())
+        self.watchers.append(watcher)
+        self.active_watches += 1
+        self.max_watches = max(self.max_watches, self.active_watches)
+
+        response = web.StreamResponse(headers={"Content-Type": "application/json"})
+        await response.prepare(request)
+        deadline = time.monotonic() + timeout
+        try:
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    line = await asyncio.wait_for(queue.get(), timeout=remaining)
+                except asyncio.TimeoutError:
+                    break
+                await response.write(line)
+        except (ConnectionResetError, asyncio.CancelledError):
+            # 클라이언트가 watch를 닫은 경우
+            pass
+        finally:
+            self.watchers.remove(watcher)
+            self.active_watches -= 1
+        return response
+
+    # Deployment
+    async def list_deployments(self, request):
+        return await self._list_or_watch(request, "deployments", self.deployments, "DeploymentList")
+
+    async def read_deployment(self, request):
+        deployment = self.deployments.get(request.match_info["name"])
+        return web.json_response(deployment) if deployment else _status(404, "NotFound")
+
+    async def create_deployment(self, request):
+        body = await request.json()
+        name = body["metadata"]["name"]
+        if name in self.deployments:
+            return _status(409, "AlreadyExists")
+        return web.json_response(self._store_deployment(name, body, generation=1), status=201)
+
+    async def replace_deployment(self, request):
+        name = request.match_info["name"]
+        if name not in self.deployments:
+            return _status(404, "NotFound")
+        body = await request.json()
+        generation = self.deployments[name]["metadata"]["generation"] + 1
+        return web.json_response(self._store_deployment(name, body, generation))
+
+    def _store_deployment(self, name: str, body: dict, generation: int) -> dict:
+        body["metadata"].update({"namespace": NAMESPACE, "generation": generation, "resourceVersion": self._rv()})
+        body["status"] = {"observedGeneration": generation, "replicas": 1, "updatedReplicas": 0, "readyReplicas": 0}
+        self.deployments[name] = body
+        self._emit("deployments", "ADDED" if generation == 1 else "MODIFIED", body)
+        asyncio.get_running_loop().create_task(self._rollout(name, generation))
+        return body
+
+    async def _rollout(self, name: str, generation: int):
+        """스케줄링/이미지 기동을 흉내 내어 새 Pod를 만들고, Running이 되면 이전 Pod를 삭제합니다."""
+        deployment = self.deployments[name]
+        template = deployment["spec"]["template"]
+        old_pods = [p for p in self.pods.values() if p["metadata"].get("labels", {}).get("app") == name]
+        pod_name = f"{name}-{uuid.uuid4().hex[:10]}"
+        pod = {
+            "apiVersion": "v1",
+            "kind": "Pod",
+            "metadata": {
+                "name": pod_name,
+                "namespace": NAMESPACE,
+                "labels": dict(template["metadata"].get("labels", {})),
+                "annotations": dict(template["metadata"].get("annotations", {})),
+                "creationTimestamp": _now(),
+                "resourceVersion": self._rv()
+            },
+            "spec": {"containers": [{"name": c["name"], "image": c["image"]} for c in template["spec"]["containers"]]},
+            "status": {"phase": "Pending"}
+        }
+        self.pods[pod_name] = pod
+        self._emit("pods", "ADDED", pod)
+
+        await asyncio.sleep(self.pod_start_delay)
+        pod["metadata"]["resourceVersion"] = self._rv()
+        pod["status"] = {
+            "phase": "Running",
+            "podIP": "10.0.0.1",
+            "containerStatuses": [
+                {"name": c["name"], "image": c["image"], "imageID": "", "ready": True, "restartCount": 0}
+                for c in pod["spec"]["containers"]
+            ]
+        }
+        self._emit("pods", "MODIFIED", pod)
+
+        for old in old_pods:
+            if self.pods.pop(old["metadata"]["name"], None):
+                self._emit("pods", "DELETED", old)
+        if self.deployments.get(name) is deployment and deployment["metadata"]["generation"] == generation:
+            deployment["status"].update({"updatedReplicas": 1, "readyReplicas": 1})
+            deployment["metadata"]["resourceVersion"] = self._rv()
+            self._emit("deployments", "MODIFIED", deployment)
+
+    async def delete_deployment(self, request):
+        deployment = self.deployments.pop(request.match_info["name"], None)
+        if not deployment:
+            return _status(404, "NotFound")
+        self._emit("deployments", "DELETED", deployment)
+        return web.json_response({"kind": "Status", "apiVersion": "v1", "status": "Success"})
+
+    async def scale_deployment(self, request):
+        name = request.match_info["name"]
+        if name not in self.deployments:
+            return _status(404, "NotFound")
+        replicas = (await request.json())["spec"]["replicas"]
+        deployment = self.deployments[name]
+        deployment["spec"]["replicas"] = replicas
+        deployment["metadata"]["resourceVersion"] = self._rv()
+        self._emit("deployments", "MODIFIED", deployment)
+        return web.json_response({
+            "apiVersion": "autoscaling/v1", "kind": "Scale",
+            "metadata": {"name": name, "namespace": NAMESPACE},
+            "spec": {"replicas": replicas}, "status": {"replicas": replicas}
+        })
+
+    # Pod
+    async def list_pods(self, request):
+        return await self._list_or_watch(request, "pods", self.pods, "PodList")
+
+    async def delete_pod(self, request):
+        pod = self.pods.pop(request.match_info["name"], None)
+        if not pod:
+            return _status(404, "NotFound")
+        self._emit("pods", "DELETED", pod)
+        return web.json_response(pod)
+
+    # Service
+    async def list_services(self, request):
+        return await self._list_or_watch(request, "services", self.services, "ServiceList")
+
+    async def read_service(self, request):
+        service = self.services.get(request.match_info["name"])
+        return web.json_response(service) if service else _status(404, "NotFound")
+
+    async def create_service(self, request):
+        body = await request.json()
+        name = body["metadata"]["name"]
+        if name in self.services:
+            return _status(409, "AlreadyExists")
+        body["metadata"].update({"namespace": NAMESPACE, "resourceVersion": self._rv()})
+        self.services[name] = body
+        self._emit("services", "ADDED", body)
+        return web.json_response(body, status=201)
+
+async def run_benchmark(concurrency: int, user_count: int, pod_start_delay: float, existing_users: int = 0):
+    fake = FakeKubeApi(pod_start_delay)
+    fake.populate(existing_users)
+    runner = web.AppRunner(fake.app())
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+
+    configuration = client.Configuration()
+    configuration.host = f"http://127.0.0.1:{port}"
+    await kube.start(configuration)
+    started = time.perf_counter()
+    await cluster_cache.start()
+    print(f"캐시 동기화: {(time.perf_counter() - started) * 1000:.0f}ms (기존 사용자 {existing_users}명)")
+    deploy_queue.start()
+
+    env = [{"name": "MCP_SERVICES", "value": "duckduckgo-search"}]
+    latencies, errors = [], []
+
+    async def deploy(index: int):
+        user_id = f"user-{index % user_count:04d}"
+        started = time.perf_counter()
+        try:
+            await deploy_queue.submit(user_id, env)
+            latencies.append((time.perf_counter() - started) * 1000)
+        except Exception as e:
+            errors.append(str(e))
+
+    print(f"동시 요청: {concurrency}, 사용자: {user_count}, Pod 기동 지연: {pod_start_delay}초, "
+          f"워커: {deploy_queue.workers}, 대기열: {deploy_queue.maxsize}")
+
+    # 1회차: 새 배포 (같은 사용자 요청은 진행 중인 작업에 합류)
+    started = time.perf_counter()
+    await asyncio.gather(*(deploy(i) for i in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    metrics = deploy_queue.metrics()
+    print(f"[새 배포]   전체: {elapsed:.2f}초, 처리량: {concurrency / elapsed:.1f}건/초, "
+          f"지연 p50: {percentile(latencies, 0.5):.0f}ms, p95: {percentile(latencies, 0.95):.0f}ms, "
+          f"실제 배포: {metrics['submitted']}, 합류: {metrics['joined']}, 실패: {len(errors)}")
+
+    # 2회차: 같은 설정 재요청 (설정 해시가 같으므로 재배포 없이 기존 Pod 반환)
+    latencies.clear()
+    started = time.perf_counter()
+    await asyncio.gather(*(deploy(i) for i in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    print(f"[재로그인] 전체: {elapsed:.2f}초, 처리량: {concurrency / elapsed:.1f}건/초, "
+          f"지연 p50: {percentile(latencies, 0.5):.0f}ms, p95: {percentile(latencies, 0.95):.0f}ms, 실패: {len(errors)}")
+
+    print(f"API 서버 최대 동시 watch: {fake.max_watches}, 요청 수: {sum(fake.requests.values())}")
+    for route, count in fake.requests.most_common():
+        print(f"  {route}: {count}")
+    if errors:
+        print(f"오류 예시: {errors[0]}")
+
+    await deploy_queue.stop()
+    await cluster_cache.stop()
+    await kube.close()
+    await runner.cleanup()
+
+if __name__ == "__main__":
+    concurrency = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    user_count = int(sys.argv[2]) if len(sys.argv) > 2 else 150
+    pod_start_delay = float(sys.argv[3]) if len(sys.argv) > 3 else 1.0
+    existing_users = int(sys.argv[4]) if len(sys.argv) > 4 else 0
+    asyncio.run(run_benchmark(concurrency, user_count, pod_start_delay, existing_users))
@@ -0,0 +1,171 @@
+import asyncio, hashlib, json, logging, os, time
+from typing import Any, Dict, List, Optional
+from agents.mcp.server import MCPServerStdio
+from mcp.types import Tool as MCPTool
+
+logger = logging.getLogger(__name__)
+
+class ToolListCache:
+    """
+    MCP 서버별 도구 목록(이름, 설명, 입력 스키마)을 디스크에 저장하는 캐시.
+
+    키는 서버 이름과 실행 명령·인자(및 도구 목록에 영향을 주는 환경 변수 값)의 해시이며,
+    도구 스키마만 저장하므로 API 키 같은 값은 파일에 남지 않습니다.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def _path(self, name: str, cfg: Dict[str, Any]) -> str:
+        params = cfg["params"]
+        content = {
+            "command": params.get("command"),
+            "args": params.get("args", []),
+            "env": {key: params.get("env", {}).get(key, "") for key in cfg.get("tool_cache_env", [])}
+        }
+        digest = hashlib.sha256(json.dumps(content, sort_keys=True).encode()).hexdigest()[:16]
+        return os.path.join(self.directory, f"{name}-{digest}.json")
+
+    def load(self, name: str, cfg: Dict[str, Any]) -> Optional[List[MCPTool]]:
+        try:
+            with open(self._path(name, cfg), encoding="utf-8") as f:
+                return [MCPTool.model_validate(item) for item in json.load(f)]
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"도구 목록 캐시를 읽지 못했습니다 - {name}: {str(e)}")
+            return None
+
+    def save(self, name: str, cfg: Dict[str, Any], tools: List[MCPTool]):
+        path = self._path(name, cfg)
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            # 같은 노드의 다른 Pod와 공유하므로 임시 파일에 쓴 뒤 교체
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump([tool.model_dump(mode="json") for tool in tools], f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning(f"도구 목록 캐시를 저장하지 못했습니다 - {name}: {str(e)}")
+
+class LazyMCPServer(MCPServerStdio):
+    """
+    도구 목록은 캐시에서 바로 제공하고, stdio 프로세스는 첫 도구 호출 때 시작하는 MCP 서버.
+
+    캐시가 없으면 처음 한 번만 프로세스를 띄워 도구 목록을 받아 저장합니다.
+    idle_timeout 동안 호출이 없으면 stop_if_idle()이 프로세스를 중지하고, 다음 호출 때 다시 시작합니다.
+    MCP 세션은 같은 태스크에서 열고 닫아야 하므로 전용 태스크가 세션을 소유합니다.
+    """
+
+    def __init__(self, name: str, cfg: Dict[str, Any], tool_cache: ToolListCache, connect_timeout: float):
+        super().__init__(params=cfg["params"], cache_tools_list=True, name=name)
+        self._cfg = cfg
+        self._tool_cache = tool_cache
+        self._connect_timeout = connect_timeout
+        self._tools: Optional[List[MCPTool]] = tool_cache.load(name, cfg)
+        self._lock = asyncio.Lock()
+        self._owner: Optional[asyncio.Task] = None
+        self._stop: Optional[asyncio.Event] = None
+        self._in_flight = 0
+        self._last_used = time.monotonic()
+        # 메트릭
+        self.activations = 0
+        self.idle_stops = 0
+
+    @property
+    def active(self) -> bool:
+        return self._owner is not None and not self._owner.done()
+
+    async def connect(self):
+        """도구 목록 캐시가 있으면 프로세스를 띄우지 않습니다."""
+        if self._tools is None:
+            await self._ensure_active()
+
+    async def list_tools(self, run_context=None, agent=None) -> List[MCPTool]:
+        if self._tools is None:
+            await self._ensure_active()
+        return self._tools
+
+    async def call_tool(self, tool_name: str, arguments: Optional[Dict[str, Any]], **kwargs):
+        await self._ensure_active()
+        self._in_flight += 1
+        try:
+            return await super().call_tool(tool_name, arguments, **kwargs)
+        finally:
+            self._in_flight -= 1
+            self._last_used = time.monotonic()
+
+    async def cleanup(self):
+        await self._deactivate()
+
+    async def stop_if_idle(self, idle_timeout: float) -> bool:
+        """진행 중인 호출이 없고 idle_timeout 동안 사용되지 않았으면 프로세스를 중지합니다."""
+        async with self._lock:
+            if not self.active or self._in_flight or time.monotonic() - self._last_used < idle_timeout:
+                return False
+            await self._deactivate()
+        self.idle_stops += 1
+        logger.info(f"유휴 MCP 서버 중지 - {self.name}")
+        return True
+
+    async def _ensure_active(self):
+        self._last_used = time.monotonic()
+        if self.active:
+            return
+        async with self._lock:
+            if self.active:
+                return
+            # 실행 중에 끊긴 이전 세션 정리
+            await self._deactivate()
+            started = time.perf_counter()
+            ready = asyncio.get_running_loop().create_future()
+            self._stop = asyncio.Event()
+            self._owner = asyncio.create_task(self._hold_session(ready))
+            try:
+                await asyncio.wait_for(asyncio.shield(ready), timeout=self._connect_timeout)
+                # 이미지 업데이트 등으로 도구가 바뀌었을 수 있으므로 실행 중인 서버 기준으로 캐시 갱신
+                tools = await super().list_tools()
+            except BaseException:
+                await self._deactivate()
+                raise
+            if self._tools is None or [t.model_dump() for t in tools] != [t.model_dump() for t in self._tools]:
+                self._tool_cache.save(self.name, self._cfg, tools)
+            self._tools = tools
+            self.activations += 1
+            self._last_used = time.monotonic()
+            logger.info(f"MCP 서버 시작 - {self.name}, 소요: {(time.perf_counter() - started) * 1000:.1f}ms")
+
+    async def _hold_session(self, ready: asyncio.Future):
+        try:
+            await super().connect()
+            ready.set_result(None)
+            await self._stop.wait()
+        except BaseException as e:
+            if not ready.done():
+                if isinstance(e, asyncio.CancelledError):
+                    ready.cancel()
+                else:
+                    ready.set_exception(e)
+            raise
+        finally:
+            await super().cleanup()
+
+    async def _deactivate(self):
+        owner, self._owner = self._owner, None
+        if owner is None:
+            return
+        if self._stop is not None:
+            self._stop.set()
+        try:
+            await asyncio.wait_for(owner, timeout=5)
+        except Exception:
+            # 연결 중이라 종료 신호를 받지 못했거나 이미 실패한 세션
+            owner.cancel()
+            await asyncio.gather(owner, return_exceptions=True)
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "process": "running" if self.active else "stopped",
+            "activations": self.activations,
+            "idle_stops": self.idle_stops
+        }
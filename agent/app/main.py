@@ -1,18 +1,79 @@
 import os
-from fastapi import FastAPI, HTTPException
+import hmac
+import hashlib
+import time
+import json
+import asyncio
+import logging
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import StreamingResponse, JSONResponse
 from agents import Agent, Runner, set_default_openai_client, OpenAIChatCompletionsModel, RunConfig, ModelSettings
-from agents.mcp.server import MCPServerStdio
+from agents.mcp.server import MCPServerStdio, MCPServerStreamableHttp
+from app.lazy_mcp import LazyMCPServer, ToolListCache
+from app.result_cache import ToolResultCache, CachedLazyMCPServer, CachedMCPServerStdio, CachedMCPServerStreamableHttp
+from app.tenants import Tenant, TenantRegistry, TenantNotConfigured, FairScheduler
 from openai import AsyncOpenAI
 from pydantic import BaseModel
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Mapping, Tuple
+from contextlib import asynccontextmanager
+from collections import OrderedDict
 from datetime import date
 
 app = FastAPI()
 
+logger = logging.getLogger(__name__)
+
+# 웜 풀 모드: 사용자 설정 없이 시작해 runtime config 엔드포인트로 설정을 주입받음 (agent-operator가 관리)
+WARM_POOL_MODE = os.getenv("AGENT_WARM_POOL", "false").lower() == "true"
+# 주입받은 설정 저장 위치 (emptyDir에 두어 컨테이너 재시작 시 복원)
+RUNTIME_CONFIG_PATH = os.getenv("AGENT_RUNTIME_CONFIG_PATH", "/var/run/agent/runtime.json")
+# MCP 서버 하나의 연결(도구 목록 조회 포함) 제한 시간, 서버 설정의 "timeout"으로 개별 지정 가능
+MCP_CONNECT_TIMEOUT = float(os.getenv("MCP_CONNECT_TIMEOUT", "20"))
+# 연결에 실패한 MCP 서버 재시도 간격 (실패할 때마다 2배, 최대값까지)
+MCP_RETRY_INTERVAL = float(os.getenv("MCP_RETRY_INTERVAL", "10"))
+MCP_RETRY_MAX_INTERVAL = float(os.getenv("MCP_RETRY_MAX_INTERVAL", "300"))
+# 지연 시작 모드: 도구 목록은 캐시에서 제공하고 MCP 프로세스는 첫 도구 호출 때 시작, 유휴 시간이 지나면 중지
+MCP_LAZY_ACTIVATION = os.getenv("MCP_LAZY_ACTIVATION", "true").lower() == "true"
+MCP_IDLE_TIMEOUT = float(os.getenv("MCP_IDLE_TIMEOUT", "600"))
+MCP_IDLE_CHECK_INTERVAL = float(os.getenv("MCP_IDLE_CHECK_INTERVAL", "60"))
+# 도구 목록 캐시 위치 (operator가 노드 단위 hostPath를 마운트해 Pod 간에 공유)
+MCP_TOOL_CACHE_DIR = os.getenv("MCP_TOOL_CACHE_DIR", "/var/cache/agent/mcp-tools")
+# 자격 증명이 필요 없는 MCP 서버("shared")를 공유 gateway로 연결 (비어 있으면 Pod 안에서 직접 실행)
+MCP_GATEWAY_URL = os.getenv("MCP_GATEWAY_URL", "").rstrip("/")
+MCP_GATEWAY_CALL_TIMEOUT = float(os.getenv("MCP_GATEWAY_CALL_TIMEOUT", "60"))
+# 실행 중 MCP 서버 추가·제거 엔드포인트(/control) 인증 토큰 (operator가 주입, 비어 있으면 엔드포인트 비활성화)
+AGENT_CONTROL_TOKEN = os.getenv("AGENT_CONTROL_TOKEN", "")
+# 멀티 테넌트 모드: 한 프로세스에서 여러 사용자를 처리 (사용자별 Agent·MCP 서버 세트를 요청의 user_id로 찾음)
+MULTI_TENANT_MODE = os.getenv("AGENT_MULTI_TENANT", "false").lower() == "true"
+# 메모리에 유지할 사용자 수 (넘으면 가장 오래 사용하지 않은 사용자부터 정리), 유휴 사용자 정리 시간
+AGENT_MAX_TENANTS = int(os.getenv("AGENT_MAX_TENANTS", "200"))
+AGENT_TENANT_IDLE_TIMEOUT = float(os.getenv("AGENT_TENANT_IDLE_TIMEOUT", "1800"))
+# Runner 동시 실행 수 (전체 / 사용자당), 자리가 나면 대기 중인 사용자를 돌아가며 실행
+AGENT_MAX_CONCURRENT_RUNS = int(os.getenv("AGENT_MAX_CONCURRENT_RUNS", "32"))
+AGENT_MAX_RUNS_PER_TENANT = int(os.getenv("AGENT_MAX_RUNS_PER_TENANT", "2"))
+# MCP 도구 호출 결과 캐시 (서버 설정에 "result_cache" 정책이 있는 서버만), 전체 / 결과 하나의 최대 크기(바이트)
+TOOL_RESULT_CACHE_ENABLED = os.getenv("TOOL_RESULT_CACHE_ENABLED", "true").lower() == "true"
+TOOL_RESULT_CACHE_MAX_BYTES = int(os.getenv("TOOL_RESULT_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+TOOL_RESULT_CACHE_MAX_ENTRY_BYTES = int(os.getenv("TOOL_RESULT_CACHE_MAX_ENTRY_BYTES", str(256 * 1024)))
+
+# backend에서 구간별 지연을 측정할 수 있도록 agent 처리 시간을 헤더로 전달
+@app.middleware("http")
+async def add_server_timing(request: Request, call_next):
+    started = time.perf_counter()
+    response = await call_next(request)
+    response.headers["Server-Timing"] = f"agent;dur={(time.perf_counter() - started) * 1000:.1f}"
+    return response
+
 @app.get("/health")
 def health_check():
     return {"status": "ok"}
 
+# MCP 서버별 연결 상태 (connecting → ready / failed, failed는 백그라운드에서 재시도), /ready에서 조회
+MCP_CONNECTING = "connecting"
+MCP_READY = "ready"
+MCP_FAILED = "failed"
+mcp_status: Dict[str, Dict[str, Any]] = {}
+
 #############################################
 
 # OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
@@ -20,19 +81,44 @@ def health_check():
 #     raise RuntimeError("OPENAI_API_KEY 환경 변수가 설정되지 않았습니다.")
 # os.environ["OPENAI_API_KEY"] = OPENAI_API_KEY
 
-GMS_API_KEY = os.getenv("GMS_API_KEY")
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-os.environ["OPENAI_API_KEY"] = OPENAI_API_KEY                   # Openai의 트레이싱을 하는데 사용할 개인 Openai Key
 base_url="https://gms.p.ssafy.io/gmsapi/api.openai.com/v1"
-gms_client = AsyncOpenAI(api_key=GMS_API_KEY, base_url=base_url)    # 실제 API 호출은 GMS를 사용
-set_default_openai_client(gms_client, use_for_tracing=False)        # 트레이싱에는 GMS를 사용하지 않음
+gms_model: OpenAIChatCompletionsModel | None = None
+
+def configure_model():
+    """환경 변수의 API 키로 GMS 클라이언트와 모델을 구성합니다 (웜 풀 모드에서는 설정 주입 후 호출)."""
+    global gms_model
+    GMS_API_KEY = os.getenv("GMS_API_KEY")
+    OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+    if OPENAI_API_KEY:
+        os.environ["OPENAI_API_KEY"] = OPENAI_API_KEY               # Openai의 트레이싱을 하는데 사용할 개인 Openai Key
+    gms_client = AsyncOpenAI(api_key=GMS_API_KEY, base_url=base_url)    # 실제 API 호출은 GMS를 사용
+    set_default_openai_client(gms_client, use_for_tracing=False)        # 트레이싱에는 GMS를 사용하지 않음
+
+    # gms_client 를 사용한 모델 지정 
+    gms_model = OpenAIChatCompletionsModel(
+        model="gpt-4.1",
+        # model="o3-mini",
+        openai_client=gms_client,
+    )
 
-# gms_client 를 사용한 모델 지정 
-gms_model = OpenAIChatCompletionsModel(
-    model="gpt-4.1",
-    # model="o3-mini",
-    openai_client=gms_client,
-)
+# 멀티 테넌트 모드의 API 키(해시)별 모델 (같은 키를 쓰는 사용자끼리 클라이언트 커넥션 풀을 공유)
+# 테넌트 수만큼만 유지하고 가장 오래 쓰지 않은 키부터 버림 (이미 만든 테넌트 Agent는 모델을 계속 참조)
+_tenant_models: "OrderedDict[str, OpenAIChatCompletionsModel]" = OrderedDict()
+
+def tenant_model(api_key: Optional[str]) -> OpenAIChatCompletionsModel:
+    """사용자 설정의 GMS API 키로 모델을 반환합니다 (키가 없거나 프로세스 기본 키와 같으면 기본 모델)."""
+    if not api_key or api_key == os.getenv("GMS_API_KEY"):
+        return gms_model
+    key = hashlib.sha256(api_key.encode()).hexdigest()
+    model = _tenant_models.get(key)
+    if model is None:
+        model = OpenAIChatCompletionsModel(model="gpt-4.1", openai_client=AsyncOpenAI(api_key=api_key, base_url=base_url))
+        _tenant_models[key] = model
+        while len(_tenant_models) > AGENT_MAX_TENANTS:
+            _tenant_models.popitem(last=False)
+    else:
+        _tenant_models.move_to_end(key)
+    return model
 
 #############################################
 
@@ -42,128 +128,635 @@ class AgentRequest(BaseModel):
     text: str
     user_id: Optional[str] = None
     conversation_history: Optional[List[Dict[str, Any]]] = None
+    # 히스토리 창 밖으로 밀려난 이전 대화의 누적 요약 (backend에서 토큰 예산에 맞춰 구성)
+    conversation_summary: Optional[str] = None
+    # 최근 창보다 앞선 턴 중 현재 질문과 관련도가 높은 턴 (backend 임베딩 검색 결과, 시간순)
+    relevant_history: Optional[List[Dict[str, Any]]] = None
     use_conversation_context: Optional[bool] = False
+    # 멀티 테넌트 모드의 사용자 설정 (API 키, MCP_SERVICES, MCP 환경 변수), 등록된 설정이 없거나 바뀌었을 때만 전달
+    env: Optional[List[Dict[str, str]]] = None
 
-# MCP 서버들 설정
-MCP_SERVER_CONFIG = {
-    "notion": {
-        "type": "stdio",
-        "params": {"command": "mcp-notion-server", 
-                   "args": ["--enabledTools=notion_retrieve_block,notion_retrieve_block_children,notion_append_block_children,notion_retrieve_page,notion_search"], 
-                   "env": {"NOTION_API_TOKEN": os.getenv("NOTION_API_TOKEN", "")}}
-    },
-    "gitlab": {
-        "type": "stdio",
-        "params": {"command": "mcp-gitlab", "args": [], "env": {"GITLAB_PERSONAL_ACCESS_TOKEN": os.getenv("GITLAB_PERSONAL_ACCESS_TOKEN", ""), "GITLAB_API_URL": os.getenv("GITLAB_API_URL", ""), "GITLAB_READ_ONLY_MODE": os.getenv("GITLAB_READ_ONLY_MODE", "true")}}
-    },
-    "duckduckgo-search": {
-        "type": "stdio",
-        "params": { "command": "duckduckgo-mcp-server", "args": [], "env": {}}
-    },
-    "korean-spell-checker": {
-        "type": "stdio",
-        "params": { "command": "mcp-korean-spell", "args": [], "env": {}}
-    },
-    "sequentialthinking": {
-        "type": "stdio",
-        "params": {"command": "mcp-server-sequential-thinking", "args": [], "env": {}}
-    },
-    "airbnb": {
-        "type": "stdio",
-        "params": {"command": "mcp-server-airbnb", "args": ["--ignore-robots-txt"], "env": {}}
-    },
-    "github": {
-        "type": "stdio",
-        "params": {"command": "mcp-server-github", "args": [], "env": {"GITHUB_PERSONAL_ACCESS_TOKEN": os.getenv("GITHUB_PERSONAL_ACCESS_TOKEN", "")}}
-        # "params": {"command": "npx", "args": ["-y", "@modelcontextprotocol/server-github"], "env": {"GITHUB_PERSONAL_ACCESS_TOKEN": os.getenv("GITHUB_PERSONAL_ACCESS_TOKEN", "")}}
-    },
-    "kakao-map": {
-        "type": "stdio",
-        "params": {"command": "node", "args": ["/srv/mcp-server-kakao-map/dist/index.js"],
-        "env": {"KAKAO_API_KEY": os.getenv("KAKAO_API_KEY", "")}
-        }
-    },
-    "figma": {
-      "type": "stdio",
-      "params": {"command": "figma-developer-mcp",
-        "args": [f"--figma-api-key={os.getenv('FIGMA_API_KEY', '')}", "--stdio"], "env": {}
-        }
-    },
-    "paper-search": {
-      "type": "stdio",
-      "params": {"command": "uv", 
-                 "args": ["run", "--directory", "/srv/paper-search-mcp", "-m", "paper_search_mcp.server"], 
-                 "env": {}}
-    },
-    # "chess-local": {
-    #   "type": "stdio",
-    #   "params": {"command": "uv",
-    #     "args": ["--directory", "/srv/chess-mcp", "run", "src/chess_mcp/main.py"],"env": {}}
-    # },
-
-    "dart-mcp": {
-        "type": "stdio",
-        "params": {"command": "uv",
-            "args": ["run", "--directory", "/srv/dart-mcp", "dart.py"],
-            "env": {"DART_API_KEY": os.getenv("DART_API_KEY", "")}}
-    },
-    "poke-mcp": {
-        "type": "stdio",
-        "params": {
-            "command": "npx",
-            "args": ["ts-node", "/srv/poke-mcp/src/index.ts"],
-            "env": {}
+# MCP 서버들 설정 (환경 변수를 호출 시점에 읽으므로 설정 주입 후 다시 만들 수 있음)
+# "result_cache": 도구 호출 결과 캐시 정책 - "ttl" 기본 TTL(초), "tools" 도구별 TTL(0이면 캐시하지 않음),
+#                 "mutating" 캐시하지 않고 호출 시 이 서버의 캐시를 비우는 변경 도구 (정책이 없는 서버는 캐시하지 않음)
+def load_mcp_server_config(env: Optional[Mapping[str, str]] = None) -> Dict[str, Dict[str, Any]]:
+    # 멀티 테넌트 모드에서는 프로세스 환경 변수 대신 사용자별 설정(env)에서 자격 증명을 읽음
+    getenv = os.getenv if env is None else env.get
+    return {
+        "notion": {
+            "type": "stdio",
+            "params": {"command": "mcp-notion-server", 
+                       "args": ["--enabledTools=notion_retrieve_block,notion_retrieve_block_children,notion_append_block_children,notion_retrieve_page,notion_search"], 
+                       "env": {"NOTION_API_TOKEN": getenv("NOTION_API_TOKEN", "")}},
+            "result_cache": {"ttl": 120, "tools": {"notion_search": 60}, "mutating": ["notion_append_block_children"]}
+        },
+        "gitlab": {
+            "type": "stdio",
+            # 읽기 전용 모드에 따라 제공하는 도구가 달라지므로 도구 목록 캐시 키에 포함
+            "tool_cache_env": ["GITLAB_READ_ONLY_MODE"],
+            "params": {"command": "mcp-gitlab", "args": [], "env": {"GITLAB_PERSONAL_ACCESS_TOKEN": getenv("GITLAB_PERSONAL_ACCESS_TOKEN", ""), "GITLAB_API_URL": getenv("GITLAB_API_URL", ""), "GITLAB_READ_ONLY_MODE": getenv("GITLAB_READ_ONLY_MODE", "true")}}
+        },
+        "duckduckgo-search": {
+            "type": "stdio",
+            "shared": True,
+            "params": { "command": "duckduckgo-mcp-server", "args": [], "env": {}},
+            "result_cache": {"ttl": 600}
+        },
+        "korean-spell-checker": {
+            "type": "stdio",
+            "shared": True,
+            "params": { "command": "mcp-korean-spell", "args": [], "env": {}},
+            "result_cache": {"ttl": 86400}
+        },
+        "sequentialthinking": {
+            "type": "stdio",
+            "shared": True,
+            "params": {"command": "mcp-server-sequential-thinking", "args": [], "env": {}}
+        },
+        "airbnb": {
+            "type": "stdio",
+            "shared": True,
+            "params": {"command": "mcp-server-airbnb", "args": ["--ignore-robots-txt"], "env": {}},
+            "result_cache": {"ttl": 300}
+        },
+        "github": {
+            "type": "stdio",
+            "params": {"command": "mcp-server-github", "args": [], "env": {"GITHUB_PERSONAL_ACCESS_TOKEN": getenv("GITHUB_PERSONAL_ACCESS_TOKEN", "")}}
+            # "params": {"command": "npx", "args": ["-y", "@modelcontextprotocol/server-github"], "env": {"GITHUB_PERSONAL_ACCESS_TOKEN": os.getenv("GITHUB_PERSONAL_ACCESS_TOKEN", "")}}
+        },
+        "kakao-map": {
+            "type": "stdio",
+            "params": {"command": "node", "args": ["/srv/mcp-server-kakao-map/dist/index.js"],
+            "env": {"KAKAO_API_KEY": getenv("KAKAO_API_KEY", "")}
+            },
+            "result_cache": {"ttl": 1800}
+        },
+        "figma": {
+          "type": "stdio",
+          "params": {"command": "figma-developer-mcp",
+            "args": [f"--figma-api-key={getenv('FIGMA_API_KEY', '')}", "--stdio"], "env": {}
+            }
+        },
+        "paper-search": {
+          "type": "stdio",
+          "timeout": 45,
+          "shared": True,
+          "params": {"command": "uv", 
+                     "args": ["run", "--directory", "/srv/paper-search-mcp", "-m", "paper_search_mcp.server"], 
+                     "env": {}},
+          "result_cache": {"ttl": 3600}
+        },
+        # "chess-local": {
+        #   "type": "stdio",
+        #   "params": {"command": "uv",
+        #     "args": ["--directory", "/srv/chess-mcp", "run", "src/chess_mcp/main.py"],"env": {}}
+        # },
+
+        "dart-mcp": {
+            "type": "stdio",
+            "timeout": 45,
+            "params": {"command": "uv",
+                "args": ["run", "--directory", "/srv/dart-mcp", "dart.py"],
+                "env": {"DART_API_KEY": getenv("DART_API_KEY", "")}},
+            "result_cache": {"ttl": 1800}
+        },
+        "poke-mcp": {
+            "type": "stdio",
+            "timeout": 60,
+            "params": {
+                "command": "npx",
+                "args": ["ts-node", "/srv/poke-mcp/src/index.ts"],
+                "env": {}
+            }
         }
     }
 
-
-
-
-}
-
-# 환경변수 MCP_SERVICES 기반으로 사용할 서비스만 필터링
-services_env = os.getenv("MCP_SERVICES", "")
-if services_env:
-    allowed = [s.strip() for s in services_env.split(",") if s.strip()]
-    MCP_SERVER_CONFIG = {k: v for k, v in MCP_SERVER_CONFIG.items() if k in allowed}
+def select_mcp_server_config(env: Optional[Mapping[str, str]] = None) -> Dict[str, Dict[str, Any]]:
+    """환경변수 MCP_SERVICES 기반으로 사용할 서비스만 필터링"""
+    config = load_mcp_server_config(env)
+    services_env = (os.environ if env is None else env).get("MCP_SERVICES", "")
+    if services_env:
+        allowed = [s.strip() for s in services_env.split(",") if s.strip()]
+        config = {k: v for k, v in config.items() if k in allowed}
+    return config
 
 agent: Agent | None = None
-servers: list[MCPServerStdio] = []
+servers: list[MCPServerStdio | MCPServerStreamableHttp] = []
+tool_list_cache = ToolListCache(MCP_TOOL_CACHE_DIR)
+# 멀티 테넌트 모드에서는 사용자 간에 공유 (자격 증명이 다르면 캐시 범위가 달라 결과를 공유하지 않음)
+tool_result_cache = ToolResultCache(TOOL_RESULT_CACHE_MAX_BYTES, TOOL_RESULT_CACHE_MAX_ENTRY_BYTES)
+# 웜 풀 모드에서 설정을 주입받은 사용자
+runtime_user_id: Optional[str] = None
+_configure_lock = asyncio.Lock()
+_startup_task: Optional[asyncio.Task] = None
+# 연결에 실패한 MCP 서버의 재시도 작업
+_retry_tasks: Dict[str, asyncio.Task] = {}
+_idle_stop_task: Optional[asyncio.Task] = None
+# 현재 적용된 MCP 서버별 설정 (실행 중 설정 변경 시 바뀐 서버만 다시 연결하기 위해 비교)
+_applied_configs: Dict[str, Dict[str, Any]] = {}
+# 마지막으로 적용한 /control 설정 버전 (늦게 도착한 이전 요청 무시)
+_control_revision = 0
+# 사용자 설정에서 온 환경 변수 이름 (/control 전체 설정에서 빠진 키를 지우기 위해 operator가 AGENT_USER_ENV로 전달)
+_user_env_keys = {key for key in os.getenv("AGENT_USER_ENV", "").split(",") if key}
 
-def format_conversation_history(history: List[Dict[str, Any]]) -> str:
-    """대화 히스토리를 컨텍스트 문자열로 포맷팅"""
-    if not history:
-        return ""
-    
-    formatted_parts = ["이전 대화 내역:"]
-    for item in history[-5:]:  # 최근 5개 대화만 사용
+def _format_turns(turns: Optional[List[Dict[str, Any]]]) -> List[str]:
+    parts = []
+    for item in turns or []:
         user_msg = item.get('user', '')
         assistant_msg = item.get('assistant', '')
         
         if user_msg and assistant_msg:
-            formatted_parts.append(f"사용자: {user_msg}")
-            formatted_parts.append(f"어시스턴트: {assistant_msg}")
+            parts.append(f"사용자: {user_msg}")
+            parts.append(f"어시스턴트: {assistant_msg}")
+    return parts
+
+def format_conversation_history(history: List[Dict[str, Any]], summary: Optional[str] = None,
+                                relevant: Optional[List[Dict[str, Any]]] = None) -> str:
+    """대화 요약, 관련 대화, 히스토리를 컨텍스트 문자열로 포맷팅 (개수/길이 제한은 backend에서 토큰 예산으로 적용)"""
+    if not history and not summary and not relevant:
+        return ""
+    
+    formatted_parts = []
+    if summary:
+        formatted_parts.append("이전 대화 요약:")
+        formatted_parts.append(summary)
+    if relevant:
+        formatted_parts.append("관련된 이전 대화:")
+        formatted_parts.extend(_format_turns(relevant))
+    if history:
+        formatted_parts.append("이전 대화 내역:")
+        formatted_parts.extend(_format_turns(history))
     
     return "\n".join(formatted_parts)
 
-# 앱 시작 시 필요한 서버만 연결하고 Agent 초기화
-@app.on_event("startup")
-async def startup_event():
-    global agent, servers
-    for name, cfg in MCP_SERVER_CONFIG.items():
-        srv = MCPServerStdio(params=cfg["params"], cache_tools_list=True, name=name)
-        await srv.connect()
-        servers.append(srv)
-    agent = Agent(
+async def _start_mcp_server(srv: MCPServerStdio) -> list:
+    await srv.connect()
+    # 첫 요청에서 도구 목록을 받느라 지연되지 않도록 미리 조회해 캐시
+    return await srv.list_tools()
+
+def _create_mcp_server(name: str, cfg: Dict[str, Any], timeout: float, lazy: bool) -> MCPServerStdio | MCPServerStreamableHttp:
+    if MCP_GATEWAY_URL and cfg.get("shared"):
+        # 공유 gateway의 Streamable HTTP 엔드포인트 (Pod 안에 프로세스를 띄우지 않음)
+        srv = CachedMCPServerStreamableHttp(
+            params={"url": f"{MCP_GATEWAY_URL}/mcp/{name}/", "timeout": timeout},
+            cache_tools_list=True,
+            name=name,
+            client_session_timeout_seconds=MCP_GATEWAY_CALL_TIMEOUT
+        )
+    elif lazy and cfg.get("lazy", True):
+        srv = CachedLazyMCPServer(name, cfg, tool_list_cache, connect_timeout=timeout)
+    else:
+        srv = CachedMCPServerStdio(params=cfg["params"], cache_tools_list=True, name=name)
+    if TOOL_RESULT_CACHE_ENABLED and cfg.get("result_cache"):
+        srv.enable_result_cache(tool_result_cache, cfg["result_cache"], cfg["params"])
+    return srv
+
+async def _cleanup_mcp_server(name: str, srv: MCPServerStdio | MCPServerStreamableHttp):
+    """연결하지 못한 MCP 서버의 프로세스·세션을 정리합니다 (호출한 작업이 다시 취소돼도 정리는 끝까지 진행)."""
+    try:
+        await asyncio.shield(srv.cleanup())
+    except Exception as e:
+        logger.warning(f"MCP 서버 정리 실패 - {name}: {str(e)}")
+
+async def _open_mcp_server(name: str, cfg: Dict[str, Any], attempts: int = 1,
+                           lazy: bool = MCP_LAZY_ACTIVATION) -> Tuple[Optional[MCPServerStdio | MCPServerStreamableHttp], Dict[str, Any]]:
+    """MCP 서버 하나를 제한 시간 안에 연결하고 (서버, 상태)를 반환합니다. 실패하면 프로세스를 정리하고 서버는 None."""
+    started = time.perf_counter()
+    timeout = cfg.get("timeout", MCP_CONNECT_TIMEOUT)
+    srv = _create_mcp_server(name, cfg, timeout, lazy)
+    try:
+        tools = await asyncio.wait_for(_start_mcp_server(srv), timeout=timeout)
+    except Exception as e:
+        error = f"{timeout:.0f}초 안에 연결되지 않음" if isinstance(e, asyncio.TimeoutError) else str(e)
+        await _cleanup_mcp_server(name, srv)
+        return None, {
+            "state": MCP_FAILED,
+            "tools": 0,
+            "attempts": attempts,
+            "error": error,
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 1)
+        }
+    except BaseException:
+        # 연결 중 취소(핫 제거·재시도 취소·종료)돼도 시작한 프로세스를 남기지 않도록 정리한 뒤 그대로 전파
+        await _cleanup_mcp_server(name, srv)
+        raise
+    return srv, {
+        "state": MCP_READY,
+        "tools": len(tools),
+        "attempts": attempts,
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 1),
+        # 지연 시작 서버는 도구 목록만 캐시에서 읽고 프로세스는 첫 호출 때 시작
+        "lazy": isinstance(srv, LazyMCPServer),
+        "transport": "gateway" if isinstance(srv, MCPServerStreamableHttp) else "stdio"
+    }
+
+async def _connect_mcp_server(name: str, cfg: Dict[str, Any]) -> bool:
+    """MCP 서버 하나를 연결하고 상태를 기록합니다. 연결되면 servers에 추가하고 True."""
+    attempts = mcp_status.get(name, {}).get("attempts", 0) + 1
+    mcp_status[name] = {"state": MCP_CONNECTING, "tools": 0, "attempts": attempts}
+    srv, mcp_status[name] = await _open_mcp_server(name, cfg, attempts)
+    if srv is None:
+        return False
+    servers.append(srv)
+    return True
+
+async def _idle_stop_loop():
+    """
+    지연 시작 MCP 서버 중 MCP_IDLE_TIMEOUT 동안 호출되지 않은 프로세스를 주기적으로 중지합니다.
+    멀티 테넌트 모드에서는 AGENT_TENANT_IDLE_TIMEOUT 동안 사용하지 않은 사용자의 MCP 서버 세트도 정리합니다.
+    """
+    while True:
+        await asyncio.sleep(MCP_IDLE_CHECK_INTERVAL)
+        if MULTI_TENANT_MODE:
+            tenant_registry.evict_idle()
+        for srv in list(servers) + tenant_registry.servers():
+            if isinstance(srv, LazyMCPServer):
+                try:
+                    await srv.stop_if_idle(MCP_IDLE_TIMEOUT)
+                except Exception as e:
+                    logger.warning(f"유휴 MCP 서버 중지 실패 - {srv.name}: {str(e)}")
+
+async def _retry_mcp_server(name: str, cfg: Dict[str, Any]):
+    """연결에 실패한 MCP 서버를 간격을 늘려 가며 다시 연결합니다. 연결되면 Agent 도구 목록에 바로 포함됩니다."""
+    delay = MCP_RETRY_INTERVAL
+    try:
+        while True:
+            await asyncio.sleep(delay)
+            if await _connect_mcp_server(name, cfg):
+                logger.info(f"MCP 서버 재연결 성공 - {name}, 시도: {mcp_status[name]['attempts']}회")
+                return
+            logger.warning(f"MCP 서버 재연결 실패 - {name}: {mcp_status[name]['error']}")
+            delay = min(delay * 2, MCP_RETRY_MAX_INTERVAL)
+    finally:
+        # 설정 반영으로 취소된 뒤 같은 이름으로 새 재시도 작업이 등록됐을 수 있으므로 자신일 때만 제거
+        if _retry_tasks.get(name) is asyncio.current_task():
+            del _retry_tasks[name]
+
+def _log_startup_report(total_ms: float):
+    """MCP 서버별 시작 소요 시간을 느린 순서로 기록합니다."""
+    logger.info(f"MCP 서버 시작 보고 - 전체: {total_ms:.1f}ms")
+    for name, status in sorted(mcp_status.items(), key=lambda item: -item[1].get("elapsed_ms", 0)):
+        detail = f"도구 {status['tools']}개" if status["state"] == MCP_READY else status.get("error", "")
+        logger.info(f"  {name:<24} {status['state']:<10} {status.get('elapsed_ms', 0):>9.1f}ms  {detail}")
+
+async def configure_agent():
+    """
+    현재 환경 변수 기준으로 모델과 MCP 서버를 구성하고 Agent를 초기화합니다.
+    MCP 서버는 동시에 연결하며, 제한 시간 안에 연결되지 않은 서버는 제외하고 백그라운드에서 재시도합니다.
+    """
+    global agent, servers, _idle_stop_task, _applied_configs
+    configure_model()
+    config = select_mcp_server_config()
+    _applied_configs = dict(config)
+    for name in config:
+        mcp_status[name] = {"state": MCP_CONNECTING, "tools": 0, "attempts": 0}
+    started = time.perf_counter()
+    results = await asyncio.gather(*(_connect_mcp_server(name, cfg) for name, cfg in config.items()))
+    _log_startup_report((time.perf_counter() - started) * 1000)
+    for (name, cfg), connected in zip(config.items(), results):
+        if not connected:
+            _retry_tasks[name] = asyncio.create_task(_retry_mcp_server(name, cfg))
+    if MCP_LAZY_ACTIVATION and _idle_stop_task is None:
+        _idle_stop_task = asyncio.create_task(_idle_stop_loop())
+    # servers 리스트를 그대로 넘기므로 재시도로 연결된 서버도 다음 실행부터 도구로 사용됨
+    agent = _build_agent(gms_model, servers)
+
+def _build_agent(model: OpenAIChatCompletionsModel, mcp_servers: list) -> Agent:
+    return Agent(
         name="Assistant",
         instructions = f"Use the tools to achieve the task. Consider the conversation history when provided. Today's date is {date.today().isoformat()}. Answer in markdown format.",
-        model=gms_model,
-        mcp_servers=servers,
+        model=model,
+        mcp_servers=mcp_servers,
     )
 
+async def _open_tenant(user_id: str, env: Dict[str, str]) -> Tuple[Agent, list, Dict[str, Dict[str, Any]]]:
+    """
+    사용자 설정(env)만으로 MCP 서버 세트와 Agent를 만듭니다 (프로세스 환경 변수는 바꾸지 않음).
+    사용자 수만큼 프로세스가 늘지 않도록 stdio 서버는 항상 지연 시작하며, 연결에 실패한 서버는 제외합니다.
+    """
+    config = select_mcp_server_config(env)
+    results = await asyncio.gather(*(_open_mcp_server(name, cfg, lazy=True) for name, cfg in config.items()))
+    tenant_servers = [srv for srv, _ in results if srv is not None]
+    status = {name: result[1] for name, result in zip(config, results)}
+    return _build_agent(tenant_model(env.get("GMS_API_KEY")), tenant_servers), tenant_servers, status
+
+async def _close_servers(mcp_servers: list):
+    for srv in mcp_servers:
+        try:
+            await srv.cleanup()
+        except Exception as e:
+            logger.warning(f"MCP 서버 정리 실패 - {srv.name}: {str(e)}")
+
+# 전역 인스턴스
+tenant_registry = TenantRegistry(_open_tenant, _close_servers, AGENT_MAX_TENANTS, AGENT_TENANT_IDLE_TIMEOUT)
+run_scheduler = FairScheduler(AGENT_MAX_CONCURRENT_RUNS, AGENT_MAX_RUNS_PER_TENANT)
+
+def _apply_env(env: List[Dict[str, str]]):
+    for item in env:
+        os.environ[item["name"]] = item["value"]
+        _user_env_keys.add(item["name"])
+
+def _env_dict(env: List[Dict[str, str]]) -> Dict[str, str]:
+    return {item["name"]: item["value"] for item in env}
+
+def _replace_user_env(env: List[Dict[str, str]]):
+    """env를 사용자 전체 설정으로 적용하고, 이전 사용자 설정에만 있던 환경 변수(삭제된 자격 증명 등)는 지웁니다."""
+    for key in _user_env_keys - set(_env_dict(env)):
+        os.environ.pop(key, None)
+    _user_env_keys.clear()
+    _apply_env(env)
+
+def _user_env() -> List[Dict[str, str]]:
+    return [{"name": key, "value": os.environ[key]} for key in sorted(_user_env_keys) if key in os.environ]
+
+def _load_runtime_config() -> Optional[Dict[str, Any]]:
+    try:
+        with open(RUNTIME_CONFIG_PATH, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+def _save_runtime_config(config: Dict[str, Any]):
+    os.makedirs(os.path.dirname(RUNTIME_CONFIG_PATH), exist_ok=True)
+    with open(RUNTIME_CONFIG_PATH, "w", encoding="utf-8") as f:
+        json.dump(config, f)
+
+async def _initialize_agent():
+    try:
+        async with _configure_lock:
+            await configure_agent()
+        logger.info(f"agent 준비 완료 - MCP 서버: {list(mcp_status)}")
+    except Exception as e:
+        logger.error(f"agent 초기화 실패: {str(e)}")
+
+# 앱 시작 시 필요한 서버만 연결하고 Agent 초기화
+# MCP 연결은 백그라운드에서 진행하고, 진행 상황은 /ready로 확인 (readinessProbe가 준비 완료 시점을 판단)
+@app.on_event("startup")
+async def startup_event():
+    global runtime_user_id, _startup_task, _idle_stop_task
+    if MULTI_TENANT_MODE:
+        # 사용자별 MCP 서버 세트는 첫 요청(또는 PUT /tenants/{user_id}) 때 생성
+        configure_model()
+        _idle_stop_task = asyncio.create_task(_idle_stop_loop())
+        logger.info(f"멀티 테넌트 모드: 최대 사용자 {AGENT_MAX_TENANTS}명, 동시 실행 {AGENT_MAX_CONCURRENT_RUNS}개")
+        return
+    if WARM_POOL_MODE:
+        # 컨테이너 재시작 전에 주입받은 설정이 있으면 복원, 없으면 설정 주입까지 대기
+        saved = _load_runtime_config()
+        if saved is None:
+            logger.info("웜 풀 모드: 사용자 설정 주입 대기")
+            return
+        _apply_env(saved["env"])
+        runtime_user_id = saved["user_id"]
+    else:
+        # /control로 실행 중에 바꾼 설정은 Deployment 환경 변수에 없으므로 컨테이너 재시작 시 덮어씀
+        saved = _load_runtime_config()
+        if saved is not None:
+            _replace_user_env(saved["env"])
+            logger.info(f"실행 중 변경된 설정 복원 - 환경 변수: {len(saved['env'])}개")
+    _startup_task = asyncio.create_task(_initialize_agent())
+
+@app.get("/ready")
+def readiness_check():
+    """
+    요청을 처리할 준비가 됐는지 MCP 서버별 연결 상태와 함께 반환합니다 (준비 전이면 503).
+    설정 주입을 기다리는 웜 풀 Pod는 설정을 받을 준비가 된 상태이므로 준비 완료로 응답합니다.
+    """
+    if MULTI_TENANT_MODE:
+        return {"ready": True, "multi_tenant": True, "tenants": tenant_registry.metrics(), "scheduler": run_scheduler.metrics()}
+    waiting_config = WARM_POOL_MODE and runtime_user_id is None
+    ready = agent is not None or waiting_config
+    lazy_metrics = {srv.name: srv.metrics() for srv in servers if isinstance(srv, LazyMCPServer)}
+    body = {
+        "ready": ready,
+        "waiting_config": waiting_config,
+        # 일부 MCP 서버가 연결되지 않았지만 나머지 도구로 요청을 처리하는 상태
+        "degraded": any(status["state"] != MCP_READY for status in mcp_status.values()),
+        "mcp_servers": {
+            name: {**status, **lazy_metrics.get(name, {})} for name, status in mcp_status.items()
+        }
+    }
+    return JSONResponse(status_code=200 if ready else 503, content=body)
+
+@app.get("/metrics")
+def get_metrics():
+    """도구 호출 결과 캐시의 적중률 등 agent 메트릭을 반환합니다."""
+    return {"tool_result_cache": {"enabled": TOOL_RESULT_CACHE_ENABLED, **tool_result_cache.metrics()}}
+
+def _require_control_token(request: Request):
+    if not AGENT_CONTROL_TOKEN:
+        raise HTTPException(403, "AGENT_CONTROL_TOKEN이 설정되지 않아 control 엔드포인트를 사용할 수 없습니다.")
+    authorization = request.headers.get("authorization", "")
+    token = authorization[7:] if authorization.lower().startswith("bearer ") else ""
+    if not hmac.compare_digest(token.encode(), AGENT_CONTROL_TOKEN.encode()):
+        raise HTTPException(401, "control 토큰이 올바르지 않습니다.")
+
+class RuntimeConfigRequest(BaseModel):
+    user_id: str
+    env: List[Dict[str, str]] = []
+
+@app.get("/runtime/config")
+def get_runtime_config():
+    return {"warm_pool": WARM_POOL_MODE, "configured": agent is not None, "user_id": runtime_user_id}
+
+# 웜 풀 Pod에 사용자 설정(API 키, MCP_SERVICES, MCP 환경 변수)을 주입하고 MCP 서버 연결까지 마친 뒤 응답
+@app.post("/runtime/config")
+async def apply_runtime_config(payload: RuntimeConfigRequest, request: Request):
+    global runtime_user_id
+    # 할당 전 Pod에 임의의 사용자·자격 증명을 주입하지 못하도록 operator가 넣어 준 토큰으로만 허용
+    _require_control_token(request)
+    if not WARM_POOL_MODE:
+        raise HTTPException(409, "웜 풀 모드로 실행된 agent가 아닙니다.")
+
+    async with _configure_lock:
+        if runtime_user_id is not None and runtime_user_id != payload.user_id:
+            raise HTTPException(409, "이미 다른 사용자에게 할당된 agent입니다.")
+        if agent is None:
+            started = time.perf_counter()
+            _apply_env(payload.env)
+            _save_runtime_config(payload.model_dump())
+            runtime_user_id = payload.user_id
+            await configure_agent()
+            logger.info(f"runtime config 적용 완료 - 사용자: {payload.user_id}, 소요: {(time.perf_counter() - started) * 1000:.1f}ms")
+
+    return {"status": "configured", "user_id": runtime_user_id, "mcp_servers": mcp_status}
+
+async def _reconcile_mcp_servers(config: Dict[str, Dict[str, Any]]) -> Dict[str, List[str]]:
+    """
+    실행 중인 MCP 서버를 config에 맞춥니다. 설정이 같은 서버는 그대로 두고,
+    빠진 서버는 정리하며 새로 추가되거나 설정(자격 증명 등)이 바뀐 서버만 연결합니다.
+    Agent는 servers 리스트를 그대로 참조하므로 다음 실행부터 바뀐 도구 목록이 적용됩니다.
+    """
+    global _applied_configs
+    removed = [name for name in _applied_configs if name not in config]
+    updated = [name for name in config if name in _applied_configs and _applied_configs[name] != config[name]]
+    added = [name for name in config if name not in _applied_configs]
+
+    for name in removed + updated:
+        task = _retry_tasks.pop(name, None)
+        if task is not None:
+            task.cancel()
+        mcp_status.pop(name, None)
+        stale = [srv for srv in servers if srv.name == name]
+        # 진행 중인 실행이 새 도구 목록을 보지 않도록 먼저 목록에서 뺀 뒤 정리
+        for srv in stale:
+            servers.remove(srv)
+        await _close_servers(stale)
+
+    _applied_configs = dict(config)
+    targets = updated + added
+    results = await asyncio.gather(*(_connect_mcp_server(name, config[name]) for name in targets))
+    for name, connected in zip(targets, results):
+        if not connected:
+            _retry_tasks[name] = asyncio.create_task(_retry_mcp_server(name, config[name]))
+    return {"added": added, "updated": updated, "removed": removed}
+
+async def _apply_control_env(env: List[Dict[str, str]], revision: Optional[int] = None, replace: bool = False) -> Dict[str, Any]:
+    """
+    환경 변수를 바꾸고 바뀐 MCP 서버만 다시 연결합니다 (Pod 재배포 없이 적용).
+    replace면 env를 사용자 전체 설정으로 적용합니다 (_replace_user_env).
+    """
+    global _control_revision
+    if MULTI_TENANT_MODE:
+        raise HTTPException(409, "멀티 테넌트 모드에서는 PUT /tenants/{user_id}로 사용자 설정을 바꿉니다.")
+    async with _configure_lock:
+        if agent is None:
+            raise HTTPException(409, "아직 구성되지 않은 agent입니다.")
+        if revision is not None:
+            if revision < _control_revision:
+                raise HTTPException(409, f"이미 더 최신 설정(revision {_control_revision})이 적용되어 있습니다.")
+            _control_revision = revision
+
+        started = time.perf_counter()
+        previous_model_key = os.getenv("GMS_API_KEY")
+        if replace:
+            _replace_user_env(env)
+        else:
+            _apply_env(env)
+        # 컨테이너가 재시작돼도 바뀐 설정을 유지하도록 emptyDir의 runtime config에 사용자 전체 설정 저장
+        saved = _load_runtime_config() or {"user_id": runtime_user_id}
+        saved["env"] = _user_env()
+        try:
+            _save_runtime_config(saved)
+        except OSError as e:
+            logger.warning(f"변경된 설정 저장 실패: {str(e)}")
+        if os.getenv("GMS_API_KEY") != previous_model_key:
+            configure_model()
+            agent.model = gms_model
+
+        changes = await _reconcile_mcp_servers(select_mcp_server_config())
+        elapsed_ms = (time.perf_counter() - started) * 1000
+    logger.info(f"실행 중 설정 변경 적용 - 추가: {changes['added']}, 변경: {changes['updated']}, "
+                f"제거: {changes['removed']}, 소요: {elapsed_ms:.1f}ms")
+    return {"status": "applied", **changes, "elapsed_ms": round(elapsed_ms, 1), "mcp_servers": mcp_status}
+
+def _services_env(services: List[str]) -> Dict[str, str]:
+    # 빈 문자열은 모든 서버를 뜻하므로 선택한 서버가 없으면 공백으로 지정
+    return {"name": "MCP_SERVICES", "value": ",".join(services) or " "}
+
+class ControlConfigRequest(BaseModel):
+    # 사용자 전체 설정 (배포 시와 같은 형식), 바뀐 MCP 서버만 다시 연결
+    env: List[Dict[str, str]] = []
+    revision: Optional[int] = None
+
+class ControlMCPRequest(BaseModel):
+    env: Dict[str, str] = {}
+
+# backend가 MCP 선택·환경 변수 변경을 재배포 없이 반영할 때 사용
+@app.put("/control/config")
+async def put_control_config(payload: ControlConfigRequest, request: Request):
+    _require_control_token(request)
+    return await _apply_control_env(payload.env, payload.revision, replace=True)
+
+@app.post("/control/mcp/{name}")
+async def connect_control_mcp(name: str, payload: ControlMCPRequest, request: Request):
+    """MCP 서버 하나를 추가하거나 환경 변수를 바꿔 다시 연결합니다."""
+    _require_control_token(request)
+    if name not in load_mcp_server_config():
+        raise HTTPException(404, f"알 수 없는 MCP 서버입니다: {name}")
+    services = [service for service in _applied_configs if service != name] + [name]
+    env = [{"name": key, "value": value} for key, value in payload.env.items()] + [_services_env(services)]
+    return await _apply_control_env(env)
+
+@app.delete("/control/mcp/{name}")
+async def disconnect_control_mcp(name: str, request: Request):
+    _require_control_token(request)
+    services = [service for service in _applied_configs if service != name]
+    return await _apply_control_env([_services_env(services)])
+
+class TenantConfigRequest(BaseModel):
+    env: List[Dict[str, str]] = []
+
+def _require_multi_tenant(request: Request):
+    if not MULTI_TENANT_MODE:
+        raise HTTPException(409, "멀티 테넌트 모드로 실행된 agent가 아닙니다.")
+    _require_control_token(request)
+
+def _require_tenant_caller(request: Request):
+    """
+    멀티 테넌트 모드는 한 Pod가 여러 사용자의 자격 증명을 가지므로, 요청 본문의 user_id·env를 믿기 전에
+    control 토큰(backend만 보유)을 확인합니다. 사용자별 Pod는 Service로 해당 사용자 요청만 받으므로 확인하지 않습니다.
+    """
+    if MULTI_TENANT_MODE:
+        _require_control_token(request)
+
+@app.get("/tenants")
+def list_tenants(request: Request):
+    _require_multi_tenant(request)
+    return {"tenants": tenant_registry.metrics(), "scheduler": run_scheduler.metrics()}
+
+# 사용자 설정을 등록하고 MCP 서버 세트까지 만든 뒤 응답 (이후 요청은 user_id만 보내면 됨)
+@app.put("/tenants/{user_id}")
+async def put_tenant(user_id: str, payload: TenantConfigRequest, request: Request):
+    _require_multi_tenant(request)
+    tenant = await _acquire_tenant(user_id, payload.env)
+    tenant_registry.release(tenant)
+    return {"status": "configured", "user_id": user_id, "mcp_servers": tenant.mcp_status}
+
+@app.delete("/tenants/{user_id}")
+def delete_tenant(user_id: str, request: Request):
+    _require_multi_tenant(request)
+    return {"status": "removed" if tenant_registry.remove(user_id) else "not_found", "user_id": user_id}
+
+async def _acquire_tenant(user_id: Optional[str], env: Optional[List[Dict[str, str]]]) -> Tenant:
+    if not user_id:
+        raise HTTPException(400, "멀티 테넌트 모드에서는 'user_id' 필드가 필요합니다.")
+    try:
+        return await tenant_registry.acquire(user_id, _env_dict(env) if env is not None else None)
+    except TenantNotConfigured as e:
+        # backend가 env를 포함해 다시 요청하도록 구분되는 상태 코드 사용
+        raise HTTPException(428, f"{str(e)} 요청에 env를 포함하거나 PUT /tenants/{user_id}로 등록하세요.")
+    except Exception as e:
+        raise HTTPException(503, f"테넌트 생성 실패: {str(e)}")
+
+@asynccontextmanager
+async def _agent_for(user_id: Optional[str], env: Optional[List[Dict[str, str]]] = None):
+    """
+    요청을 처리할 Agent를 반환합니다.
+    멀티 테넌트 모드에서는 사용자 Agent를 찾고, 다른 사용자와 공정하게 배분되는 실행 슬롯을 잡은 동안 사용합니다.
+    """
+    if not MULTI_TENANT_MODE:
+        if agent is None:
+            raise HTTPException(503, "Agent가 초기화되지 않았습니다.")
+        yield agent
+        return
+    tenant = await _acquire_tenant(user_id, env)
+    try:
+        async with run_scheduler.slot(tenant.user_id):
+            yield tenant.agent
+    finally:
+        tenant_registry.release(tenant)
+
 # 앱 종료 시 모든 서버 정리
 @app.on_event("shutdown")
 async def shutdown_event():
+    if _startup_task is not None:
+        _startup_task.cancel()
+    for task in list(_retry_tasks.values()):
+        task.cancel()
+    if _idle_stop_task is not None:
+        _idle_stop_task.cancel()
+    await tenant_registry.close()
     for srv in servers:
         await srv.cleanup()
 
@@ -176,41 +769,82 @@ async def shutdown_event():
 #     result = await Runner.run(agent, text)
 #     return {"response": result.final_output}
 
-# 메시지 처리 핸들러: Backend에서 conversation_history를 전달받아 처리
-@app.post("/agent-query")
-async def query_agent(payload: AgentRequest):
-    if agent is None: 
-        raise HTTPException(503, "Agent가 초기화되지 않았습니다.")
-    
+def build_agent_input(payload: AgentRequest) -> str:
+    """요청 텍스트에 대화 히스토리 컨텍스트를 붙여 Agent 입력을 만듭니다."""
     text = payload.text
     
     # 대화 히스토리가 있는 경우 컨텍스트로 추가
-    enhanced_text = text
-    if payload.conversation_history and payload.use_conversation_context:
-        conversation_context = format_conversation_history(payload.conversation_history)
+    if (payload.conversation_history or payload.conversation_summary or payload.relevant_history) and payload.use_conversation_context:
+        conversation_context = format_conversation_history(
+            payload.conversation_history, payload.conversation_summary, payload.relevant_history
+        )
         if conversation_context:
-            enhanced_text = f"{conversation_context}\n\n현재 질문: {text}"
+            return f"{conversation_context}\n\n현재 질문: {text}"
+    return text
+
+# 메시지 처리 핸들러: Backend에서 conversation_history를 전달받아 처리
+@app.post("/agent-query")
+async def query_agent(payload: AgentRequest, request: Request):
+    _require_tenant_caller(request)
+    enhanced_text = build_agent_input(payload)
     
-    try:
-        # Agent 실행
-        result = await Runner.run(agent, enhanced_text)
-        response = result.final_output
+    async with _agent_for(payload.user_id, payload.env) as run_agent:
+        try:
+            # Agent 실행
+            result = await Runner.run(run_agent, enhanced_text)
+            response = result.final_output
+            
+            return {"response": response}
         
-        return {"response": response}
+        except Exception as e:
+            raise HTTPException(500, f"Agent 처리 중 오류 발생: {str(e)}")
+
+def _stream_line(event: Dict[str, Any]) -> str:
+    """스트리밍 이벤트 한 건을 NDJSON 한 줄로 직렬화합니다."""
+    return json.dumps(event, ensure_ascii=False) + "\n"
+
+# 스트리밍 처리 핸들러: 텍스트 조각과 도구 호출 이벤트를 NDJSON으로 전달
+@app.post("/agent-query-stream")
+async def query_agent_stream(payload: AgentRequest, request: Request):
+    _require_tenant_caller(request)
+    if not MULTI_TENANT_MODE and agent is None: 
+        raise HTTPException(503, "Agent가 초기화되지 않았습니다.")
     
-    except Exception as e:
-        raise HTTPException(500, f"Agent 처리 중 오류 발생: {str(e)}")
+    enhanced_text = build_agent_input(payload)
+    
+    async def event_generator():
+        try:
+            # 멀티 테넌트 모드의 실행 슬롯은 스트림이 끝날 때까지 유지
+            async with _agent_for(payload.user_id, payload.env) as run_agent:
+                result = Runner.run_streamed(run_agent, enhanced_text)
+                async for event in result.stream_events():
+                    if event.type == "raw_response_event":
+                        # 모델이 생성 중인 텍스트 조각
+                        if getattr(event.data, "type", None) == "response.output_text.delta" and event.data.delta:
+                            yield _stream_line({"type": "delta", "text": event.data.delta})
+                    elif event.type == "run_item_stream_event":
+                        if event.item.type == "tool_call_item":
+                            tool_name = getattr(event.item.raw_item, "name", None)
+                            yield _stream_line({"type": "tool_call", "name": tool_name})
+                        elif event.item.type == "tool_call_output_item":
+                            yield _stream_line({"type": "tool_output", "output": str(event.item.output)[:500]})
+                yield _stream_line({"type": "done", "response": result.final_output})
+        except HTTPException as e:
+            yield _stream_line({"type": "error", "message": e.detail})
+        except Exception as e:
+            yield _stream_line({"type": "error", "message": f"Agent 처리 중 오류 발생: {str(e)}"})
+    
+    return StreamingResponse(event_generator(), media_type="application/x-ndjson")
 
 # 기존 호환성을 위한 단순 엔드포인트
 @app.post("/agent-query-simple")
-async def query_agent_simple(payload: dict):
+async def query_agent_simple(payload: dict, request: Request):
     """기존 호환성을 위한 단순 텍스트 처리"""
-    if agent is None: 
-        raise HTTPException(503, "Agent가 초기화되지 않았습니다.")
-    
+    _require_tenant_caller(request)
     text = payload.get("text")
     if not text: 
         raise HTTPException(400, "'text' 필드가 필요합니다.")
     
-    result = await Runner.run(agent, text)
+    async with _agent_for(payload.get("user_id")) as run_agent:
+        result = await Runner.run(run_agent, text)
     return {"response": result.final_output}
\ No newline at end of file
@@ -0,0 +1,201 @@
+import asyncio, hashlib, json, logging, time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+from agents.mcp.server import MCPServerStdio, MCPServerStreamableHttp
+from mcp.types import CallToolResult
+from app.lazy_mcp import LazyMCPServer
+
+logger = logging.getLogger(__name__)
+
+def _normalize(value: Any) -> Any:
+    """같은 의미의 인자가 같은 키가 되도록 None 값을 빼고 문자열 앞뒤 공백을 정리합니다 (키 순서는 json.dumps에서 정렬)."""
+    if isinstance(value, dict):
+        return {key: _normalize(item) for key, item in value.items() if item is not None}
+    if isinstance(value, list):
+        return [_normalize(item) for item in value]
+    if isinstance(value, str):
+        return value.strip()
+    return value
+
+class ToolResultCache:
+    """
+    MCP 도구 호출 결과 캐시.
+
+    키는 (서버, 도구, 캐시 범위, 정규화한 인자)의 해시이며, 캐시 범위는 서버 실행 설정(자격 증명 포함)의 해시라
+    자격 증명이 다른 사용자끼리는 결과를 공유하지 않습니다. 크기(바이트) 기준 LRU로 오래된 결과부터 버리고,
+    같은 키의 호출이 진행 중이면 새로 호출하지 않고 그 결과를 기다립니다.
+    """
+
+    def __init__(self, max_bytes: int, max_entry_bytes: int):
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        # key -> (만료 시각, 크기, 결과, 서버:범위)
+        self._entries: "OrderedDict[str, Tuple[float, int, CallToolResult, str]]" = OrderedDict()
+        self._bytes = 0
+        self._pending: Dict[str, asyncio.Future] = {}
+        # 메트릭 ("서버/도구"별)
+        self._stats: Dict[str, Dict[str, int]] = {}
+        self.evictions = 0
+        self.expired = 0
+        self.invalidations = 0
+        self.oversized = 0
+
+    def _stat(self, server: str, tool: str) -> Dict[str, int]:
+        stats = self._stats.get(f"{server}/{tool}")
+        if stats is None:
+            stats = {"hits": 0, "misses": 0, "coalesced": 0, "bypassed": 0}
+            self._stats[f"{server}/{tool}"] = stats
+        return stats
+
+    @staticmethod
+    def make_key(server: str, tool: str, scope: str, arguments: Optional[Dict[str, Any]]) -> str:
+        content = json.dumps([server, tool, scope, _normalize(arguments or {})], sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(content.encode()).hexdigest()
+
+    async def call(self, server: str, tool: str, scope: str, arguments: Optional[Dict[str, Any]], ttl: float,
+                   call: Callable[[], Awaitable[CallToolResult]]) -> CallToolResult:
+        """캐시된 결과가 있으면 반환하고, 없으면 call()로 호출해 오류가 아닌 결과를 ttl초 동안 저장합니다."""
+        stats = self._stat(server, tool)
+        key = self.make_key(server, tool, scope, arguments)
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry[0] > time.monotonic():
+                self._entries.move_to_end(key)
+                stats["hits"] += 1
+                return entry[2]
+            self._remove(key)
+            self.expired += 1
+
+        pending = self._pending.get(key)
+        if pending is not None:
+            stats["coalesced"] += 1
+            try:
+                return await asyncio.shield(pending)
+            except asyncio.CancelledError:
+                # 먼저 호출한 요청이 취소된 경우에만 직접 호출 (자신이 취소된 경우는 그대로 전파)
+                if not pending.cancelled():
+                    raise
+                return await call()
+
+        stats["misses"] += 1
+        future = asyncio.get_running_loop().create_future()
+        # 기다리는 요청이 없을 때 예외가 회수되지 않았다는 경고 방지
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())
+        self._pending[key] = future
+        try:
+            result = await call()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            self._pending.pop(key, None)
+        future.set_result(result)
+        if not result.isError:
+            self._put(key, result, ttl, f"{server}:{scope}")
+        return result
+
+    def record_bypass(self, server: str, tool: str):
+        self._stat(server, tool)["bypassed"] += 1
+
+    def _put(self, key: str, result: CallToolResult, ttl: float, group: str):
+        size = len(result.model_dump_json())
+        if size > self.max_entry_bytes:
+            self.oversized += 1
+            return
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (time.monotonic() + ttl, size, result, group)
+        self._bytes += size
+        while self._bytes > self.max_bytes and self._entries:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[1]
+
+    def invalidate(self, server: str, scope: str) -> int:
+        """변경 도구가 호출된 서버(같은 범위)의 캐시를 비웁니다."""
+        group = f"{server}:{scope}"
+        keys = [key for key, entry in self._entries.items() if entry[3] == group]
+        for key in keys:
+            self._remove(key)
+        self.invalidations += len(keys)
+        if keys:
+            logger.info(f"도구 결과 캐시 무효화 - {server}, {len(keys)}건")
+        return len(keys)
+
+    def metrics(self) -> Dict[str, Any]:
+        def _rate(stats: Dict[str, int]) -> float:
+            lookups = stats["hits"] + stats["coalesced"] + stats["misses"]
+            return round((stats["hits"] + stats["coalesced"]) / lookups, 3) if lookups else 0.0
+
+        totals = {"hits": 0, "misses": 0, "coalesced": 0, "bypassed": 0}
+        for stats in self._stats.values():
+            for name in totals:
+                totals[name] += stats[name]
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            **totals,
+            "hit_rate": _rate(totals),
+            "evictions": self.evictions,
+            "expired": self.expired,
+            "invalidations": self.invalidations,
+            "oversized": self.oversized,
+            "tools": {name: {**stats, "hit_rate": _rate(stats)} for name, stats in sorted(self._stats.items())}
+        }
+
+class CachedToolCalls:
+    """
+    call_tool 결과를 ToolResultCache로 재사용하는 MCP 서버 믹스인.
+
+    서버 설정의 "result_cache" 정책으로 enable_result_cache()를 호출한 서버만 캐시하며,
+    정책의 "mutating" 도구는 캐시하지 않고 호출할 때마다 해당 서버의 캐시를 비웁니다.
+    """
+
+    _result_cache: Optional[ToolResultCache] = None
+    _cache_policy: Dict[str, Any] = {}
+    _cache_scope = ""
+
+    def enable_result_cache(self, cache: ToolResultCache, policy: Dict[str, Any], params: Dict[str, Any]):
+        self._result_cache = cache
+        self._cache_policy = policy
+        # 자격 증명(환경 변수·인자)이 다르면 결과도 다를 수 있으므로 실행 설정 해시로 캐시 범위를 나눔
+        self._cache_scope = hashlib.sha256(json.dumps(params, sort_keys=True).encode()).hexdigest()[:16]
+
+    def _tool_ttl(self, tool_name: str) -> float:
+        return self._cache_policy.get("tools", {}).get(tool_name, self._cache_policy.get("ttl", 0))
+
+    async def call_tool(self, tool_name: str, arguments: Optional[Dict[str, Any]], **kwargs):
+        cache = self._result_cache
+        call_tool = super().call_tool
+        if cache is None:
+            return await call_tool(tool_name, arguments, **kwargs)
+        if tool_name in self._cache_policy.get("mutating", []):
+            try:
+                return await call_tool(tool_name, arguments, **kwargs)
+            finally:
+                # 실패했더라도 일부 반영됐을 수 있으므로 항상 무효화
+                cache.invalidate(self.name, self._cache_scope)
+        ttl = self._tool_ttl(tool_name)
+        if ttl <= 0:
+            cache.record_bypass(self.name, tool_name)
+            return await call_tool(tool_name, arguments, **kwargs)
+        return await cache.call(self.name, tool_name, self._cache_scope, arguments, ttl,
+                                lambda: call_tool(tool_name, arguments, **kwargs))
+
+class CachedMCPServerStdio(CachedToolCalls, MCPServerStdio):
+    pass
+
+class CachedMCPServerStreamableHttp(CachedToolCalls, MCPServerStreamableHttp):
+    pass
+
+class CachedLazyMCPServer(CachedToolCalls, LazyMCPServer):
+    """캐시에 결과가 있으면 프로세스를 시작하지 않고 응답합니다."""
+    pass
@@ -0,0 +1,307 @@
+import asyncio, hashlib, json, logging, time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+def percentile(values, p: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * p), len(ordered) - 1)] if ordered else 0.0
+
+def config_hash(env: Dict[str, str]) -> str:
+    """사용자 설정(env)이 바뀌었는지 비교하기 위한 해시 (자격 증명 원문은 로그·메트릭에 남기지 않음)"""
+    return hashlib.sha256(json.dumps(env, sort_keys=True).encode()).hexdigest()[:16]
+
+class TenantNotConfigured(Exception):
+    """등록된 설정이 없어 사용자 Agent를 만들 수 없는 경우"""
+    pass
+
+class Tenant:
+    """사용자 한 명의 Agent와 MCP 서버 세트"""
+
+    def __init__(self, user_id: str, config_hash: str, agent: Any, servers: list, mcp_status: Dict[str, Dict[str, Any]]):
+        self.user_id = user_id
+        self.config_hash = config_hash
+        self.agent = agent
+        self.servers = servers
+        self.mcp_status = mcp_status
+        self.in_flight = 0
+        self.last_used = time.monotonic()
+        # LRU·유휴 정리나 설정 변경으로 목록에서 빠진 테넌트 (사용이 끝나면 MCP 서버 정리)
+        self.retired = False
+
+class TenantRegistry:
+    """
+    사용자별 Agent와 MCP 서버 세트를 최근 사용 순서(LRU)로 보관하는 저장소.
+
+    설정(env)이 바뀌면 새로 만들고, max_tenants를 넘으면 가장 오래 사용하지 않은 테넌트를,
+    idle_timeout 동안 사용하지 않은 테넌트는 evict_idle()에서 정리합니다.
+    사용 중인 테넌트는 바로 정리하지 않고 마지막 요청이 끝난 뒤 MCP 서버를 정리합니다.
+    설정(자격 증명 포함)은 테넌트가 있는 동안만 메모리에 보관하고 LRU·유휴 정리 때 함께 지우므로,
+    정리된 사용자의 다음 요청은 env를 포함하거나 다시 등록해야 합니다 (없으면 TenantNotConfigured).
+    """
+
+    def __init__(self, open_tenant: Callable[[str, Dict[str, str]], Awaitable[Tuple[Any, list, Dict[str, Dict[str, Any]]]]],
+                 close_servers: Callable[[list], Awaitable[None]], max_tenants: int, idle_timeout: float):
+        self._open_tenant = open_tenant
+        self._close_servers = close_servers
+        self.max_tenants = max_tenants
+        self.idle_timeout = idle_timeout
+        self._tenants: "OrderedDict[str, Tenant]" = OrderedDict()
+        self._configs: Dict[str, Dict[str, str]] = {}
+        # 같은 사용자의 동시 요청이 테넌트를 한 번만 만들도록 진행 중인 생성 작업 공유
+        self._building: Dict[Tuple[str, str], asyncio.Task] = {}
+        self._closing: Set[asyncio.Task] = set()
+        # 메트릭
+        self.builds = 0
+        self.build_failures = 0
+        self.hits = 0
+        self.evictions = {"lru": 0, "idle": 0, "config": 0, "removed": 0}
+        self._build_ms = deque(maxlen=500)
+
+    def __len__(self) -> int:
+        return len(self._tenants)
+
+    def get(self, user_id: str) -> Optional[Tenant]:
+        return self._tenants.get(user_id)
+
+    def register(self, user_id: str, env: Dict[str, str]) -> bool:
+        """사용자 설정을 등록합니다. 설정이 바뀌었으면 True (기존 테넌트는 다음 사용 때 새로 만듦)."""
+        changed = self._configs.get(user_id) != env
+        self._configs[user_id] = env
+        return changed
+
+    async def acquire(self, user_id: str, env: Optional[Dict[str, str]] = None) -> Tenant:
+        """
+        사용자 테넌트를 반환하고 사용 중으로 표시합니다 (release()로 해제).
+        env가 주어지면 등록된 설정을 갱신하며, 설정이 바뀌었으면 MCP 서버 세트를 새로 만듭니다.
+        """
+        if env is not None:
+            self.register(user_id, env)
+        env = self._configs.get(user_id)
+        if env is None:
+            raise TenantNotConfigured(f"{user_id} 사용자의 테넌트 설정이 없습니다.")
+
+        digest = config_hash(env)
+        tenant = self._tenants.get(user_id)
+        if tenant is not None and tenant.config_hash == digest:
+            self.hits += 1
+        else:
+            tenant = await self._build(user_id, env, digest)
+            if tenant.retired:
+                # 생성을 기다리는 동안 다른 사용자 생성으로 LRU에서 밀려난 경우 다시 생성 (설정도 함께 지워졌으므로 다시 등록)
+                return await self.acquire(user_id, env)
+        if self._tenants.get(user_id) is tenant:
+            self._tenants.move_to_end(user_id)
+        tenant.in_flight += 1
+        tenant.last_used = time.monotonic()
+        return tenant
+
+    def release(self, tenant: Tenant):
+        tenant.in_flight -= 1
+        tenant.last_used = time.monotonic()
+        if tenant.retired and tenant.in_flight == 0:
+            self._schedule_close(tenant)
+
+    async def _build(self, user_id: str, env: Dict[str, str], digest: str) -> Tenant:
+        key = (user_id, digest)
+        task = self._building.get(key)
+        if task is None:
+            task = asyncio.create_task(self._open(user_id, env, digest))
+            self._building[key] = task
+            task.add_done_callback(lambda _: self._building.pop(key, None))
+        # 기다리던 요청 하나가 취소돼도 같은 테넌트를 기다리는 다른 요청을 위해 생성은 계속
+        return await asyncio.shield(task)
+
+    async def _open(self, user_id: str, env: Dict[str, str], digest: str) -> Tenant:
+        started = time.perf_counter()
+        try:
+            agent, servers, mcp_status = await self._open_tenant(user_id, env)
+        except Exception:
+            self.build_failures += 1
+            # 테넌트를 만들지 못한 설정은 보관하지 않음 (기존 테넌트가 있으면 그 설정은 유지)
+            if user_id not in self._tenants and self._configs.get(user_id) == env:
+                del self._configs[user_id]
+            raise
+        tenant = Tenant(user_id, digest, agent, servers, mcp_status)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self._build_ms.append(elapsed_ms)
+        self.builds += 1
+
+        previous = self._tenants.pop(user_id, None)
+        if previous is not None:
+            self.evictions["config"] += 1
+            self._retire(previous)
+        self._tenants[user_id] = tenant
+        self._evict_lru()
+        logger.info(f"테넌트 생성 - 사용자: {user_id}, MCP 서버: {len(servers)}/{len(mcp_status)}개, "
+                    f"소요: {elapsed_ms:.1f}ms, 테넌트 수: {len(self._tenants)}")
+        return tenant
+
+    def _evict_lru(self):
+        while len(self._tenants) > self.max_tenants:
+            # 방금 사용한(마지막) 테넌트와 사용 중인 테넌트는 제외, 모두 사용 중이면 잠시 한도를 넘김
+            candidates = [t for t in list(self._tenants.values())[:-1] if t.in_flight == 0]
+            if not candidates:
+                return
+            victim = candidates[0]
+            del self._tenants[victim.user_id]
+            self.evictions["lru"] += 1
+            self._forget_config(victim)
+            self._retire(victim)
+            logger.info(f"테넌트 정리(LRU) - 사용자: {victim.user_id}")
+
+    def evict_idle(self) -> int:
+        """idle_timeout 동안 사용하지 않은 테넌트를 정리하고 정리한 수를 반환합니다."""
+        now = time.monotonic()
+        idle = [t for t in self._tenants.values() if t.in_flight == 0 and now - t.last_used >= self.idle_timeout]
+        for tenant in idle:
+            del self._tenants[tenant.user_id]
+            self.evictions["idle"] += 1
+            self._forget_config(tenant)
+            self._retire(tenant)
+            logger.info(f"유휴 테넌트 정리 - 사용자: {tenant.user_id}")
+        return len(idle)
+
+    def remove(self, user_id: str) -> bool:
+        """사용자 설정과 테넌트를 삭제합니다."""
+        self._configs.pop(user_id, None)
+        tenant = self._tenants.pop(user_id, None)
+        if tenant is None:
+            return False
+        self.evictions["removed"] += 1
+        self._retire(tenant)
+        return True
+
+    def _forget_config(self, tenant: Tenant):
+        """정리한 테넌트의 설정을 지웁니다. 그사이 다른 설정이 등록됐으면(생성 중) 유지합니다."""
+        env = self._configs.get(tenant.user_id)
+        if env is not None and config_hash(env) == tenant.config_hash:
+            del self._configs[tenant.user_id]
+
+    def _retire(self, tenant: Tenant):
+        tenant.retired = True
+        if tenant.in_flight == 0:
+            self._schedule_close(tenant)
+
+    def _schedule_close(self, tenant: Tenant):
+        task = asyncio.create_task(self._close_servers(tenant.servers))
+        self._closing.add(task)
+        task.add_done_callback(self._closing.discard)
+
+    def servers(self) -> List[Any]:
+        """보관 중인 모든 테넌트의 MCP 서버 (유휴 프로세스 중지용)"""
+        return [srv for tenant in self._tenants.values() for srv in tenant.servers]
+
+    async def close(self):
+        for task in list(self._building.values()):
+            task.cancel()
+        for user_id in list(self._tenants):
+            tenant = self._tenants.pop(user_id)
+            tenant.in_flight = 0
+            self._retire(tenant)
+        await asyncio.gather(*self._closing, return_exceptions=True)
+
+    def metrics(self) -> Dict[str, Any]:
+        build_ms = list(self._build_ms)
+        return {
+            "tenants": len(self._tenants),
+            "max_tenants": self.max_tenants,
+            "configured_users": len(self._configs),
+            "in_flight": sum(t.in_flight for t in self._tenants.values()),
+            "builds": self.builds,
+            "build_failures": self.build_failures,
+            "hits": self.hits,
+            "evictions": dict(self.evictions),
+            "build_ms": {"p50": round(percentile(build_ms, 0.5), 1), "p95": round(percentile(build_ms, 0.95), 1)}
+        }
+
+class FairScheduler:
+    """
+    여러 테넌트의 Runner 실행을 공정하게 배분하는 스케줄러.
+
+    전체 동시 실행 수(max_concurrent)와 테넌트당 동시 실행 수(per_tenant)를 제한하고,
+    자리가 나면 대기 중인 테넌트를 돌아가며(round-robin) 하나씩 실행합니다.
+    한 사용자가 요청을 몰아 보내도 다른 사용자의 요청은 그 뒤에 쌓이지 않습니다.
+    """
+
+    def __init__(self, max_concurrent: int, per_tenant: int):
+        self.max_concurrent = max_concurrent
+        self.per_tenant = per_tenant
+        self._running = 0
+        self._running_by: Dict[str, int] = {}
+        self._waiting: "OrderedDict[str, Deque[asyncio.Future]]" = OrderedDict()
+        # 메트릭
+        self.granted = 0
+        self._wait_ms = deque(maxlen=2000)
+
+    @asynccontextmanager
+    async def slot(self, tenant_id: str):
+        started = time.perf_counter()
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiting.setdefault(tenant_id, deque()).append(waiter)
+        self._dispatch()
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            # 슬롯을 받은 직후 취소된 경우 다음 대기에 넘겨줌 (대기 중 취소는 _dispatch에서 건너뜀)
+            if waiter.done() and not waiter.cancelled():
+                self._release(tenant_id)
+            raise
+        self._wait_ms.append((time.perf_counter() - started) * 1000)
+        try:
+            yield
+        finally:
+            self._release(tenant_id)
+
+    def _dispatch(self):
+        while self._running < self.max_concurrent:
+            for tenant_id, waiters in self._waiting.items():
+                while waiters and waiters[0].done():
+                    waiters.popleft()
+                if waiters and self._running_by.get(tenant_id, 0) < self.per_tenant:
+                    break
+            else:
+                # 실행할 수 있는 대기가 없음 (비어 있는 대기열 정리)
+                for tenant_id in [t for t, waiters in self._waiting.items() if not waiters]:
+                    del self._waiting[tenant_id]
+                return
+            waiter = waiters.popleft()
+            # 다음 자리는 다른 테넌트부터 배분
+            if waiters:
+                self._waiting.move_to_end(tenant_id)
+            else:
+                del self._waiting[tenant_id]
+            self._running += 1
+            self._running_by[tenant_id] = self._running_by.get(tenant_id, 0) + 1
+            self.granted += 1
+            waiter.set_result(None)
+
+    def _release(self, tenant_id: str):
+        self._running -= 1
+        remaining = self._running_by[tenant_id] - 1
+        if remaining:
+            self._running_by[tenant_id] = remaining
+        else:
+            del self._running_by[tenant_id]
+        # 방금 실행을 마친 테넌트는 먼저 기다리던 다른 테넌트 뒤로
+        if tenant_id in self._waiting:
+            self._waiting.move_to_end(tenant_id)
+        self._dispatch()
+
+    def metrics(self) -> Dict[str, Any]:
+        wait_ms = list(self._wait_ms)
+        return {
+            "running": self._running,
+            "max_concurrent": self.max_concurrent,
+            "per_tenant": self.per_tenant,
+            "queued": sum(1 for waiters in self._waiting.values() for w in waiters if not w.done()),
+            "tenants_waiting": len(self._waiting),
+            "granted": self.granted,
+            "wait_ms": {
+                "p50": round(percentile(wait_ms, 0.5), 1),
+                "p95": round(percentile(wait_ms, 0.95), 1),
+                "max": round(max(wait_ms), 1) if wait_ms else 0.0
+            }
+        }
@@ -0,0 +1,132 @@
+"""
+멀티 테넌트 runtime과 사용자별 Pod 방식의 메모리 효율(1GB당 사용자 수)을 비교하는 스크립트
+
+1) 사용자별 Pod: 사용자 한 명의 agent를 별도 프로세스로 구성(configure_agent)한 뒤 프로세스 트리 RSS를 잽니다.
+   Pod 하나가 차지하는 메모리에서 kubelet·컨테이너 런타임 오버헤드를 뺀 값입니다.
+2) 멀티 테넌트: 한 프로세스에서 사용자 N명의 테넌트를 만들고, 첫 테넌트 이후 늘어난 RSS를 사용자 수로 나눠
+   사용자당 메모리를 구합니다. 프로세스 기본 메모리는 1GB에서 먼저 뺍니다.
+
+두 방식 모두 MCP 서버는 같은 설정(지연 시작, gateway 사용 여부)으로 구성되므로 유휴 상태의 사용자 기준이며,
+MCP 서버 실행 파일과 도구 목록 캐시가 있는 agent 이미지 안에서 실행해야 합니다.
+
+사용법 (agent 디렉터리에서 실행):
+    python bench_tenants.py [사용자 수] [MCP_SERVICES]
+"""
+import asyncio
+import gc
+import json
+import os
+import subprocess
+import sys
+import time
+
+def _rss_kb(pid: int) -> int:
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+def _tree_rss_kb(root_pid: int) -> int:
+    """root_pid와 모든 자식 프로세스의 RSS 합계(kB)를 /proc에서 계산합니다."""
+    parents = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                parents[int(entry)] = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+    tree, frontier = {root_pid}, [root_pid]
+    while frontier:
+        pid = frontier.pop()
+        children = [child for child, parent in parents.items() if parent == pid]
+        tree.update(children)
+        frontier.extend(children)
+    return sum(_rss_kb(pid) for pid in tree)
+
+def _user_env(index: int, services: str) -> dict:
+    # 사용자마다 자격 증명이 달라 MCP 서버 세트를 공유하지 않는 상황
+    return {
+        "GMS_API_KEY": os.getenv("GMS_API_KEY", "bench"),
+        "MCP_SERVICES": services,
+        "NOTION_API_TOKEN": f"bench-notion-{index}",
+        "GITHUB_PERSONAL_ACCESS_TOKEN": f"bench-github-{index}",
+        "GITLAB_PERSONAL_ACCESS_TOKEN": f"bench-gitlab-{index}",
+        "KAKAO_API_KEY": f"bench-kakao-{index}",
+        "DART_API_KEY": f"bench-dart-{index}"
+    }
+
+async def run_single_user(services: str):
+    """사용자별 Pod 하나와 같은 구성으로 agent를 초기화하고 RSS를 JSON으로 출력합니다 (하위 프로세스로 실행)."""
+    os.environ.update(_user_env(0, services))
+    from app import main
+    await main.configure_agent()
+    gc.collect()
+    print(json.dumps({"rss_kb": _tree_rss_kb(os.getpid()), "mcp_servers": main.mcp_status}))
+    for task in list(main._retry_tasks.values()):
+        task.cancel()
+    for srv in main.servers:
+        await srv.cleanup()
+
+def measure_pod_per_user(services: str) -> float:
+    print(f"[사용자별 Pod] MCP_SERVICES={services}")
+    output = subprocess.run(
+        [sys.executable, __file__, "--single-user", services],
+        capture_output=True, text=True, check=True, env={**os.environ, "AGENT_MULTI_TENANT": "false"}
+    ).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    rss_mb = result["rss_kb"] / 1024
+    ready = sum(1 for status in result["mcp_servers"].values() if status["state"] == "ready")
+    print(f"  Pod당 RSS: {rss_mb:.1f}MB (MCP 서버 {ready}/{len(result['mcp_servers'])}개 연결)")
+    print(f"  1GB당 사용자: {1024 / rss_mb:.1f}명")
+    return rss_mb
+
+async def measure_multi_tenant(users: int, services: str) -> float:
+    # 모듈 상수로 읽으므로 import 전에 설정
+    os.environ["AGENT_MULTI_TENANT"] = "true"
+    os.environ["AGENT_MAX_TENANTS"] = str(users)
+    from app import main
+    main.configure_model()
+
+    print(f"[멀티 테넌트] 사용자: {users}명, MCP_SERVICES={services}")
+    tenant = await main.tenant_registry.acquire("bench-0", _user_env(0, services))
+    main.tenant_registry.release(tenant)
+    gc.collect()
+    base_kb = _tree_rss_kb(os.getpid())
+
+    started = time.perf_counter()
+    for index in range(1, users):
+        tenant = await main.tenant_registry.acquire(f"bench-{index}", _user_env(index, services))
+        main.tenant_registry.release(tenant)
+    elapsed = time.perf_counter() - started
+    gc.collect()
+    total_kb = _tree_rss_kb(os.getpid())
+
+    per_user_mb = (total_kb - base_kb) / max(users - 1, 1) / 1024
+    base_mb = base_kb / 1024
+    print(f"  프로세스 기본(사용자 1명 포함): {base_mb:.1f}MB, 전체: {total_kb / 1024:.1f}MB, "
+          f"사용자당: {per_user_mb * 1024:.0f}kB, 생성 {users - 1}명: {elapsed:.2f}초")
+    users_per_gb = (1024 - base_mb) / per_user_mb + 1 if per_user_mb > 0 else float("inf")
+    print(f"  1GB당 사용자: {users_per_gb:.1f}명")
+    print(f"  테넌트 메트릭: {main.tenant_registry.metrics()}")
+    await main.tenant_registry.close()
+    return per_user_mb
+
+async def main(users: int, services: str):
+    pod_mb = measure_pod_per_user(services)
+    per_user_mb = await measure_multi_tenant(users, services)
+    if per_user_mb > 0:
+        print(f"[비교] 사용자당 메모리: Pod {pod_mb:.1f}MB → 멀티 테넌트 {per_user_mb:.2f}MB ({pod_mb / per_user_mb:.0f}배)")
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--single-user":
+        asyncio.run(run_single_user(sys.argv[2]))
+        sys.exit(0)
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    services = sys.argv[2] if len(sys.argv) > 2 else "notion,github,sequentialthinking,korean-spell-checker"
+    asyncio.run(main(users, services))
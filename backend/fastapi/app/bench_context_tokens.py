@@ -0,0 +1,77 @@
+"""
+긴 합성 세션에서 Agent 프롬프트 토큰 수를 측정하는 벤치마크 스크립트
+
+매 턴마다 build_context로 컨텍스트를 구성하고 누적 요약을 갱신하면서,
+기존 방식(최근 6개 메시지를 길이와 관계없이 전달)과 토큰 예산 방식의 프롬프트 크기를 비교합니다.
+MongoDB 없이 로컬 토크나이저만 사용합니다. 예산 불변식은 tests/test_context_builder.py에서 검사합니다.
+
+사용법:
+    python bench_context_tokens.py [턴 수] [토큰 예산] [요약 토큰] [메시지당 최대 토큰]
+"""
+import random
+import sys
+from core.context_builder import build_context, count_tokens
+
+def make_turn(turn: int, rng: random.Random):
+    """짧은 질문과 가끔 매우 긴 마크다운 답변이 섞인 합성 대화 한 턴을 만듭니다."""
+    user = f"{turn}번째 질문입니다. 노션 페이지와 깃허브 이슈를 정리해 주세요. " * rng.randint(1, 3)
+    if rng.random() < 0.2:
+        rows = "\n".join(f"| {i} | 항목 {i} | 설명이 긴 셀 내용 {i} |" for i in range(rng.randint(50, 150)))
+        assistant = f"## 결과 {turn}\n\n| 번호 | 이름 | 설명 |\n|---|---|---|\n{rows}"
+    else:
+        assistant = f"{turn}번째 답변입니다. 요청하신 작업을 완료했습니다. " * rng.randint(2, 10)
+    return {"user": user, "assistant": assistant, "timestamp": None}
+
+def legacy_prompt_tokens(history) -> int:
+    """기존 format_conversation_history와 같은 방식(최근 5개, 길이 제한 없음)의 토큰 수"""
+    return sum(count_tokens(m["user"]) + count_tokens(m["assistant"]) for m in history[-6:][-5:])
+
+def percentile(values, p: float) -> int:
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * p), len(ordered) - 1)]
+
+def simulate(turns: int, budget: int, summary_tokens: int, message_tokens: int, fetch_limit: int = 20, seed: int = 42):
+    """
+    합성 세션을 turns턴 진행하며 매 턴 컨텍스트를 구성합니다.
+    턴별 (기존 방식 토큰, 예산 방식 토큰, 요약 토큰) 목록과 누적 요약을 저장한 횟수를 반환합니다.
+    """
+    rng = random.Random(seed)
+    session = []
+    summary_state = None
+    legacy, budgeted, summary_sizes = [], [], []
+    summary_writes = 0
+
+    for turn in range(turns):
+        history = session[-fetch_limit:]
+        legacy.append(legacy_prompt_tokens(history))
+
+        built = build_context(history, len(session), summary_state,
+                              token_budget=budget, summary_tokens=summary_tokens, message_tokens=message_tokens)
+        if built["summary_state"] is not None:
+            summary_state = built["summary_state"]
+            summary_writes += 1
+        budgeted.append(built["prompt_tokens"])
+        summary_sizes.append(count_tokens(built["summary"]))
+
+        session.append(make_turn(turn, rng))
+    return legacy, budgeted, summary_sizes, summary_writes
+
+def run_benchmark(turns: int, budget: int, summary_tokens: int, message_tokens: int, fetch_limit: int = 20):
+    legacy, budgeted, summary_sizes, summary_writes = simulate(turns, budget, summary_tokens, message_tokens, fetch_limit)
+
+    # 가장 최근 메시지 하나는 잘린 길이로 항상 포함되므로 상한은 예산 + 메시지 1건 최대치
+    hard_limit = budget + 2 * message_tokens
+    print(f"턴 수: {turns}, 예산: {budget}, 요약: {summary_tokens}, 메시지당 최대: {message_tokens} 토큰")
+    print(f"{'방식':<10}{'평균':>8}{'p50':>8}{'p95':>8}{'최대':>8}")
+    for name, values in (("기존", legacy), ("예산", budgeted)):
+        print(f"{name:<10}{sum(values) // len(values):>8}{percentile(values, 0.5):>8}"
+              f"{percentile(values, 0.95):>8}{max(values):>8}")
+    print(f"요약 최대 크기: {max(summary_sizes)} 토큰 (한도 {summary_tokens}), 요약 저장 {summary_writes}회")
+    print(f"예산 방식 최대치 {max(budgeted)} <= 상한 {hard_limit}: {'OK' if max(budgeted) <= hard_limit else 'FAIL'}")
+
+if __name__ == "__main__":
+    turns = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    budget = int(sys.argv[2]) if len(sys.argv) > 2 else 3000
+    summary = int(sys.argv[3]) if len(sys.argv) > 3 else 600
+    per_message = int(sys.argv[4]) if len(sys.argv) > 4 else 800
+    run_benchmark(turns, budget, summary, per_message)
@@ -0,0 +1,155 @@
+"""
+대화 1턴(session_chat)에서 발생하는 MongoDB 왕복 횟수와 전송 바이트를 측정하는 벤치마크 스크립트
+
+기존 경로(세션 문서 전체 조회 3회 + find_one/update_one 추가)와
+현재 session_chat 경로(agent 상태 확인, 활동 기록, build_agent_context, 메시지 저장, 버킷 저장 세션)를
+같은 크기의 세션에서 비교합니다. 현재 경로는 단계별로 나누어, 워커 캐시가 비어 있는 첫 턴과
+캐시가 채워진 다음 턴을 각각 측정합니다.
+
+사용법:
+    python bench_conversation.py [기존 메시지 수] [메시지당 글자 수]
+"""
+import asyncio
+import sys
+import uuid
+from datetime import datetime
+import bson
+from pymongo import monitoring
+from motor.motor_asyncio import AsyncIOMotorClient
+from core.config import settings
+from crud.agent_activity import AgentActivityStore
+from crud.conversation import ConversationManager
+from crud.message_buckets import MessageBucketStore, BUCKETED_STORAGE
+
+class CommandCounter(monitoring.CommandListener):
+    """실행된 명령 수와 요청/응답 바이트를 집계합니다."""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.round_trips = 0
+        self.sent_bytes = 0
+        self.received_bytes = 0
+
+    def started(self, event):
+        self.round_trips += 1
+        self.sent_bytes += len(bson.encode(event.command))
+
+    def succeeded(self, event):
+        self.received_bytes += len(bson.encode(event.reply))
+
+    def failed(self, event):
+        pass
+
+def make_messages(message_count: int, message_size: int):
+    body = "가" * message_size
+    return [
+        {"user_message": body, "assistant_response": body, "timestamp": datetime.now()}
+        for _ in range(message_count)
+    ]
+
+async def seed_legacy_session(collection, user_id: str, session_id: str, messages):
+    """메시지를 문서 내 배열로 저장하는 기존 형식 세션을 생성합니다."""
+    await collection.insert_one({
+        "user_id": user_id,
+        "session_id": session_id,
+        "session_name": "벤치마크",
+        "messages": messages,
+        "created_at": datetime.now(),
+        "updated_at": datetime.now()
+    })
+
+async def seed_bucketed_session(collection, bucket_store, user_id: str, session_id: str, messages):
+    """메시지를 버킷 컬렉션에 저장하는 세션을 생성합니다."""
+    await collection.insert_one({
+        "user_id": user_id,
+        "session_id": session_id,
+        "session_name": "벤치마크",
+        "storage": BUCKETED_STORAGE,
+        "message_count": len(messages),
+        "created_at": datetime.now(),
+        "updated_at": datetime.now()
+    })
+    await bucket_store.insert_many(user_id, session_id, messages)
+
+async def legacy_turn(collection, user_id: str, session_id: str):
+    """기존 session_chat 1턴의 쿼리 순서를 그대로 재현합니다."""
+    query = {"user_id": user_id, "session_id": session_id}
+    await collection.find_one(query)   # get_conversation_history
+    await collection.find_one(query)   # get_session_summary
+    await collection.find_one(query)   # add_message (존재 확인)
+    await collection.update_one(query, {
+        "$push": {"messages": {"user_message": "질문", "assistant_response": "답변", "timestamp": datetime.now()}},
+        "$set": {"updated_at": datetime.now()}
+    })
+    await collection.find_one(query)   # get_session_summary
+
+async def measure(counter: CommandCounter, step):
+    """step()이 실행한 명령의 왕복 수와 송수신 바이트를 반환합니다."""
+    counter.reset()
+    await step()
+    return (counter.round_trips, counter.sent_bytes, counter.received_bytes)
+
+async def current_turn(counter: CommandCounter, manager, activity_store, user_id: str, session_id: str):
+    """현재 session_chat 1턴의 DB 호출을 같은 순서로 실행하고 단계별 측정값을 반환합니다."""
+    return [
+        ("agent 상태 확인", await measure(counter, lambda: activity_store.is_asleep(user_id))),
+        ("활동 기록", await measure(counter, lambda: activity_store.touch(user_id))),
+        ("컨텍스트 구성", await measure(counter, lambda: manager.build_agent_context(user_id, session_id, query="질문"))),
+        ("메시지 저장", await measure(counter, lambda: manager.append_message(user_id, session_id, "질문", "답변")))
+    ]
+
+async def run_benchmark(message_count: int, message_size: int):
+    counter = CommandCounter()
+    client = AsyncIOMotorClient(settings.MONGODB_URL, event_listeners=[counter])
+    collection = client[settings.DATABASE_NAME]["conversations_bench"]
+
+    bucket_store = MessageBucketStore()
+    bucket_store.buckets_collection = client[settings.DATABASE_NAME]["conversation_buckets_bench"]
+    await bucket_store.create_indexes()
+
+    manager = ConversationManager()
+    manager.conversations_collection = collection
+    manager.bucket_store = bucket_store
+
+    activity_store = AgentActivityStore()
+    activity_store.activity_collection = client[settings.DATABASE_NAME]["agent_activity_bench"]
+
+    user_id = f"bench-{uuid.uuid4()}"
+    old_session, new_session = "old", "new"
+    messages = make_messages(message_count, message_size)
+    await seed_legacy_session(collection, user_id, old_session, messages)
+    await seed_bucketed_session(collection, bucket_store, user_id, new_session, messages)
+
+    # 기존 경로
+    counter.reset()
+    await legacy_turn(collection, user_id, old_session)
+    old_result = (counter.round_trips, counter.sent_bytes, counter.received_bytes)
+
+    # 현재 경로 (첫 턴, 캐시가 채워진 다음 턴)
+    turns = [
+        await current_turn(counter, manager, activity_store, user_id, new_session),
+        await current_turn(counter, manager, activity_store, user_id, new_session)
+    ]
+
+    await collection.delete_many({"user_id": user_id})
+    await bucket_store.buckets_collection.delete_many({"user_id": user_id})
+    await activity_store.activity_collection.delete_many({"user_id": user_id})
+    client.close()
+
+    print(f"세션 크기: 메시지 {message_count}개 x {message_size}자")
+    print(f"{'경로':<20}{'왕복':>6}{'송신(B)':>14}{'수신(B)':>14}")
+    print(f"{'기존':<20}{old_result[0]:>6}{old_result[1]:>14}{old_result[2]:>14}")
+    for label, steps in zip(("현재 (첫 턴)", "현재 (다음 턴)"), turns):
+        total = [sum(result[i] for _, result in steps) for i in range(3)]
+        print(f"{label:<20}{total[0]:>6}{total[1]:>14}{total[2]:>14}")
+        for name, result in steps:
+            print(f"{'  - ' + name:<20}{result[0]:>6}{result[1]:>14}{result[2]:>14}")
+    print("※ 기존 경로에서 별도로 발생하던 get_user_by_id 1회는 현재 경로에서 제거되어 위 수치에 포함되지 않습니다.")
+    print("※ 실제 요청에서는 메시지 저장이 write-behind 큐로 응답 이후에 실행되며, 컨텍스트 구성에는 누적 요약 저장이 포함될 수 있습니다.")
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    size = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    asyncio.run(run_benchmark(count, size))
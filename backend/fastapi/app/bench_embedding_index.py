@@ -0,0 +1,91 @@
+"""
+세션 임베딩 인덱스의 색인 처리량과 검색 지연 시간을 측정하는 벤치마크 스크립트
+
+수천 턴짜리 합성 세션을 SessionEmbeddingIndex로 색인(임베딩 + MongoDB 저장)한 뒤,
+첫 검색(MongoDB에서 행렬 로드 포함)과 캐시된 행렬 검색의 지연 시간을 측정합니다.
+sentence-transformers, numpy가 설치되어 있어야 합니다.
+
+사용법:
+    python bench_embedding_index.py [턴 수] [색인 배치 크기] [검색 횟수]
+"""
+import asyncio
+import random
+import sys
+import time
+import uuid
+from motor.motor_asyncio import AsyncIOMotorClient
+from core.config import settings
+from crud.embedding_index import SessionEmbeddingIndex
+
+TOPICS = ["노션 페이지 정리", "깃허브 이슈 분류", "슬랙 채널 요약", "회의록 작성", "배포 일정 확인",
+          "데이터베이스 백업", "API 키 재발급", "팀 주간 보고", "버그 재현 절차", "고객 문의 답변"]
+
+def make_turns(count: int, rng: random.Random):
+    turns = []
+    for i in range(count):
+        topic = rng.choice(TOPICS)
+        turns.append({
+            "user_message": f"{topic} 관련해서 {i}번째 요청입니다. 자세히 알려주세요.",
+            "assistant_response": f"{topic} 작업 결과입니다. " * rng.randint(3, 20),
+        })
+    return turns
+
+def percentile(values, p: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * p), len(ordered) - 1)]
+
+async def run_benchmark(turn_count: int, batch_size: int, query_count: int):
+    settings.CHAT_RETRIEVAL_ENABLED = True
+    client = AsyncIOMotorClient(settings.MONGODB_URL)
+
+    index = SessionEmbeddingIndex()
+    index.embeddings_collection = client[settings.DATABASE_NAME]["conversation_embeddings_bench"]
+    await index.create_indexes()
+    await index.warmup()
+    if not index.enabled:
+        print("임베딩 모델을 로드할 수 없습니다. sentence-transformers 설치 여부를 확인하세요.")
+        return
+
+    rng = random.Random(7)
+    user_id, session_id = f"bench-{uuid.uuid4()}", "bench"
+    turns = make_turns(turn_count, rng)
+
+    # 1) 색인 처리량: 임베딩만 / 임베딩 + 저장
+    started = time.perf_counter()
+    await index.embed([t["user_message"] for t in turns[:batch_size * 4]])
+    embed_only = batch_size * 4 / (time.perf_counter() - started)
+
+    started = time.perf_counter()
+    for first in range(0, turn_count, batch_size):
+        await index.index_messages(user_id, session_id, first, turns[first:first + batch_size])
+    index_elapsed = time.perf_counter() - started
+
+    # 2) 검색 지연: 캐시 비움(행렬 로드 포함) / 캐시 적중
+    queries = [f"{rng.choice(TOPICS)} 다시 설명해 주세요" for _ in range(query_count)]
+    cold, warm = [], []
+    for query in queries:
+        index._matrices.clear()
+        started = time.perf_counter()
+        await index.search(user_id, session_id, query, top_k=3, before_seq=turn_count - 20)
+        cold.append((time.perf_counter() - started) * 1000)
+
+        started = time.perf_counter()
+        await index.search(user_id, session_id, query, top_k=3, before_seq=turn_count - 20)
+        warm.append((time.perf_counter() - started) * 1000)
+
+    await index.embeddings_collection.delete_many({"user_id": user_id})
+    client.close()
+
+    print(f"모델: {index.model_name}, 세션 크기: {turn_count}턴, 색인 배치: {batch_size}")
+    print(f"임베딩 처리량: {embed_only:.1f}턴/초")
+    print(f"색인 처리량(임베딩 + 저장): {turn_count / index_elapsed:.1f}턴/초 (전체 {index_elapsed:.1f}초)")
+    print(f"{'검색':<16}{'p50(ms)':>10}{'p95(ms)':>10}{'최대(ms)':>10}")
+    for name, values in (("행렬 로드 포함", cold), ("캐시 적중", warm)):
+        print(f"{name:<16}{percentile(values, 0.5):>10.1f}{percentile(values, 0.95):>10.1f}{max(values):>10.1f}")
+    print("※ 검색 지연에는 질문 임베딩 시간이 포함됩니다.")
+
+if __name__ == "__main__":
+    turns = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    batch = int(sys.argv[2]) if len(sys.argv) > 2 else 32
+    queries = int(sys.argv[3]) if len(sys.argv) > 3 else 50
+    asyncio.run(run_benchmark(turns, batch, queries))
@@ -0,0 +1,94 @@
+"""
+로그인 폭주 중 이벤트 루프 지연과 무관한 엔드포인트의 지연 시간을 측정하는 벤치마크 스크립트
+
+bcrypt 검증을 이벤트 루프에서 직접 실행하는 기존 방식(inline)과
+password_hasher 스레드 풀을 사용하는 방식(pool)을 같은 ASGI 앱에서 비교합니다.
+MongoDB 없이 미리 만든 해시로 검증만 수행하며, 요청은 같은 프로세스의 이벤트 루프에서 처리됩니다.
+
+사용법:
+    python bench_login_storm.py [동시 로그인 수] [로그인 총 횟수] [ping 횟수]
+"""
+import asyncio
+import sys
+import time
+import httpx
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+from core.security import get_password_hash, verify_password, password_hasher, PasswordHashOverloaded
+
+PASSWORD = "Bench-password-1!"
+HASHED = get_password_hash(PASSWORD)
+
+app = FastAPI()
+
+@app.post("/login/inline")
+async def login_inline():
+    return {"ok": verify_password(PASSWORD, HASHED)}
+
+@app.post("/login/pool")
+async def login_pool():
+    try:
+        return {"ok": await password_hasher.verify(PASSWORD, HASHED)}
+    except PasswordHashOverloaded:
+        return JSONResponse(status_code=503, content={"ok": False})
+
+@app.get("/ping")
+async def ping():
+    return {"ok": True}
+
+def percentile(values, p: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * p), len(ordered) - 1)] if ordered else 0.0
+
+async def monitor_loop_lag(stop: asyncio.Event, samples: list, interval: float = 0.01):
+    """interval마다 깨어나 예정 시각보다 늦어진 시간(ms)을 기록합니다."""
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        samples.append((time.perf_counter() - started - interval) * 1000)
+
+async def run_mode(client: httpx.AsyncClient, mode: str, concurrency: int, total: int, ping_count: int):
+    stop = asyncio.Event()
+    lag, ping_latency, statuses = [], [], []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def login():
+        async with semaphore:
+            response = await client.post(f"/login/{mode}")
+            statuses.append(response.status_code)
+
+    async def pinger():
+        for _ in range(ping_count):
+            started = time.perf_counter()
+            await client.get("/ping")
+            ping_latency.append((time.perf_counter() - started) * 1000)
+            await asyncio.sleep(0.005)
+
+    monitor = asyncio.create_task(monitor_loop_lag(stop, lag))
+    started = time.perf_counter()
+    await asyncio.gather(pinger(), *(login() for _ in range(total)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    await monitor
+
+    rejected = sum(1 for status in statuses if status == 503)
+    print(f"{mode:<8}{total / elapsed:>10.1f}{percentile(lag, 0.99):>12.1f}{max(lag):>12.1f}"
+          f"{percentile(ping_latency, 0.5):>12.1f}{percentile(ping_latency, 0.99):>12.1f}{rejected:>8}")
+
+async def run_benchmark(concurrency: int, total: int, ping_count: int):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        print(f"동시 로그인: {concurrency}, 로그인 총 횟수: {total}, ping: {ping_count}회, "
+              f"스레드 풀: {password_hasher.workers}개 / 대기 한도 {password_hasher.max_pending}")
+        print(f"{'방식':<8}{'로그인/초':>10}{'루프지연p99':>12}{'루프지연최대':>12}"
+              f"{'ping p50':>12}{'ping p99':>12}{'503':>8}")
+        for mode in ("inline", "pool"):
+            await run_mode(client, mode, concurrency, total, ping_count)
+    print("※ 지연 단위는 ms입니다. 503은 대기열 초과로 거절된 로그인 수입니다.")
+    password_hasher.shutdown()
+
+if __name__ == "__main__":
+    concurrency = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    total = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    pings = int(sys.argv[3]) if len(sys.argv) > 3 else 200
+    asyncio.run(run_benchmark(concurrency, total, pings))
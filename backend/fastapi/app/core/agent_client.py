@@ -0,0 +1,225 @@
+import asyncio, json, logging, time
+from contextlib import asynccontextmanager
+from typing import Dict, Any, List, Optional, AsyncIterator, Set
+import httpx
+from core.config import settings
+from crud.agent_activity import agent_activity_store
+
+# 로깅 설정
+logger = logging.getLogger(__name__)
+
+def get_agent_base_url(user_id: str) -> str:
+    """사용자별 agent Service 주소를 반환합니다."""
+    return settings.AGENT_SERVICE_URL_TEMPLATE.format(user_id=user_id).rstrip("/")
+
+def _parse_server_timing(header: Optional[str]) -> Optional[float]:
+    """agent가 내려준 Server-Timing 헤더에서 처리 시간(ms)을 추출합니다."""
+    if not header:
+        return None
+    for part in header.split(";"):
+        part = part.strip()
+        if part.startswith("dur="):
+            try:
+                return float(part[4:])
+            except ValueError:
+                return None
+    return None
+
+class AgentClient:
+    """
+    backend → agent Pod 간 HTTP 전송 계층.
+
+    kubectl exec + curl 대신 agent-{user_id} Service로 직접 요청하며,
+    프로세스 전체에서 keep-alive 커넥션 풀 하나를 공유합니다.
+    """
+
+    def __init__(self):
+        self._client: Optional[httpx.AsyncClient] = None
+        # 호스트(사용자 Pod)별 동시 요청 수 제한 (요청 중이거나 대기 중인 사용자만 유지)
+        self._host_semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._host_users: Dict[str, int] = {}
+        # /ready로 준비 완료가 확인된 사용자 (확인된 뒤에는 채팅마다 다시 조회하지 않음)
+        self._ready_users: Set[str] = set()
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None or self._client.is_closed:
+            limits = httpx.Limits(
+                max_connections=settings.AGENT_HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.AGENT_HTTP_MAX_KEEPALIVE,
+                keepalive_expiry=60,
+            )
+            # retries는 커넥션 수립 실패에만 적용되므로 agent 쪽 중복 실행 위험이 없음
+            transport = httpx.AsyncHTTPTransport(limits=limits, retries=settings.AGENT_HTTP_RETRIES)
+            self._client = httpx.AsyncClient(
+                transport=transport,
+                timeout=httpx.Timeout(settings.AGENT_HTTP_TIMEOUT, connect=settings.AGENT_HTTP_CONNECT_TIMEOUT),
+                headers=self._default_headers(),
+            )
+        return self._client
+
+    @staticmethod
+    def _default_headers() -> Dict[str, str]:
+        headers = {"Content-Type": "application/json"}
+        # 멀티 테넌트 agent는 control 토큰이 있는 요청만 처리 (사용자별 Pod도 같은 토큰을 가지므로 항상 전송)
+        if settings.AGENT_CONTROL_TOKEN:
+            headers["Authorization"] = f"Bearer {settings.AGENT_CONTROL_TOKEN}"
+        return headers
+
+    @asynccontextmanager
+    async def _host_slot(self, user_id: str):
+        semaphore = self._host_semaphores.get(user_id)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(settings.AGENT_HTTP_MAX_PER_HOST)
+            self._host_semaphores[user_id] = semaphore
+        self._host_users[user_id] = self._host_users.get(user_id, 0) + 1
+        try:
+            async with semaphore:
+                yield
+        finally:
+            # 마지막 요청이 끝나면 정리해 사용자 수만큼 계속 늘어나지 않게 함
+            self._host_users[user_id] -= 1
+            if self._host_users[user_id] == 0:
+                del self._host_users[user_id]
+                del self._host_semaphores[user_id]
+
+    async def post(self, user_id: str, path: str, payload: Dict[str, Any], timeout: Optional[float] = None) -> Dict[str, Any]:
+        """
+        사용자 agent에 JSON POST 요청을 보내고 응답 본문을 반환합니다.
+
+        Raises:
+            httpx.TimeoutException: 응답 시간 초과
+            httpx.HTTPError: 연결 실패 또는 4xx/5xx 응답
+        """
+        url = f"{get_agent_base_url(user_id)}{path}"
+        client = self._get_client()
+        request_timeout = httpx.Timeout(timeout, connect=settings.AGENT_HTTP_CONNECT_TIMEOUT) if timeout else None
+
+        async with self._host_slot(user_id):
+            started = time.perf_counter()
+            try:
+                if request_timeout:
+                    response = await client.post(url, json=payload, timeout=request_timeout)
+                else:
+                    response = await client.post(url, json=payload)
+            except httpx.ConnectError:
+                self.mark_not_ready(user_id)
+                raise
+            finally:
+                elapsed_ms = (time.perf_counter() - started) * 1000
+        if response.status_code == 503:
+            self.mark_not_ready(user_id)
+
+        agent_ms = _parse_server_timing(response.headers.get("server-timing"))
+        if agent_ms is not None:
+            logger.info(f"agent 요청 완료 - 사용자: {user_id}, 경로: {path}, 상태: {response.status_code}, "
+                        f"전체: {elapsed_ms:.1f}ms, agent 처리: {agent_ms:.1f}ms, 네트워크: {elapsed_ms - agent_ms:.1f}ms")
+        else:
+            logger.info(f"agent 요청 완료 - 사용자: {user_id}, 경로: {path}, 상태: {response.status_code}, 전체: {elapsed_ms:.1f}ms")
+
+        response.raise_for_status()
+        return response.json()
+
+    async def get(self, user_id: str, path: str, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """
+        사용자 agent에 GET 요청을 보내고 응답 본문을 반환합니다 (상태 확인용).
+
+        Raises:
+            httpx.TimeoutException: 응답 시간 초과
+            httpx.HTTPError: 연결 실패 또는 4xx/5xx 응답
+        """
+        url = f"{get_agent_base_url(user_id)}{path}"
+        request_timeout = httpx.Timeout(timeout or settings.AGENT_HTTP_TIMEOUT, connect=settings.AGENT_HTTP_CONNECT_TIMEOUT)
+        response = await self._get_client().get(url, timeout=request_timeout)
+        response.raise_for_status()
+        return response.json()
+
+    def mark_not_ready(self, user_id: str):
+        """agent가 재배포·재기동되어 다시 준비 상태를 확인해야 함을 기록합니다 (유휴 정리 여부도 다시 조회)."""
+        self._ready_users.discard(user_id)
+        agent_activity_store.forget_state(user_id)
+
+    async def wait_ready(self, user_id: str, timeout: float) -> bool:
+        """
+        agent의 /ready가 200을 반환할 때까지(MCP 서버 연결과 도구 목록 조회 완료) 기다립니다.
+        timeout 안에 준비되지 않으면 False를 반환합니다.
+        """
+        if user_id in self._ready_users:
+            return True
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                await self.get(user_id, "/ready", timeout=3)
+                self._ready_users.add(user_id)
+                return True
+            except httpx.HTTPError:
+                if time.monotonic() >= deadline:
+                    return False
+                await asyncio.sleep(settings.AGENT_READY_POLL_INTERVAL)
+
+    async def push_config(self, user_id: str, env: List[Dict[str, str]], revision: int) -> Dict[str, Any]:
+        """
+        실행 중인 agent의 /control/config로 사용자 전체 설정을 보내 바뀐 MCP 서버만 다시 연결하게 합니다.
+
+        Raises:
+            httpx.TimeoutException: 응답 시간 초과
+            httpx.HTTPError: 연결 실패 또는 4xx/5xx 응답 (409: 더 최신 설정이 이미 적용됨)
+        """
+        url = f"{get_agent_base_url(user_id)}/control/config"
+        request_timeout = httpx.Timeout(settings.AGENT_CONFIG_PUSH_TIMEOUT, connect=settings.AGENT_HTTP_CONNECT_TIMEOUT)
+        started = time.perf_counter()
+        response = await self._get_client().put(
+            url,
+            json={"env": env, "revision": revision},
+            headers={"Authorization": f"Bearer {settings.AGENT_CONTROL_TOKEN}"},
+            timeout=request_timeout,
+        )
+        logger.info(f"agent 설정 반영 요청 - 사용자: {user_id}, 상태: {response.status_code}, "
+                    f"소요: {(time.perf_counter() - started) * 1000:.1f}ms")
+        response.raise_for_status()
+        return response.json()
+
+    async def query(self, user_id: str, payload: Dict[str, Any], timeout: Optional[float] = None) -> Dict[str, Any]:
+        """agent의 /agent-query 엔드포인트를 호출합니다."""
+        return await self.post(user_id, "/agent-query", payload, timeout=timeout)
+
+    async def stream(self, user_id: str, payload: Dict[str, Any], timeout: Optional[float] = None) -> AsyncIterator[Dict[str, Any]]:
+        """
+        agent의 /agent-query-stream 엔드포인트를 호출하고 NDJSON 이벤트를 하나씩 반환합니다.
+
+        Raises:
+            httpx.TimeoutException: 응답 시간 초과
+            httpx.HTTPError: 연결 실패 또는 4xx/5xx 응답
+        """
+        url = f"{get_agent_base_url(user_id)}/agent-query-stream"
+        client = self._get_client()
+        # 스트림은 전체 길이 대신 이벤트 간 대기 시간(read)에 타임아웃을 적용
+        request_timeout = httpx.Timeout(timeout or settings.AGENT_HTTP_TIMEOUT, connect=settings.AGENT_HTTP_CONNECT_TIMEOUT)
+
+        async with self._host_slot(user_id):
+            started = time.perf_counter()
+            first_event_ms = None
+            try:
+                async with client.stream("POST", url, json=payload, timeout=request_timeout) as response:
+                    if response.status_code == 503:
+                        self.mark_not_ready(user_id)
+                    response.raise_for_status()
+                    async for line in response.aiter_lines():
+                        if not line.strip():
+                            continue
+                        if first_event_ms is None:
+                            first_event_ms = (time.perf_counter() - started) * 1000
+                            logger.info(f"agent 스트림 첫 이벤트 - 사용자: {user_id}, 소요: {first_event_ms:.1f}ms")
+                        yield json.loads(line)
+            except httpx.ConnectError:
+                self.mark_not_ready(user_id)
+                raise
+            logger.info(f"agent 스트림 완료 - 사용자: {user_id}, 전체: {(time.perf_counter() - started) * 1000:.1f}ms")
+
+    async def close(self):
+        """커넥션 풀을 정리합니다."""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+# 전역 인스턴스
+agent_client = AgentClient()
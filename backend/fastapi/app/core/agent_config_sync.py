@@ -0,0 +1,101 @@
+import asyncio, logging, time
+from typing import Any, Dict
+import httpx
+from core.agent_client import agent_client
+from core.config import settings
+from core.create_pod import build_agent_env
+from core.pod_provisioner import pod_provisioner
+from crud.agent_activity import agent_activity_store, STATE_SLEEPING, STATE_WAKING
+
+# 로깅 설정
+logger = logging.getLogger(__name__)
+
+class AgentConfigSync:
+    """
+    MCP 선택·환경 변수 변경을 실행 중인 agent에 재배포 없이 반영합니다.
+
+    DB 기준의 사용자 전체 설정을 agent의 /control/config로 보내 바뀐 MCP 서버만 다시 연결하게 하고,
+    operator에 반영된 설정을 기록해 다음 배포 요청(로그인 등)이 같은 설정으로 재배포하지 않게 합니다.
+    agent가 중지 상태면 다음 재기동 때 DB 설정으로 배포되므로 보내지 않으며,
+    활동 기록이 없어 실행 여부를 알 수 없거나 반영에 실패하면 기존처럼 재배포 작업을 등록합니다.
+    """
+
+    def __init__(self):
+        # 같은 사용자의 연속 변경을 순서대로 반영 (반영 중이거나 대기 중인 사용자만 유지)
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._lock_users: Dict[str, int] = {}
+        self.applied = 0
+        self.redeploys = 0
+
+    async def sync(self, user_id: str) -> Dict[str, Any]:
+        if not settings.AGENT_CONTROL_TOKEN:
+            return {"applied": False, "reason": "disabled"}
+        state = await agent_activity_store.get_state(user_id)
+        if state in (STATE_SLEEPING, STATE_WAKING):
+            return {"applied": False, "reason": "not_running"}
+        if state is None:
+            # 아직 채팅하지 않아 활동 기록이 없는 사용자도 Pod는 실행 중일 수 있으므로 재배포로 반영
+            return await self._redeploy(user_id, "활동 기록 없음")
+
+        lock = self._locks.setdefault(user_id, asyncio.Lock())
+        self._lock_users[user_id] = self._lock_users.get(user_id, 0) + 1
+        try:
+            async with lock:
+                return await self._push(user_id)
+        finally:
+            self._lock_users[user_id] -= 1
+            if self._lock_users[user_id] == 0:
+                del self._lock_users[user_id]
+                del self._locks[user_id]
+
+    async def _push(self, user_id: str) -> Dict[str, Any]:
+        env = await build_agent_env(user_id)
+        # 여러 워커에서 보낸 요청이 늦게 도착해도 agent가 이전 설정으로 되돌리지 않도록 버전 전달
+        revision = time.time_ns()
+        started = time.perf_counter()
+        try:
+            result = await agent_client.push_config(user_id, env, revision)
+        except httpx.HTTPStatusError as e:
+            if e.response.status_code == 409:
+                return {"applied": False, "reason": "superseded"}
+            return await self._redeploy(user_id, f"agent 응답 {e.response.status_code}")
+        except httpx.TimeoutException:
+            # agent가 MCP 서버 연결을 계속 진행하므로 재배포하지 않음
+            logger.warning(f"agent 설정 반영 응답 시간 초과 - 사용자: {user_id}")
+            return {"applied": False, "reason": "timeout"}
+        except httpx.HTTPError as e:
+            return await self._redeploy(user_id, str(e))
+
+        await self._record_live_config(user_id, env)
+        self.applied += 1
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        logger.info(f"agent 설정 반영 완료 - 사용자: {user_id}, 추가: {result.get('added')}, "
+                    f"제거: {result.get('removed')}, 소요: {elapsed_ms:.1f}ms")
+        return {
+            "applied": True,
+            "added": result.get("added", []),
+            "updated": result.get("updated", []),
+            "removed": result.get("removed", []),
+            "elapsed_ms": round(elapsed_ms, 1)
+        }
+
+    async def _record_live_config(self, user_id: str, env: list):
+        try:
+            async with httpx.AsyncClient(timeout=10) as client:
+                response = await client.post(f"{settings.DEPLOY_SERVER_URL}/live-config", json={"user_id": user_id, "env": env})
+                response.raise_for_status()
+        except httpx.HTTPError as e:
+            # 기록하지 못해도 agent에는 반영됐으며, 다음 배포 요청에서 재배포될 뿐임
+            logger.warning(f"operator 설정 반영 기록 실패 - 사용자: {user_id}, 오류: {str(e)}")
+
+    async def _redeploy(self, user_id: str, reason: str) -> Dict[str, Any]:
+        logger.warning(f"agent 설정 반영 실패, 재배포로 반영 - 사용자: {user_id}, 원인: {reason}")
+        self.redeploys += 1
+        job = await pod_provisioner.submit(user_id)
+        return {"applied": False, "reason": "redeploy", "job_id": job["job_id"], "phase": job["phase"]}
+
+    def metrics(self) -> Dict[str, Any]:
+        return {"enabled": bool(settings.AGENT_CONTROL_TOKEN), "applied": self.applied, "redeploys": self.redeploys}
+
+# 전역 인스턴스
+agent_config_sync = AgentConfigSync()
@@ -35,6 +35,87 @@ class Settings(BaseSettings):
     # AGENT
     AGENT_URL: str = os.getenv("AGENT_URL")
 
+    # AGENT 직접 호출 (사용자별 agent-{user_id} ClusterIP Service)
+    AGENT_SERVICE_URL_TEMPLATE: str = os.getenv("AGENT_SERVICE_URL_TEMPLATE") or "http://agent-{user_id}.agent-env.svc.cluster.local"
+    AGENT_HTTP_TIMEOUT: float = float(os.getenv("AGENT_HTTP_TIMEOUT", "60"))
+    AGENT_HTTP_CONNECT_TIMEOUT: float = float(os.getenv("AGENT_HTTP_CONNECT_TIMEOUT", "3"))
+    AGENT_HTTP_MAX_CONNECTIONS: int = int(os.getenv("AGENT_HTTP_MAX_CONNECTIONS", "200"))
+    AGENT_HTTP_MAX_KEEPALIVE: int = int(os.getenv("AGENT_HTTP_MAX_KEEPALIVE", "100"))
+    AGENT_HTTP_MAX_PER_HOST: int = int(os.getenv("AGENT_HTTP_MAX_PER_HOST", "4"))
+    AGENT_HTTP_RETRIES: int = int(os.getenv("AGENT_HTTP_RETRIES", "2"))
+
+    # 메시지 저장 write-behind 큐
+    MESSAGE_WRITE_BEHIND_ENABLED: bool = os.getenv("MESSAGE_WRITE_BEHIND_ENABLED", "true").lower() == "true"
+    MESSAGE_WRITE_BATCH_SIZE: int = int(os.getenv("MESSAGE_WRITE_BATCH_SIZE", "50"))
+    MESSAGE_WRITE_FLUSH_INTERVAL: float = float(os.getenv("MESSAGE_WRITE_FLUSH_INTERVAL", "0.2"))
+    MESSAGE_WRITE_MAX_RETRIES: int = int(os.getenv("MESSAGE_WRITE_MAX_RETRIES", "3"))
+    # 저장 실패 시 첫 재시도 대기(초, 시도마다 2배), 종료 시 남은 메시지를 저장하며 기다리는 최대 시간(초)
+    MESSAGE_WRITE_RETRY_BACKOFF: float = float(os.getenv("MESSAGE_WRITE_RETRY_BACKOFF", "0.5"))
+    MESSAGE_WRITE_DRAIN_TIMEOUT: float = float(os.getenv("MESSAGE_WRITE_DRAIN_TIMEOUT", "30"))
+
+    # 기본 세션 ID 캐시
+    DEFAULT_SESSION_CACHE_SIZE: int = int(os.getenv("DEFAULT_SESSION_CACHE_SIZE", "10000"))
+    DEFAULT_SESSION_CACHE_TTL: float = float(os.getenv("DEFAULT_SESSION_CACHE_TTL", "600"))
+
+    # 세션별 다음 메시지 순번 캐시 (버킷 세션 추가 시 세션 조회 생략)
+    SESSION_SEQ_CACHE_SIZE: int = int(os.getenv("SESSION_SEQ_CACHE_SIZE", "10000"))
+    SESSION_SEQ_CACHE_TTL: float = float(os.getenv("SESSION_SEQ_CACHE_TTL", "600"))
+
+    # Agent 대화 컨텍스트 토큰 예산
+    CHAT_CONTEXT_TOKEN_BUDGET: int = int(os.getenv("CHAT_CONTEXT_TOKEN_BUDGET", "3000"))
+    CHAT_CONTEXT_SUMMARY_TOKENS: int = int(os.getenv("CHAT_CONTEXT_SUMMARY_TOKENS", "600"))
+    CHAT_CONTEXT_MESSAGE_TOKENS: int = int(os.getenv("CHAT_CONTEXT_MESSAGE_TOKENS", "800"))
+    # 컨텍스트 구성 시 조회하는 최근 메시지 수. 누적 요약도 이 범위의 턴으로만 만들므로
+    # 그보다 앞선 미요약 턴(요약 없이 길어진 세션)은 "생략" 줄 하나로 대체됩니다.
+    CHAT_CONTEXT_FETCH_LIMIT: int = int(os.getenv("CHAT_CONTEXT_FETCH_LIMIT", "20"))
+
+    # 관련 대화 검색 (선택 기능)
+    # 켜려면 requirements-retrieval.txt(sentence-transformers, numpy)를 설치해야 하며 (Docker: --build-arg INSTALL_RETRIEVAL=true),
+    # 설치되지 않았거나 모델을 불러올 수 없으면 경고를 남기고 검색 없이 동작합니다.
+    CHAT_RETRIEVAL_ENABLED: bool = os.getenv("CHAT_RETRIEVAL_ENABLED", "false").lower() == "true"
+    CHAT_EMBEDDING_MODEL: str = os.getenv("CHAT_EMBEDDING_MODEL") or "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+    CHAT_RETRIEVAL_TOP_K: int = int(os.getenv("CHAT_RETRIEVAL_TOP_K", "3"))
+    CHAT_RETRIEVAL_MIN_SCORE: float = float(os.getenv("CHAT_RETRIEVAL_MIN_SCORE", "0.35"))
+    CHAT_RETRIEVAL_TOKENS: int = int(os.getenv("CHAT_RETRIEVAL_TOKENS", "800"))
+    CHAT_RETRIEVAL_CACHE_SIZE: int = int(os.getenv("CHAT_RETRIEVAL_CACHE_SIZE", "200"))
+    CHAT_RETRIEVAL_CACHE_TTL: float = float(os.getenv("CHAT_RETRIEVAL_CACHE_TTL", "120"))
+
+    # 인증 주체(사용자) 캐시
+    PRINCIPAL_CACHE_SIZE: int = int(os.getenv("PRINCIPAL_CACHE_SIZE", "10000"))
+    PRINCIPAL_CACHE_TTL: float = float(os.getenv("PRINCIPAL_CACHE_TTL", "60"))
+    # 여러 워커 간 캐시 일관성을 위한 users change stream 구독 (레플리카 셋 필요)
+    PRINCIPAL_CACHE_CHANGE_STREAM: bool = os.getenv("PRINCIPAL_CACHE_CHANGE_STREAM", "false").lower() == "true"
+
+    # 비밀번호 해싱 스레드 풀 (bcrypt)
+    PASSWORD_HASH_WORKERS: int = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+    PASSWORD_HASH_MAX_PENDING: int = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "32"))
+    PASSWORD_HASH_ADMISSION_TIMEOUT: float = float(os.getenv("PASSWORD_HASH_ADMISSION_TIMEOUT", "2"))
+
+    # Pod 프로비저닝 백그라운드 작업
+    POD_PROVISION_CONCURRENCY: int = int(os.getenv("POD_PROVISION_CONCURRENCY", "10"))
+    POD_DEPLOY_TIMEOUT: int = int(os.getenv("POD_DEPLOY_TIMEOUT", "150"))
+    POD_READY_TIMEOUT: float = float(os.getenv("POD_READY_TIMEOUT", "120"))
+    POD_JOB_HEARTBEAT_SECONDS: float = float(os.getenv("POD_JOB_HEARTBEAT_SECONDS", "20"))
+    POD_JOB_STALE_SECONDS: float = float(os.getenv("POD_JOB_STALE_SECONDS", "120"))
+
+    # 유휴 agent Pod 정리 (scale-to-zero) 및 채팅 시 재기동
+    AGENT_IDLE_REAPER_ENABLED: bool = os.getenv("AGENT_IDLE_REAPER_ENABLED", "true").lower() == "true"
+    AGENT_IDLE_TTL_SECONDS: float = float(os.getenv("AGENT_IDLE_TTL_SECONDS", "1800"))
+    AGENT_IDLE_CHECK_INTERVAL: float = float(os.getenv("AGENT_IDLE_CHECK_INTERVAL", "60"))
+    AGENT_ACTIVITY_TOUCH_INTERVAL: float = float(os.getenv("AGENT_ACTIVITY_TOUCH_INTERVAL", "30"))
+    AGENT_WAKE_WAIT_SECONDS: float = float(os.getenv("AGENT_WAKE_WAIT_SECONDS", "5"))
+
+    # agent 준비(MCP 서버 연결 완료) 대기 - 준비 전 채팅은 실패시키지 않고 이 시간만큼 보류
+    AGENT_READY_WAIT_SECONDS: float = float(os.getenv("AGENT_READY_WAIT_SECONDS", "30"))
+    AGENT_READY_POLL_INTERVAL: float = float(os.getenv("AGENT_READY_POLL_INTERVAL", "1"))
+
+    # MCP 선택·환경 변수 변경을 실행 중인 agent에 직접 반영 (비어 있으면 기존처럼 재배포로 반영)
+    AGENT_CONTROL_TOKEN: str = os.getenv("AGENT_CONTROL_TOKEN", "")
+    AGENT_CONFIG_PUSH_TIMEOUT: float = float(os.getenv("AGENT_CONFIG_PUSH_TIMEOUT", "30"))
+
+    # 내부 메트릭(GET /metrics) 조회 토큰 (비어 있으면 엔드포인트 비활성화)
+    METRICS_TOKEN: str = os.getenv("METRICS_TOKEN", "")
+
     # CORS 설정
     CORS_ORIGINS: List[str] = Field(
     default_factory=lambda: json.loads(os.getenv("CORS_ORIGINS", "[]"))
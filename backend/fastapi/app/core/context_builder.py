@@ -0,0 +1,136 @@
+import logging, re
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
+
+# 로깅 설정
+logger = logging.getLogger(__name__)
+
+# 메시지 한 건(사용자 + 어시스턴트)을 프롬프트에 넣을 때 붙는 라벨/줄바꿈 비용
+MESSAGE_OVERHEAD_TOKENS = 8
+
+# 요약 한 줄에 남기는 사용자/어시스턴트 발화 길이 (토큰)
+SUMMARY_USER_TOKENS = 40
+SUMMARY_ASSISTANT_TOKENS = 60
+
+@lru_cache(maxsize=1)
+def _get_encoding():
+    """tiktoken 인코딩을 한 번만 로드합니다. 설치되어 있지 않거나 로드에 실패하면 None."""
+    try:
+        import tiktoken
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        logger.warning(f"tiktoken을 사용할 수 없어 근사 토큰 계산을 사용합니다: {str(e)}")
+        return None
+
+def count_tokens(text: Optional[str]) -> int:
+    """텍스트의 토큰 수를 계산합니다. tiktoken이 없으면 UTF-8 바이트 수 기반으로 근사합니다."""
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text))
+    # 한글 1자(3바이트) ≈ 1토큰, 영문 3~4자 ≈ 1토큰
+    return len(text.encode("utf-8")) // 3 + 1
+
+def truncate_to_tokens(text: Optional[str], max_tokens: int) -> str:
+    """텍스트를 max_tokens 이내로 자릅니다. 잘린 경우 끝에 '…'를 붙입니다."""
+    if not text or max_tokens <= 0:
+        return ""
+    encoding = _get_encoding()
+    if encoding is not None:
+        tokens = encoding.encode(text)
+        if len(tokens) <= max_tokens:
+            return text
+        return encoding.decode(tokens[:max_tokens]) + "…"
+    encoded = text.encode("utf-8")
+    max_bytes = max_tokens * 3
+    if len(encoded) <= max_bytes:
+        return text
+    return encoded[:max_bytes].decode("utf-8", errors="ignore") + "…"
+
+def _one_line(text: Optional[str]) -> str:
+    return re.sub(r"\s+", " ", text or "").strip()
+
+def summarize_turn(message: Dict[str, Any]) -> str:
+    """오래된 대화 한 턴을 요약 한 줄로 압축합니다."""
+    user = truncate_to_tokens(_one_line(message.get("user")), SUMMARY_USER_TOKENS)
+    assistant = truncate_to_tokens(_one_line(message.get("assistant")), SUMMARY_ASSISTANT_TOKENS)
+    return f"- 사용자: {user} / 어시스턴트: {assistant}"
+
+def compact_summary(lines: List[str], max_tokens: int) -> List[str]:
+    """요약이 max_tokens를 넘으면 가장 오래된 줄부터 제거합니다."""
+    total = sum(count_tokens(line) + 1 for line in lines)
+    start = 0
+    while start < len(lines) and total > max_tokens:
+        total -= count_tokens(lines[start]) + 1
+        start += 1
+    return lines[start:]
+
+def build_context(history: List[Dict[str, Any]], total_messages: int,
+                  summary_state: Optional[Dict[str, Any]], token_budget: int,
+                  summary_tokens: int, message_tokens: int) -> Dict[str, Any]:
+    """
+    최근 메시지와 누적 요약을 토큰 예산 안에 맞춰 Agent 컨텍스트를 구성합니다.
+
+    요약은 history에 포함된 턴으로만 만들므로, 그보다 앞선 미요약 턴은 본문 없이 생략 줄 하나로 남습니다.
+    요약 갱신이 필요 없으면(창 밖으로 새로 밀려난 턴이 없으면) summary_state로 None을 반환합니다.
+
+    Args:
+        history: 세션의 최근 메시지 (오래된 순, {"user", "assistant", "timestamp"})
+        total_messages: 세션 전체 메시지 수 (history 마지막 메시지의 순번 + 1)
+        summary_state: 세션에 저장된 누적 요약 {"lines": [...], "covered_count": n}
+        token_budget: 요약 + 히스토리 전체 토큰 예산
+        summary_tokens: 요약에 할당하는 최대 토큰
+        message_tokens: 메시지 한 건(사용자/어시스턴트 각각)의 최대 토큰
+
+    Returns:
+        history: 예산 안에 들어간 메시지 (길면 잘림)
+        summary: 프롬프트에 넣을 요약 텍스트
+        summary_state: 갱신된 누적 요약 (변경이 없으면 None, 저장할 필요 없음)
+        prompt_tokens: 요약 + 히스토리의 토큰 수
+    """
+    state = summary_state or {"lines": [], "covered_count": 0}
+    lines = list(state.get("lines", []))
+    covered = state.get("covered_count", 0)
+
+    # 1) 최신 메시지부터 예산이 허락하는 만큼 채움 (요약 몫은 미리 확보)
+    history_budget = max(token_budget - summary_tokens, 0)
+    packed: List[Dict[str, Any]] = []
+    used = 0
+    for message in reversed(history):
+        user = truncate_to_tokens(message.get("user"), message_tokens)
+        assistant = truncate_to_tokens(message.get("assistant"), message_tokens)
+        cost = count_tokens(user) + count_tokens(assistant) + MESSAGE_OVERHEAD_TOKENS
+        # 가장 최근 메시지 하나는 예산을 넘더라도 포함
+        if packed and used + cost > history_budget:
+            break
+        packed.append({**message, "user": user, "assistant": assistant})
+        used += cost
+    packed.reverse()
+
+    # 2) 창 밖으로 밀려난 메시지 중 아직 요약되지 않은 것을 요약에 추가
+    first_kept = total_messages - len(packed)
+    fetched_start = total_messages - len(history)
+    new_lines = []
+    # 조회 범위(history)보다 앞선 미요약 턴은 본문이 없으므로 생략했다는 줄만 남김
+    # (요약 없이 길어진 세션을 처음 구성하거나 한 번에 조회 범위 이상 쌓인 경우)
+    skipped = fetched_start - covered
+    if skipped > 0:
+        new_lines.append(f"- (요약되지 않은 이전 대화 {skipped}턴 생략)")
+    new_lines.extend(
+        summarize_turn(history[i - fetched_start])
+        for i in range(max(covered, fetched_start), first_kept)
+    )
+
+    updated_state = None
+    if new_lines:
+        lines = compact_summary(lines + new_lines, summary_tokens)
+        updated_state = {"lines": lines, "covered_count": first_kept}
+
+    summary = "\n".join(lines)
+    return {
+        "history": packed,
+        "summary": summary,
+        "summary_state": updated_state,
+        "prompt_tokens": used + count_tokens(summary)
+    }
@@ -1,5 +1,5 @@
 import json, os, asyncio, logging
-from typing import Dict, Any
+from typing import Dict, Any, List
 from crud.nosql import get_user_by_id, update_pod_name, get_env_vars, get_user_selected_mcps
 from core.config import settings
 
@@ -60,12 +60,57 @@ async def run_command(cmd, timeout=60):
             "stderr": f"명령 실행 오류: {str(e)}"
         }
 
-async def create_pod(user_id: str) -> Dict[str, Any]:
+async def build_agent_env(user_id: str) -> List[Dict[str, str]]:
+    """
+    사용자 agent에 전달할 환경 변수 목록을 구성합니다 (API 키, MCP_SERVICES, 사용자 MCP 환경 변수).
+    Pod 배포와 실행 중 설정 반영(agent_config_sync)이 같은 목록을 사용하므로 operator의 설정 해시도 같게 계산됩니다.
+    """
+    env_vars_list = []
+    
+    # 기본 환경 변수 추가
+    env_vars_list.append({"name":"GMS_API_KEY","value":settings.GMS_API_KEY})
+    # env_vars_list.append({"name":"GMS_API_BASE","value":settings.GMS_API_BASE})
+    env_vars_list.append({"name":"OPENAI_API_KEY","value":settings.OPENAI_API_KEY})
+    
+    # 사용자가 선택한 MCP 서비스 목록 가져오기
+    selected_mcps = await get_user_selected_mcps(user_id)
+    if selected_mcps:
+        # 선택한 MCP 타입들을 콤마로 구분된 문자열로 저장
+        mcp_types = []
+        for mcp in selected_mcps:
+            mcp_type = mcp.get("mcp_type")
+            if mcp_type and mcp_type not in mcp_types:
+                mcp_types.append(mcp_type)
+        
+        # MCP_SERVICES 환경 변수로 추가
+        if mcp_types:
+            mcp_services_value = ",".join(mcp_types)
+            env_vars_list.append({"name": "MCP_SERVICES", "value": mcp_services_value})
+            logger.info(f"사용자 {user_id}의 MCP 서비스: {mcp_services_value}")
+    else:
+        # MCP가 없는 경우에도 빈 값을 설정하거나 기본값 설정
+        env_vars_list.append({"name": "MCP_SERVICES", "value": " "})
+        logger.info(f"사용자 {user_id}에게 선택된 MCP가 없습니다. 빈 MCP_SERVICES로 진행합니다.")
+    
+    # 사용자가 설정한 환경 변수 조회 및 추가
+    user_env_settings = await get_env_vars(user_id)
+    if user_env_settings:
+        for mcp_id, mcp_env_vars in user_env_settings.items():
+            for key, value in mcp_env_vars.items():
+                # 키에 공백 제거 및 대문자로 변환 (Kubernetes 환경변수 네이밍 규칙)
+                env_key = key.strip().upper().replace(' ', '_')
+                # 중복 방지
+                if not any(env["name"] == env_key for env in env_vars_list):
+                    env_vars_list.append({"name": env_key, "value": value})
+    return env_vars_list
+
+async def create_pod(user_id: str, timeout: int = 60) -> Dict[str, Any]:
     """
     사용자 ID를 기반으로 Pod를 생성하고, 생성된 Pod 이름을 DB에 저장합니다.
     
     Args:
         user_id: 사용자의 ID (UUID 문자열)
+        timeout: 배포 서버 응답 대기 시간 (초, 배포 서버는 새 Pod가 Running이 될 때까지 응답하지 않음)
         
     Returns:
         Dict[str, Any]: 생성 결과 정보 (pod_name 포함)
@@ -81,43 +126,7 @@ async def create_pod(user_id: str) -> Dict[str, Any]:
             }
         
         # 환경 변수 목록 구성
-        env_vars_list = []
-        
-        # 기본 환경 변수 추가
-        env_vars_list.append({"name":"GMS_API_KEY","value":settings.GMS_API_KEY})
-        # env_vars_list.append({"name":"GMS_API_BASE","value":settings.GMS_API_BASE})
-        env_vars_list.append({"name":"OPENAI_API_KEY","value":settings.OPENAI_API_KEY})
-        
-        # 사용자가 선택한 MCP 서비스 목록 가져오기
-        selected_mcps = await get_user_selected_mcps(user_id)
-        if selected_mcps:
-            # 선택한 MCP 타입들을 콤마로 구분된 문자열로 저장
-            mcp_types = []
-            for mcp in selected_mcps:
-                mcp_type = mcp.get("mcp_type")
-                if mcp_type and mcp_type not in mcp_types:
-                    mcp_types.append(mcp_type)
-            
-            # MCP_SERVICES 환경 변수로 추가
-            if mcp_types:
-                mcp_services_value = ",".join(mcp_types)
-                env_vars_list.append({"name": "MCP_SERVICES", "value": mcp_services_value})
-                logger.info(f"사용자 {user_id}의 MCP 서비스: {mcp_services_value}")
-        else:
-            # MCP가 없는 경우에도 빈 값을 설정하거나 기본값 설정
-            env_vars_list.append({"name": "MCP_SERVICES", "value": " "})
-            logger.info(f"사용자 {user_id}에게 선택된 MCP가 없습니다. 빈 MCP_SERVICES로 진행합니다.")
-        
-        # 사용자가 설정한 환경 변수 조회 및 추가
-        user_env_settings = await get_env_vars(user_id)
-        if user_env_settings:
-            for mcp_id, mcp_env_vars in user_env_settings.items():
-                for key, value in mcp_env_vars.items():
-                    # 키에 공백 제거 및 대문자로 변환 (Kubernetes 환경변수 네이밍 규칙)
-                    env_key = key.strip().upper().replace(' ', '_')
-                    # 중복 방지
-                    if not any(env["name"] == env_key for env in env_vars_list):
-                        env_vars_list.append({"name": env_key, "value": value})
+        env_vars_list = await build_agent_env(user_id)
         
         # Pod 생성 요청 데이터 구성
         deploy_data = {
@@ -138,7 +147,7 @@ async def create_pod(user_id: str) -> Dict[str, Any]:
         ]
         
         # 명령어 실행
-        result = await run_command(cmd, timeout=60)
+        result = await run_command(cmd, timeout=timeout)
         
         # 결과 처리
         if result["returncode"] != 0:
@@ -42,6 +42,20 @@ async_select_mcps_collection = async_db["select_mcps"]
 conversations_collection = db["conversations"]
 async_conversations_collection = async_db["conversations"]
 
+# 대화 메시지 버킷 컬렉션 (세션별 고정 크기 메시지 묶음)
+conversation_buckets_collection = db["conversation_buckets"]
+async_conversation_buckets_collection = async_db["conversation_buckets"]
+
+# 대화 임베딩 인덱스 컬렉션 (세션별 메시지 벡터, 버킷 단위)
+conversation_embeddings_collection = db["conversation_embeddings"]
+async_conversation_embeddings_collection = async_db["conversation_embeddings"]
+
+# Pod 프로비저닝 작업 컬렉션 (모든 backend 워커가 상태를 조회할 수 있도록 공유)
+pod_jobs_collection = db["pod_jobs"]
+async_pod_jobs_collection = async_db["pod_jobs"]
+agent_activity_collection = db["agent_activity"]
+async_agent_activity_collection = async_db["agent_activity"]
+
 # 데이터베이스 연결을 반환하는 함수
 def get_database():
     """MongoDB 비동기 데이터베이스 연결을 반환합니다."""
@@ -1,6 +1,7 @@
 import subprocess, json, logging
 from typing import Dict, Any
 from crud.nosql import get_user_by_id, update_pod_name
+from crud.agent_activity import agent_activity_store
 from core.config import settings
 
 # 로깅 설정
@@ -46,6 +47,14 @@ async def delete_pod(user_id: str) -> Dict[str, Any]:
         # 명령어 실행
         result = subprocess.run(cmd, capture_output=True, text=True)
         
+        # 웜 풀에서 할당된 Pod는 Deployment 소유가 아니므로 라벨로 함께 삭제
+        if result.returncode == 0:
+            result = subprocess.run([
+                "kubectl", "delete", "pod", "-l", f"app=agent-{user_id},agentPool=claimed",
+                "-n", "agent-env",
+                "--ignore-not-found"
+            ], capture_output=True, text=True)
+        
         # 결과 처리
         if result.returncode != 0:
             logger.error(f"Pod 삭제 중 오류 발생 - 사용자: {user_id}, Pod: {pod_name}, 오류: {result.stderr}")
@@ -60,6 +69,7 @@ async def delete_pod(user_id: str) -> Dict[str, Any]:
         
         # DB에서 pod_name을 None으로 업데이트
         update_success = await update_pod_name(user_id, None)
+        await agent_activity_store.delete(user_id)
         
         if update_success:
             logger.info(f"Pod 삭제 및 DB 업데이트 성공 - 사용자: {user_id}, Pod: {pod_name}")
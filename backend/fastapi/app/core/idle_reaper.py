@@ -0,0 +1,77 @@
+import asyncio, logging
+from typing import Any, Dict, Optional
+import httpx
+from core.agent_client import agent_client
+from core.config import settings
+from crud.agent_activity import agent_activity_store
+
+# 로깅 설정
+logger = logging.getLogger(__name__)
+
+class IdleAgentReaper:
+    """
+    마지막 채팅 후 AGENT_IDLE_TTL_SECONDS가 지난 사용자의 agent Pod를 replica 0으로 줄입니다.
+
+    Pod를 삭제하지 않고 Deployment를 남겨 두므로, 다음 채팅에서 pod_provisioner가
+    같은 설정으로 다시 띄웁니다 (웜 풀이 있으면 대기 Pod를 할당).
+    """
+
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+        self.reaped = 0
+        self.failures = 0
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(settings.AGENT_IDLE_CHECK_INTERVAL)
+            try:
+                await self.reap_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"유휴 agent 정리 중 오류: {str(e)}")
+
+    async def reap_once(self) -> int:
+        """유휴 사용자를 찾아 agent를 중지하고 처리한 수를 반환합니다."""
+        idle_users = await agent_activity_store.claim_idle()
+        if not idle_users:
+            return 0
+
+        async with httpx.AsyncClient(timeout=10) as client:
+            for doc in idle_users:
+                user_id = doc["user_id"]
+                try:
+                    response = await client.post(f"{settings.DEPLOY_SERVER_URL}/scale-down", json={"user_id": user_id})
+                    response.raise_for_status()
+                    agent_client.mark_not_ready(user_id)
+                    self.reaped += 1
+                    logger.info(f"유휴 agent 중지 - 사용자: {user_id}, 마지막 채팅: {doc.get('last_chat_at')}")
+                except httpx.HTTPError as e:
+                    self.failures += 1
+                    await agent_activity_store.revert_sleeping(user_id)
+                    logger.warning(f"유휴 agent 중지 실패 - 사용자: {user_id}, 오류: {str(e)}")
+        return len(idle_users)
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "enabled": settings.AGENT_IDLE_REAPER_ENABLED,
+            "idle_ttl_seconds": settings.AGENT_IDLE_TTL_SECONDS,
+            "reaped": self.reaped,
+            "failures": self.failures
+        }
+
+# 전역 인스턴스
+idle_reaper = IdleAgentReaper()
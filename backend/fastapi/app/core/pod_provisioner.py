@@ -0,0 +1,113 @@
+import asyncio, logging, time
+from typing import Any, Dict, Optional
+from core.agent_client import agent_client
+from core.config import settings
+from core.create_pod import create_pod
+from crud.pod_jobs import (
+    pod_job_store, PHASE_DEPLOYING, PHASE_STARTING_MCP, PHASE_READY, PHASE_FAILED, FINAL_PHASES
+)
+from crud.agent_activity import agent_activity_store
+
+# 로깅 설정
+logger = logging.getLogger(__name__)
+
+class PodProvisioner:
+    """
+    Pod 생성을 로그인 요청에서 분리해 백그라운드 작업으로 실행합니다.
+
+    submit()은 작업 문서(티켓)를 바로 반환하고, 실제 배포는 워커 내 동시 실행 수 제한 아래에서
+    queued → deploying → starting_mcp → ready/failed 순서로 진행하며 단계를 MongoDB에 기록합니다.
+    """
+
+    def __init__(self):
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    async def submit(self, user_id: str) -> Dict[str, Any]:
+        """프로비저닝 작업을 등록하고 작업 문서를 반환합니다. 진행 중인 작업이 있으면 그 작업을 반환합니다."""
+        job, created = await pod_job_store.create_or_get_active(user_id)
+        if created:
+            task = asyncio.create_task(self._run(job["job_id"], user_id))
+            self._tasks[job["job_id"]] = task
+            task.add_done_callback(lambda _: self._tasks.pop(job["job_id"], None))
+            logger.info(f"Pod 프로비저닝 작업 등록 - 사용자: {user_id}, 작업: {job['job_id']}")
+        return job
+
+    async def wake(self, user_id: str) -> Dict[str, Any]:
+        """유휴 정리로 중지된 agent를 다시 띄우는 작업을 등록합니다 (설정이 같으면 기존 Deployment를 재사용)."""
+        await agent_activity_store.mark_waking(user_id)
+        return await self.submit(user_id)
+
+    async def wait_for_job(self, user_id: str, job_id: str, timeout: float) -> Optional[Dict[str, Any]]:
+        """작업이 ready/failed가 되거나 timeout이 지날 때까지 기다린 뒤 마지막 작업 문서를 반환합니다."""
+        deadline = time.monotonic() + timeout
+        while True:
+            job = await pod_job_store.get(user_id, job_id)
+            if not job or job["phase"] in FINAL_PHASES or time.monotonic() >= deadline:
+                return job
+            await asyncio.sleep(0.5)
+
+    async def _run(self, job_id: str, user_id: str):
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(settings.POD_PROVISION_CONCURRENCY)
+
+        heartbeat = asyncio.create_task(self._heartbeat(job_id))
+        started = time.perf_counter()
+        try:
+            async with self._slots:
+                await pod_job_store.update_phase(job_id, PHASE_DEPLOYING)
+                result = await create_pod(user_id, timeout=settings.POD_DEPLOY_TIMEOUT)
+                if not result.get("success") or not result.get("pod_name"):
+                    await pod_job_store.update_phase(job_id, PHASE_FAILED, result.get("message"))
+                    await agent_activity_store.mark_wake_failed(user_id)
+                    logger.warning(f"Pod 프로비저닝 실패 - 사용자: {user_id}, 오류: {result.get('message')}")
+                    return
+
+                await pod_job_store.update_phase(job_id, PHASE_STARTING_MCP, pod_name=result["pod_name"])
+                if not await self._wait_agent_ready(user_id):
+                    await pod_job_store.update_phase(job_id, PHASE_FAILED, "MCP 서버 시작 대기 시간이 초과되었습니다.")
+                    await agent_activity_store.mark_wake_failed(user_id)
+                    logger.warning(f"agent 준비 대기 시간 초과 - 사용자: {user_id}")
+                    return
+
+                await pod_job_store.update_phase(job_id, PHASE_READY)
+                await agent_activity_store.mark_running(user_id)
+                logger.info(f"Pod 프로비저닝 완료 - 사용자: {user_id}, 소요: {time.perf_counter() - started:.1f}초")
+        except asyncio.CancelledError:
+            await pod_job_store.update_phase(job_id, PHASE_FAILED, "서버 종료로 작업이 중단되었습니다. 다시 시도해주세요.")
+            await agent_activity_store.mark_wake_failed(user_id)
+            raise
+        except Exception as e:
+            logger.error(f"Pod 프로비저닝 중 예외 발생 - 사용자: {user_id}, 오류: {str(e)}")
+            await pod_job_store.update_phase(job_id, PHASE_FAILED, f"Pod 생성 중 예외 발생: {str(e)}")
+            await agent_activity_store.mark_wake_failed(user_id)
+        finally:
+            heartbeat.cancel()
+
+    async def _heartbeat(self, job_id: str):
+        """작업이 실행 중인 동안 주기적으로 updated_at을 갱신해 다른 워커가 중단된 작업으로 보지 않게 합니다."""
+        while True:
+            await asyncio.sleep(settings.POD_JOB_HEARTBEAT_SECONDS)
+            try:
+                await pod_job_store.touch(job_id)
+            except Exception as e:
+                logger.warning(f"프로비저닝 작업 heartbeat 실패 - 작업: {job_id}, 오류: {str(e)}")
+
+    async def _wait_agent_ready(self, user_id: str) -> bool:
+        """
+        agent가 요청을 받을 수 있을 때까지 /ready를 확인합니다.
+        /health는 프로세스가 뜨자마자 응답하므로, MCP 서버 연결과 도구 목록 조회가 끝났는지는 /ready로 판단합니다.
+        """
+        # 새 Pod로 교체됐을 수 있으므로 이전에 확인한 준비 상태는 버림
+        agent_client.mark_not_ready(user_id)
+        return await agent_client.wait_ready(user_id, settings.POD_READY_TIMEOUT)
+
+    async def stop(self):
+        """실행 중인 작업을 취소합니다. 취소된 작업은 failed로 기록되어 클라이언트가 다시 요청할 수 있습니다."""
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+# 전역 인스턴스
+pod_provisioner = PodProvisioner()
@@ -1,9 +1,11 @@
+import asyncio, hmac, logging, time
+from concurrent.futures import ThreadPoolExecutor
 from passlib.context import CryptContext
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Optional, Dict, Any
 from jose import jwt, JWTError
 from fastapi.security import OAuth2PasswordBearer
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from core.config import settings
 
 # bcrypt 버전 오류 해결
@@ -18,6 +20,9 @@ SECRET_KEY = settings.SECRET_KEY
 ALGORITHM = settings.ALGORITHM
 ACCESS_TOKEN_EXPIRE_MINUTES = settings.ACCESS_TOKEN_EXPIRE_MINUTES
 
+# 로깅 설정
+logger = logging.getLogger(__name__)
+
 # 패스워드 해싱 설정
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/token")
@@ -30,6 +35,88 @@ def verify_password(plain_password, hashed_password):
     """비밀번호가 해시와 일치하는지 검증합니다."""
     return pwd_context.verify(plain_password, hashed_password)
 
+class PasswordHashOverloaded(Exception):
+    """비밀번호 해싱 대기열이 가득 차 요청을 받을 수 없을 때 발생합니다."""
+
+class PasswordHasher:
+    """
+    bcrypt 해싱/검증 전용 스레드 풀.
+
+    bcrypt는 수십 ms 동안 CPU를 사용하므로 이벤트 루프 대신 크기가 제한된 스레드 풀에서 실행합니다
+    (bcrypt는 해싱 중 GIL을 해제합니다). 실행 중 + 대기 중인 작업 수를 max_pending으로 제한하고,
+    admission_timeout 안에 자리가 나지 않으면 PasswordHashOverloaded를 발생시켜
+    로그인 폭주가 스레드 풀 대기열을 끝없이 늘리지 않도록 합니다.
+    """
+
+    def __init__(self, workers: int, max_pending: int, admission_timeout: float):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.admission_timeout = admission_timeout
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hash")
+        self._slots: Optional[asyncio.Semaphore] = None
+
+        # 메트릭
+        self._in_flight = 0
+        self._completed = 0
+        self._rejected = 0
+        self._total_wait_ms = 0.0
+        self._max_wait_ms = 0.0
+
+    async def _run(self, func, *args):
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_pending)
+
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(self._slots.acquire(), timeout=self.admission_timeout)
+        except asyncio.TimeoutError:
+            self._rejected += 1
+            logger.warning(f"비밀번호 해싱 대기열 초과로 요청 거절 (대기 중: {self._in_flight})")
+            raise PasswordHashOverloaded("로그인 요청이 많아 잠시 후 다시 시도해주세요.")
+
+        self._in_flight += 1
+        try:
+            loop = asyncio.get_running_loop()
+            queued = time.perf_counter()
+            result = await loop.run_in_executor(self._executor, func, *args)
+            wait_ms = (queued - started) * 1000
+            self._total_wait_ms += wait_ms
+            self._max_wait_ms = max(self._max_wait_ms, wait_ms)
+            self._completed += 1
+            return result
+        finally:
+            self._in_flight -= 1
+            self._slots.release()
+
+    async def hash(self, password: str) -> str:
+        """비밀번호를 스레드 풀에서 해싱합니다."""
+        return await self._run(get_password_hash, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        """비밀번호를 스레드 풀에서 검증합니다."""
+        return await self._run(verify_password, plain_password, hashed_password)
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "max_pending": self.max_pending,
+            "in_flight": self._in_flight,
+            "completed": self._completed,
+            "rejected": self._rejected,
+            "avg_admission_wait_ms": round(self._total_wait_ms / self._completed, 2) if self._completed else 0.0,
+            "max_admission_wait_ms": round(self._max_wait_ms, 2)
+        }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+# 전역 인스턴스
+password_hasher = PasswordHasher(
+    workers=settings.PASSWORD_HASH_WORKERS,
+    max_pending=settings.PASSWORD_HASH_MAX_PENDING,
+    admission_timeout=settings.PASSWORD_HASH_ADMISSION_TIMEOUT
+)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     """JWT 액세스 토큰을 생성합니다."""
     to_encode = data.copy()
@@ -42,3 +129,16 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode.update({"exp": expire})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
+
+
+def require_metrics_token(request: Request):
+    """
+    내부 메트릭 엔드포인트용 의존성. Authorization: Bearer <METRICS_TOKEN>이 일치해야 통과합니다.
+    METRICS_TOKEN이 비어 있으면 엔드포인트가 없는 것처럼 404를 반환합니다.
+    """
+    if not settings.METRICS_TOKEN:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Not Found")
+    authorization = request.headers.get("authorization", "")
+    token = authorization[7:] if authorization.lower().startswith("bearer ") else ""
+    if not hmac.compare_digest(token.encode(), settings.METRICS_TOKEN.encode()):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="메트릭 토큰이 올바르지 않습니다.")
@@ -0,0 +1,136 @@
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+import time
+from pymongo import ASCENDING, ReturnDocument
+from core.config import settings
+from core.database import async_agent_activity_collection
+
+# agent Pod 상태
+STATE_RUNNING = "running"
+STATE_SLEEPING = "sleeping"     # 유휴 정리로 replica 0
+STATE_WAKING = "waking"         # 채팅 요청으로 다시 띄우는 중
+
+class AgentActivityStore:
+    """
+    사용자별 마지막 채팅 시각과 agent Pod 상태 저장소.
+
+    users 문서와 분리해 두어 채팅마다 기록해도 인증 캐시(change stream)가 무효화되지 않으며,
+    같은 워커에서는 AGENT_ACTIVITY_TOUCH_INTERVAL 이내의 중복 기록과 실행 중 상태의 재조회를 생략합니다.
+    """
+
+    def __init__(self):
+        self.activity_collection = async_agent_activity_collection
+        # user_id -> 마지막 기록 시각 (monotonic)
+        self._last_touch: Dict[str, float] = {}
+        # user_id -> (agent 상태, 확인 시각 monotonic): 이 워커가 마지막으로 조회하거나 바꾼 상태
+        self._states: Dict[str, Tuple[Optional[str], float]] = {}
+
+    async def create_indexes(self):
+        await self.activity_collection.create_index("user_id", unique=True)
+        await self.activity_collection.create_index([("state", ASCENDING), ("last_chat_at", ASCENDING)])
+
+    async def touch(self, user_id: str):
+        """채팅 활동을 기록합니다."""
+        now = time.monotonic()
+        last = self._last_touch.get(user_id)
+        if last is not None and now - last < settings.AGENT_ACTIVITY_TOUCH_INTERVAL:
+            return
+        if len(self._last_touch) > 10000:
+            self._last_touch.clear()
+        self._last_touch[user_id] = now
+        await self.activity_collection.update_one(
+            {"user_id": user_id},
+            {"$set": {"last_chat_at": datetime.now()}, "$setOnInsert": {"state": STATE_RUNNING}},
+            upsert=True
+        )
+
+    async def get_state(self, user_id: str) -> Optional[str]:
+        doc = await self.activity_collection.find_one({"user_id": user_id}, {"_id": 0, "state": 1})
+        return doc.get("state") if doc else None
+
+    async def is_asleep(self, user_id: str) -> bool:
+        """
+        agent가 유휴 정리로 중지됐거나 재기동 중인지 반환합니다.
+
+        AGENT_ACTIVITY_TOUCH_INTERVAL 이내에 확인한 실행 중 상태는 다시 조회하지 않습니다. 그사이 다른 워커가
+        agent를 정리했다면 agent 요청이 연결 실패(ConnectError/503)로 끝나며 forget_state()가 호출되어
+        다음 요청에서 다시 조회합니다. 중지·재기동 중 상태는 다른 워커가 이미 깨웠을 수 있으므로 매번 조회합니다.
+        """
+        cached = self._states.get(user_id)
+        if cached is not None and cached[0] == STATE_RUNNING \
+                and time.monotonic() - cached[1] < settings.AGENT_ACTIVITY_TOUCH_INTERVAL:
+            return False
+        state = await self.get_state(user_id)
+        self._remember_state(user_id, state)
+        return state in (STATE_SLEEPING, STATE_WAKING)
+
+    def _remember_state(self, user_id: str, state: Optional[str]):
+        if len(self._states) > 10000:
+            self._states.clear()
+        self._states[user_id] = (state, time.monotonic())
+
+    def forget_state(self, user_id: str):
+        """agent 연결 실패 등으로 상태가 바뀌었을 수 있으면 다음 is_asleep()에서 다시 조회하도록 지웁니다."""
+        self._states.pop(user_id, None)
+
+    async def mark_running(self, user_id: str):
+        """Pod가 준비되면 호출합니다. 막 뜬 Pod가 바로 정리되지 않도록 활동 시각도 갱신합니다."""
+        self._last_touch[user_id] = time.monotonic()
+        self._remember_state(user_id, STATE_RUNNING)
+        await self.activity_collection.update_one(
+            {"user_id": user_id},
+            {"$set": {"state": STATE_RUNNING, "last_chat_at": datetime.now()}},
+            upsert=True
+        )
+
+    async def mark_waking(self, user_id: str):
+        self._remember_state(user_id, STATE_WAKING)
+        await self.activity_collection.update_one(
+            {"user_id": user_id, "state": STATE_SLEEPING},
+            {"$set": {"state": STATE_WAKING, "woke_at": datetime.now()}}
+        )
+
+    async def mark_wake_failed(self, user_id: str):
+        """재기동에 실패하면 다음 채팅에서 다시 시도하도록 sleeping으로 되돌립니다."""
+        self._remember_state(user_id, STATE_SLEEPING)
+        await self.activity_collection.update_one(
+            {"user_id": user_id, "state": STATE_WAKING},
+            {"$set": {"state": STATE_SLEEPING}}
+        )
+
+    async def claim_idle(self, limit: int = 50) -> List[Dict[str, Any]]:
+        """
+        유휴 시간이 지난 running 사용자를 sleeping으로 바꾸고 반환합니다.
+        조건부 갱신으로 상태를 바꾸므로 여러 워커가 동시에 정리해도 사용자당 한 번만 처리됩니다.
+        """
+        cutoff = datetime.now() - timedelta(seconds=settings.AGENT_IDLE_TTL_SECONDS)
+        claimed = []
+        for _ in range(limit):
+            doc = await self.activity_collection.find_one_and_update(
+                {"state": STATE_RUNNING, "last_chat_at": {"$lt": cutoff}},
+                {"$set": {"state": STATE_SLEEPING, "slept_at": datetime.now()}},
+                projection={"_id": 0},
+                return_document=ReturnDocument.AFTER
+            )
+            if not doc:
+                break
+            self._remember_state(doc["user_id"], STATE_SLEEPING)
+            claimed.append(doc)
+        return claimed
+
+    async def revert_sleeping(self, user_id: str):
+        """scale-down 요청이 실패한 경우 running으로 되돌립니다."""
+        self.forget_state(user_id)
+        await self.activity_collection.update_one(
+            {"user_id": user_id, "state": STATE_SLEEPING},
+            {"$set": {"state": STATE_RUNNING}}
+        )
+
+    async def delete(self, user_id: str):
+        """Pod가 삭제된 경우(로그아웃) 활동 기록을 제거합니다."""
+        self._last_touch.pop(user_id, None)
+        self.forget_state(user_id)
+        await self.activity_collection.delete_one({"user_id": user_id})
+
+# 전역 인스턴스
+agent_activity_store = AgentActivityStore()
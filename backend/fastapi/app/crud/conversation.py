@@ -1,12 +1,76 @@
+import base64
 from datetime import datetime
 from typing import List, Dict, Any, Optional
 from bson import ObjectId
-from core.database import async_conversations_collection
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from core.cache import TTLCache
+from core.config import settings
+from core.context_builder import build_context, count_tokens, truncate_to_tokens
+from core.database import async_conversations_collection, async_db, codec_options
+from crud.message_buckets import message_bucket_store, BUCKETED_STORAGE, BUCKET_SIZE
+from crud.message_write_queue import MessageWriteQueue
+from crud.embedding_index import session_embedding_index
 import uuid
 
+# 기본 세션 ID
+DEFAULT_SESSION_ID = "default"
+
+# 세션 목록에 표시할 마지막 메시지 미리보기 길이
+PREVIEW_LENGTH = 100
+
+# 메시지 저장 시 다른 쓰기와 순번이 겹쳤을 때 세션을 다시 조회해 시도하는 최대 횟수
+APPEND_MAX_ATTEMPTS = 5
+
+# 메시지 저장 후 세션 요약을 만들 때 조회하는 필드
+SUMMARY_PROJECTION = {"_id": 0, "session_name": 1, "updated_at": 1, "total_messages": "$message_count"}
+
+def make_preview(text: Optional[str]) -> Optional[str]:
+    """세션 목록용 마지막 메시지 미리보기를 만듭니다."""
+    if not text:
+        return None
+    return text[:PREVIEW_LENGTH]
+
+def encode_history_cursor(seq: int) -> str:
+    """메시지 순번을 클라이언트에 전달할 불투명 커서 문자열로 변환합니다."""
+    return base64.urlsafe_b64encode(f"m:{seq}".encode()).decode().rstrip("=")
+
+def decode_history_cursor(cursor: str) -> int:
+    """커서 문자열을 메시지 순번으로 되돌립니다. 형식이 잘못되면 ValueError를 발생시킵니다."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        prefix, seq = base64.urlsafe_b64decode(padded.encode()).decode().split(":", 1)
+        if prefix != "m" or int(seq) < 0:
+            raise ValueError
+        return int(seq)
+    except Exception:
+        raise ValueError("잘못된 히스토리 커서입니다.")
+
 class ConversationManager:
     def __init__(self):
         self.conversations_collection = async_conversations_collection
+        self.users_collection = async_db.get_collection("users_nosql", codec_options=codec_options)
+        self.bucket_store = message_bucket_store
+        self.embedding_index = session_embedding_index
+        # user_id -> 기본 세션 ID (존재가 확인된 세션만 저장)
+        self.default_session_cache = TTLCache(
+            maxsize=settings.DEFAULT_SESSION_CACHE_SIZE,
+            ttl=settings.DEFAULT_SESSION_CACHE_TTL
+        )
+        # (user_id, session_id) -> 이 프로세스가 마지막으로 저장한 다음 메시지 순번 (버킷 세션만)
+        self.next_seq_cache = TTLCache(
+            maxsize=settings.SESSION_SEQ_CACHE_SIZE,
+            ttl=settings.SESSION_SEQ_CACHE_TTL
+        )
+        # 메시지 저장 write-behind 큐 (main.py 시작/종료 이벤트에서 start/stop)
+        self.write_queue = MessageWriteQueue(
+            self.append_messages,
+            max_batch=settings.MESSAGE_WRITE_BATCH_SIZE,
+            flush_interval=settings.MESSAGE_WRITE_FLUSH_INTERVAL,
+            max_retries=settings.MESSAGE_WRITE_MAX_RETRIES,
+            retry_backoff=settings.MESSAGE_WRITE_RETRY_BACKOFF,
+            drain_timeout=settings.MESSAGE_WRITE_DRAIN_TIMEOUT
+        )
     
     async def create_session(self, user_id: str, session_name: str = "새 대화") -> str:
         """새로운 대화 세션을 생성합니다."""
@@ -19,7 +83,10 @@ class ConversationManager:
             "user_id": user_id,
             "session_id": session_id,
             "session_name": session_name,
-            "messages": [],
+            "storage": BUCKETED_STORAGE,
+            "message_count": 0,
+            "last_message_preview": None,
+            "last_activity": None,
             "created_at": datetime.now(),
             "updated_at": datetime.now()
         }
@@ -38,20 +105,24 @@ class ConversationManager:
         logger = logging.getLogger(__name__)
         
         try:
+            # messages 배열은 가져오지 않고 비정규화된 카운터 필드만 조회
             cursor = self.conversations_collection.find(
                 {"user_id": user_id},
-                {"session_id": 1, "session_name": 1, "created_at": 1, "updated_at": 1, "messages": 1}
+                {
+                    "_id": 0, "session_id": 1, "session_name": 1,
+                    "message_count": 1, "last_message_preview": 1, "last_activity": 1
+                }
             ).sort("updated_at", -1)
             
             sessions = []
             async for doc in cursor:
+                last_activity = doc.get("last_activity")
                 sessions.append({
                     "session_id": doc["session_id"],
                     "session_name": doc["session_name"],
-                    "message_count": len(doc.get("messages", [])),
-                    # "created_at": doc["created_at"].isoformat(),
-                    # "updated_at": doc["updated_at"].isoformat(),
-                    # "last_message": doc["messages"][-1] if doc.get("messages") else None
+                    "message_count": doc.get("message_count", 0) + len(self.write_queue.snapshot(user_id, doc["session_id"])),
+                    "last_message_preview": doc.get("last_message_preview"),
+                    "last_activity": last_activity.isoformat() if isinstance(last_activity, datetime) else last_activity
                 })
             
             logger.info(f"세션 목록 조회: user_id={user_id}, 세션 수={len(sessions)}")
@@ -87,11 +158,17 @@ class ConversationManager:
         logger = logging.getLogger(__name__)
         
         try:
+            await self.write_queue.discard(user_id, session_id)
+            self.next_seq_cache.pop((user_id, session_id))
             result = await self.conversations_collection.delete_one(
                 {"user_id": user_id, "session_id": session_id}
             )
             
             if result.deleted_count > 0:
+                await self.bucket_store.delete_session(user_id, session_id)
+                await self.embedding_index.delete_session(user_id, session_id)
+                if session_id == DEFAULT_SESSION_ID:
+                    await self.invalidate_default_session(user_id, clear_user_doc=True)
                 logger.info(f"세션 삭제: user_id={user_id}, session_id={session_id}")
                 return True
             else:
@@ -111,48 +188,7 @@ class ConversationManager:
             session_id = await self._get_or_create_default_session(user_id)
         
         logger.info(f"add_message 호출: user_id={user_id}, session_id={session_id}")
-        
-        # 새 메시지 객체
-        new_message = {
-            "user_message": user_message,
-            "assistant_response": assistant_response,
-            "timestamp": datetime.now()
-        }
-        
-        try:
-            # 세션 문서가 있는지 확인
-            existing_doc = await self.conversations_collection.find_one(
-                {"user_id": user_id, "session_id": session_id}
-            )
-            
-            if existing_doc:
-                # 기존 세션에 메시지 추가
-                result = await self.conversations_collection.update_one(
-                    {"user_id": user_id, "session_id": session_id},
-                    {
-                        "$push": {"messages": new_message},
-                        "$set": {"updated_at": datetime.now()}
-                    }
-                )
-                logger.info(f"세션에 메시지 추가: user_id={user_id}, session_id={session_id}")
-                return str(existing_doc["_id"])
-            else:
-                # 세션이 없으면 새로 생성
-                new_doc = {
-                    "user_id": user_id,
-                    "session_id": session_id,
-                    "session_name": "기본 대화",
-                    "messages": [new_message],
-                    "created_at": datetime.now(),
-                    "updated_at": datetime.now()
-                }
-                result = await self.conversations_collection.insert_one(new_doc)
-                logger.info(f"새 세션 생성 및 메시지 추가: user_id={user_id}, session_id={session_id}")
-                return str(result.inserted_id)
-                
-        except Exception as e:
-            logger.error(f"메시지 저장 실패: {str(e)}")
-            raise
+        return await self.append_message(user_id, session_id, user_message, assistant_response)
     
     async def get_conversation_history(self, user_id: str, limit: int = 20, session_id: str = None) -> List[Dict[str, Any]]:
         """특정 세션의 대화 히스토리를 가져옵니다."""
@@ -164,28 +200,38 @@ class ConversationManager:
             session_id = await self._get_or_create_default_session(user_id)
         
         try:
-            # 세션 문서 조회
+            # 조회 전에 대기 메시지를 먼저 확보해야 조회 도중 저장된 메시지를 놓치지 않음
+            pending = self.write_queue.snapshot(user_id, session_id)
+            
+            # 세션 메타데이터 조회 (레거시 문서는 최근 limit개 메시지만 함께 가져옴)
+            projection = {"_id": 0, "storage": 1, "message_count": 1}
+            projection["messages"] = {"$slice": -limit} if limit else 1
             conversation_doc = await self.conversations_collection.find_one(
-                {"user_id": user_id, "session_id": session_id}
+                {"user_id": user_id, "session_id": session_id},
+                projection
             )
             
-            if not conversation_doc or "messages" not in conversation_doc:
+            if not conversation_doc and not pending:
                 logger.info(f"세션 대화 내역 없음: user_id={user_id}, session_id={session_id}")
                 return []
             
-            # messages 배열에서 최근 limit개 메시지 가져오기
-            messages = conversation_doc["messages"]
+            if not conversation_doc:
+                messages = []
+            elif conversation_doc.get("storage") == BUCKETED_STORAGE:
+                # 버킷 세션은 최신 버킷부터 거꾸로 탐색
+                messages = await self.bucket_store.get_recent(
+                    user_id, session_id, limit or conversation_doc.get("message_count", 0)
+                )
+            else:
+                messages = conversation_doc.get("messages", [])
+            
+            # 아직 저장되지 않은 대기 메시지를 뒤에 붙임
+            messages = messages + self._unsaved(pending, messages)
             if limit:
                 messages = messages[-limit:]
             
             # 응답 형식으로 변환
-            formatted_messages = []
-            for msg in messages:
-                formatted_messages.append({
-                    "user": msg["user_message"],
-                    "assistant": msg["assistant_response"],
-                    "timestamp": msg["timestamp"].isoformat() if isinstance(msg["timestamp"], datetime) else msg["timestamp"]
-                })
+            formatted_messages = [self._format_message(msg) for msg in messages]
             
             logger.info(f"세션 대화 히스토리 조회: user_id={user_id}, session_id={session_id}, 메시지 수={len(formatted_messages)}")
             return formatted_messages
@@ -194,18 +240,510 @@ class ConversationManager:
             logger.error(f"세션 대화 히스토리 조회 실패: {str(e)}")
             return []
     
+    async def get_history_page(self, user_id: str, session_id: str, limit: int = 50,
+                               before_seq: Optional[int] = None, after_seq: Optional[int] = None) -> Dict[str, Any]:
+        """
+        메시지 순번 기준의 키셋 페이지네이션으로 히스토리 한 페이지를 가져옵니다.
+
+        before_seq가 주어지면 그 이전 메시지, after_seq가 주어지면 그 이후 메시지를,
+        둘 다 없으면 가장 최근 메시지를 limit개까지 반환합니다.
+        """
+        import logging
+        logger = logging.getLogger(__name__)
+
+        empty_page = {"messages": [], "total_messages": 0, "has_older": False, "has_newer": False}
+
+        # 레거시 세션은 필요한 구간만 서버에서 잘라 오고, 버킷 세션은 메타데이터만 조회
+        if before_seq is not None:
+            start = max(0, before_seq - limit)
+            legacy_slice = [start, max(before_seq - start, 1)]
+        elif after_seq is not None:
+            legacy_slice = [after_seq + 1, limit]
+        else:
+            legacy_slice = [-limit]
+
+        pipeline = [
+            {"$match": {"user_id": user_id, "session_id": session_id}},
+            {"$limit": 1},
+            {"$project": {
+                "_id": 0,
+                "storage": 1,
+                "total_messages": {"$ifNull": ["$message_count", {"$size": {"$ifNull": ["$messages", []]}}]},
+                "messages": {"$slice": [{"$ifNull": ["$messages", []]}, *legacy_slice]}
+            }}
+        ]
+
+        try:
+            # 대기 메시지는 항상 가장 최근 메시지이므로 이전 페이지 조회에는 필요 없음
+            pending = self.write_queue.snapshot(user_id, session_id) if before_seq is None else []
+            docs = await self.conversations_collection.aggregate(pipeline).to_list(length=1)
+            if not docs and not pending:
+                return empty_page
+            doc = docs[0] if docs else {"storage": BUCKETED_STORAGE, "total_messages": 0}
+            total = doc.get("total_messages", 0)
+
+            if doc.get("storage") == BUCKETED_STORAGE:
+                if after_seq is not None:
+                    messages = await self.bucket_store.get_after(user_id, session_id, after_seq, limit)
+                else:
+                    messages = await self.bucket_store.get_recent(user_id, session_id, limit, before_seq=before_seq)
+            else:
+                messages = doc.get("messages", [])
+                if before_seq is not None and before_seq == 0:
+                    messages = []
+                # 레거시 메시지는 배열 위치를 순번으로 사용
+                first_seq = legacy_slice[0] if legacy_slice[0] >= 0 else max(total - len(messages), 0)
+                messages = [{**msg, "seq": first_seq + i} for i, msg in enumerate(messages)]
+
+            # 아직 저장되지 않은 대기 메시지에 예정 순번을 매겨 합침
+            unsaved = self._unsaved(pending, messages)
+            if unsaved:
+                unsaved = [{**msg, "seq": total + i} for i, msg in enumerate(unsaved)]
+                total += len(unsaved)
+                if after_seq is not None:
+                    messages = (messages + [m for m in unsaved if m["seq"] > after_seq])[:limit]
+                else:
+                    messages = (messages + unsaved)[-limit:]
+
+            if not messages:
+                return {**empty_page, "total_messages": total}
+
+            first, last = messages[0]["seq"], messages[-1]["seq"]
+            formatted = [self._format_message(msg) for msg in messages]
+            logger.info(f"히스토리 페이지 조회: user_id={user_id}, session_id={session_id}, 메시지 수={len(formatted)}")
+            return {
+                "messages": formatted,
+                "total_messages": total,
+                "has_older": first > 0,
+                "has_newer": last < total - 1,
+                "older_cursor": encode_history_cursor(first),
+                "newer_cursor": encode_history_cursor(last)
+            }
+        except Exception as e:
+            logger.error(f"히스토리 페이지 조회 실패: {str(e)}")
+            return empty_page
+
+    async def get_chat_context(self, user_id: str, session_id: str, limit: int = 6) -> Dict[str, Any]:
+        """
+        대화 처리에 필요한 최근 메시지와 세션 요약을 한 번의 쿼리로 가져옵니다.
+        messages 배열 전체 대신 마지막 limit개만 서버에서 잘라서 전송합니다.
+        """
+        import logging
+        logger = logging.getLogger(__name__)
+
+        # 최근 limit개가 걸칠 수 있는 최대 버킷 수
+        bucket_count = -(-limit // BUCKET_SIZE) + 1
+        pipeline = [
+            {"$match": {"user_id": user_id, "session_id": session_id}},
+            {"$limit": 1},
+            # 버킷 세션의 최신 버킷들을 같은 쿼리에서 함께 조회
+            {"$lookup": {
+                "from": self.bucket_store.buckets_collection.name,
+                "let": {"uid": "$user_id", "sid": "$session_id"},
+                "pipeline": [
+                    {"$match": {"$expr": {"$and": [
+                        {"$eq": ["$user_id", "$$uid"]},
+                        {"$eq": ["$session_id", "$$sid"]}
+                    ]}}},
+                    {"$sort": {"bucket_seq": -1}},
+                    {"$limit": bucket_count},
+                    {"$project": {"_id": 0, "messages": {"$slice": ["$messages", -limit]}}}
+                ],
+                "as": "recent_buckets"
+            }},
+            {"$project": {
+                "_id": 0,
+                "session_name": 1,
+                "updated_at": 1,
+                # 백필 전 문서는 배열 크기로 대체 (서버에서만 계산)
+                "total_messages": {"$ifNull": ["$message_count", {"$size": {"$ifNull": ["$messages", []]}}]},
+                "messages": {"$slice": [{"$ifNull": ["$messages", []]}, -limit]},
+                "recent_buckets": 1,
+                "context_summary": 1
+            }}
+        ]
+
+        pending = self.write_queue.snapshot(user_id, session_id)
+        try:
+            docs = await self.conversations_collection.aggregate(pipeline).to_list(length=1)
+        except Exception as e:
+            logger.error(f"대화 컨텍스트 조회 실패: {str(e)}")
+            docs = []
+
+        if not docs and not pending:
+            return {"history": [], "summary": self._build_summary(session_id, None), "context_summary": None}
+
+        doc = docs[0] if docs else {"total_messages": 0}
+        messages = doc.get("messages", [])
+        if doc.get("recent_buckets"):
+            bucket_messages = [msg for bucket in doc["recent_buckets"] for msg in bucket.get("messages", [])]
+            messages = sorted(bucket_messages, key=lambda m: m["seq"])[-limit:]
+
+        # 아직 저장되지 않은 대기 메시지를 반영
+        unsaved = self._unsaved(pending, messages)
+        if unsaved:
+            messages = (messages + unsaved)[-limit:]
+            doc["total_messages"] = doc.get("total_messages", 0) + len(unsaved)
+            doc["updated_at"] = unsaved[-1]["timestamp"]
+        history = [self._format_message(msg) for msg in messages]
+        return {
+            "history": history,
+            "summary": self._build_summary(session_id, doc),
+            "context_summary": doc.get("context_summary")
+        }
+
+    async def build_agent_context(self, user_id: str, session_id: str, query: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Agent 요청에 넣을 대화 컨텍스트를 토큰 예산 안에서 구성합니다.
+        창 밖으로 밀려난 오래된 턴은 세션 문서의 누적 요약(context_summary)에 반영하고,
+        관련 대화 검색이 켜져 있으면 query와 관련도가 높은 과거 턴을 함께 반환합니다.
+        """
+        import logging
+        logger = logging.getLogger(__name__)
+
+        chat_context = await self.get_chat_context(user_id, session_id, limit=settings.CHAT_CONTEXT_FETCH_LIMIT)
+        session_summary = chat_context["summary"]
+        total_messages = session_summary.get("total_messages", 0)
+
+        # 최근 창보다 앞선 턴 중 질문과 관련된 턴 (별도 토큰 예산 사용)
+        relevant_history = []
+        if query and self.embedding_index.enabled:
+            relevant_history = await self._retrieve_relevant_history(
+                user_id, session_id, query, before_seq=total_messages - len(chat_context["history"])
+            )
+        relevant_tokens = sum(count_tokens(m["user"]) + count_tokens(m["assistant"]) for m in relevant_history)
+
+        built = build_context(
+            chat_context["history"],
+            total_messages,
+            chat_context["context_summary"],
+            token_budget=settings.CHAT_CONTEXT_TOKEN_BUDGET - relevant_tokens,
+            summary_tokens=settings.CHAT_CONTEXT_SUMMARY_TOKENS,
+            message_tokens=settings.CHAT_CONTEXT_MESSAGE_TOKENS
+        )
+        # 창 밖으로 새로 밀려난 턴이 있어 요약이 바뀐 경우에만 저장
+        if built["summary_state"] is not None:
+            await self.update_context_summary(user_id, session_id, built["summary_state"])
+
+        logger.info(f"대화 컨텍스트 구성: user_id={user_id}, session_id={session_id}, "
+                    f"히스토리={len(built['history'])}개, 관련 대화={len(relevant_history)}개, "
+                    f"프롬프트 토큰={built['prompt_tokens'] + relevant_tokens}")
+        return {
+            "history": built["history"],
+            "relevant_history": relevant_history,
+            "conversation_summary": built["summary"],
+            "summary": session_summary,
+            "prompt_tokens": built["prompt_tokens"] + relevant_tokens
+        }
+
+    async def _retrieve_relevant_history(self, user_id: str, session_id: str, query: str, before_seq: int) -> List[Dict[str, Any]]:
+        """임베딩 인덱스에서 관련 턴을 찾아 RETRIEVAL 토큰 예산 안에서 반환합니다 (실패 시 빈 목록)."""
+        import logging
+        logger = logging.getLogger(__name__)
+
+        if before_seq <= 0:
+            return []
+        try:
+            hits = await self.embedding_index.search(
+                user_id, session_id, query,
+                top_k=settings.CHAT_RETRIEVAL_TOP_K,
+                before_seq=before_seq,
+                min_score=settings.CHAT_RETRIEVAL_MIN_SCORE
+            )
+            messages = await self.bucket_store.get_by_seqs(user_id, session_id, [seq for seq, _ in hits])
+        except Exception as e:
+            logger.error(f"관련 대화 검색 실패: {str(e)}")
+            return []
+
+        # 관련도 순으로 예산을 채운 뒤 시간순으로 정렬
+        by_seq = {msg["seq"]: msg for msg in messages}
+        per_message = settings.CHAT_CONTEXT_MESSAGE_TOKENS // 2
+        selected, used = [], 0
+        for seq, score in hits:
+            msg = by_seq.get(seq)
+            if not msg:
+                continue
+            formatted = self._format_message(msg)
+            formatted["user"] = truncate_to_tokens(formatted["user"], per_message)
+            formatted["assistant"] = truncate_to_tokens(formatted["assistant"], per_message)
+            cost = count_tokens(formatted["user"]) + count_tokens(formatted["assistant"])
+            if used + cost > settings.CHAT_RETRIEVAL_TOKENS:
+                continue
+            selected.append((seq, formatted))
+            used += cost
+        return [formatted for _, formatted in sorted(selected, key=lambda item: item[0])]
+
+    async def update_context_summary(self, user_id: str, session_id: str, summary_state: Dict[str, Any]):
+        """누적 요약을 저장합니다. 더 앞선 지점까지 요약한 값이 이미 있으면 덮어쓰지 않습니다."""
+        await self.conversations_collection.update_one(
+            {
+                "user_id": user_id,
+                "session_id": session_id,
+                "$or": [
+                    {"context_summary.covered_count": {"$lt": summary_state["covered_count"]}},
+                    {"context_summary": {"$exists": False}}
+                ]
+            },
+            {"$set": {"context_summary": {**summary_state, "updated_at": datetime.now()}}}
+        )
+
+    async def append_message(self, user_id: str, session_id: str, user_message: str, assistant_response: str) -> Dict[str, Any]:
+        """
+        세션에 메시지를 즉시 저장하고 갱신된 세션 요약을 반환합니다.
+        세션 문서가 없으면 새로 생성합니다.
+        """
+        return await self.append_messages(user_id, session_id, [self._new_message(user_message, assistant_response)])
+
+    async def enqueue_message(self, user_id: str, session_id: str, user_message: str, assistant_response: str,
+                              base_summary: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        메시지를 write-behind 큐에 넣고 저장 후 예상되는 세션 요약을 바로 반환합니다.
+        큐가 동작 중이 아니면(비활성화/종료 중) append_message로 즉시 저장합니다.
+        base_summary는 같은 요청에서 조회한 세션 요약(대기 메시지 포함)입니다.
+        """
+        if not self.write_queue.running:
+            return await self.append_message(user_id, session_id, user_message, assistant_response)
+
+        message = self._new_message(user_message, assistant_response)
+        self.write_queue.put(user_id, session_id, message)
+
+        summary = dict(base_summary or self._build_summary(session_id, None))
+        summary["total_messages"] = summary.get("total_messages", 0) + 1
+        summary["has_history"] = True
+        summary["last_activity"] = message["timestamp"].isoformat()
+        return summary
+
+    async def append_messages(self, user_id: str, session_id: str, messages: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """
+        순서대로 정렬된 메시지 묶음을 세션에 저장하고 갱신된 세션 요약을 반환합니다.
+
+        버킷 세션은 메시지를 버킷에 먼저 쓴 뒤 카운터를 올리므로, 중간에 실패해도 카운터가 저장되지 않은
+        메시지를 세거나 순번에 빈 구간이 생기지 않습니다. 같은 묶음을 다시 저장하면(재시도) message_id로
+        이미 저장된 메시지를 건너뛰므로 메시지가 중복되지 않습니다.
+
+        이 프로세스가 마지막으로 저장한 순번을 알고 있으면 세션을 조회하지 않고 버킷 추가와 카운터 갱신,
+        2회 왕복으로 저장합니다. 순번이 겹칠 때만 세션과 버킷 꼬리를 다시 조회합니다.
+        """
+        import logging
+        logger = logging.getLogger(__name__)
+
+        if not messages:
+            return await self.get_session_summary(user_id, session_id)
+
+        try:
+            resolve_tail = False
+            for _ in range(APPEND_MAX_ATTEMPTS):
+                count = None if resolve_tail else self.next_seq_cache.get((user_id, session_id))
+                if count is None:
+                    doc = await self.conversations_collection.find_one(
+                        {"user_id": user_id, "session_id": session_id},
+                        {"_id": 0, "storage": 1, "message_count": 1}
+                    )
+                    if doc is None:
+                        # 세션이 없으면 빈 버킷 세션으로 생성한 뒤 다시 조회
+                        now = datetime.now()
+                        await self.conversations_collection.update_one(
+                            {"user_id": user_id, "session_id": session_id},
+                            {"$setOnInsert": {
+                                "session_name": "기본 대화",
+                                "storage": BUCKETED_STORAGE,
+                                "message_count": 0,
+                                "created_at": now,
+                                "updated_at": now
+                            }},
+                            upsert=True
+                        )
+                        logger.info(f"새 세션 생성: user_id={user_id}, session_id={session_id}")
+                        continue
+                    if doc.get("storage") != BUCKETED_STORAGE:
+                        summary = await self._append_legacy(user_id, session_id, messages)
+                        if summary is not None:
+                            return summary
+                        continue
+                    count = doc.get("message_count", 0)
+
+                summary = await self._append_bucketed(user_id, session_id, count, messages, resolve_tail)
+                if summary is not None:
+                    return summary
+                # 순번이 겹침: 이전 쓰기(재시도 포함)나 다른 쓰기가 먼저 저장했으므로 꼬리를 확인하고 재시도
+                resolve_tail = True
+            raise RuntimeError(f"다른 쓰기와 순번 충돌이 반복되어 메시지를 저장하지 못했습니다 ({APPEND_MAX_ATTEMPTS}회 시도)")
+        except Exception as e:
+            self.next_seq_cache.pop((user_id, session_id))
+            logger.error(f"메시지 저장 실패: {str(e)}")
+            raise
+
+    @staticmethod
+    def _counter_fields(messages: List[Dict[str, Any]]) -> Dict[str, Any]:
+        last = messages[-1]
+        return {
+            "updated_at": datetime.now(),
+            "last_activity": last["timestamp"],
+            "last_message_preview": make_preview(last["user_message"])
+        }
+
+    async def _append_bucketed(self, user_id: str, session_id: str, count: int,
+                               messages: List[Dict[str, Any]], resolve_tail: bool) -> Optional[Dict[str, Any]]:
+        """
+        버킷 세션의 count 순번부터 메시지를 추가합니다. resolve_tail이면 카운터 이후 순번에 이미 저장된 메시지
+        (카운터를 올리지 못한 이전 쓰기)를 먼저 확인해 건너뜁니다. 다른 쓰기와 순번이 겹치거나 세션 카운터가
+        count보다 작으면(다른 프로세스가 세션을 초기화·삭제) None을 반환합니다 (세션을 다시 조회해 재시도).
+        """
+        import logging
+        logger = logging.getLogger(__name__)
+
+        unsaved, first_seq = messages, count
+        if resolve_tail:
+            tail = await self.bucket_store.get_tail(user_id, session_id, count)
+            saved_ids = {msg.get("message_id") for msg in tail}
+            unsaved = [msg for msg in messages if msg["message_id"] not in saved_ids]
+            first_seq = tail[-1]["seq"] + 1 if tail else count
+        if unsaved and not await self.bucket_store.append_many(user_id, session_id, first_seq, unsaved):
+            self.next_seq_cache.pop((user_id, session_id))
+            return None
+
+        # $max로 올리므로 동시에 쓴 요청이 늦게 도착해도 카운터가 줄지 않고, 남아 있던 꼬리 메시지도 함께 반영됨
+        fields = self._counter_fields(messages)
+        doc = await self.conversations_collection.find_one_and_update(
+            {
+                "user_id": user_id,
+                "session_id": session_id,
+                "storage": BUCKETED_STORAGE,
+                "message_count": {"$gte": count}
+            },
+            {
+                "$max": {"message_count": first_seq + len(unsaved), "last_activity": fields.pop("last_activity")},
+                "$set": fields
+            },
+            projection=SUMMARY_PROJECTION,
+            return_document=ReturnDocument.AFTER
+        )
+        if doc is None:
+            # 캐시한 순번 이후 세션이 초기화·삭제됨: 방금 추가한 메시지를 되돌리고 세션을 다시 조회
+            self.next_seq_cache.pop((user_id, session_id))
+            await self.bucket_store.remove_messages(user_id, session_id, first_seq, unsaved)
+            logger.warning(f"세션 카운터가 예상보다 작아 다시 저장합니다: user_id={user_id}, session_id={session_id}")
+            return None
+
+        self.next_seq_cache.set((user_id, session_id), doc.get("total_messages", first_seq + len(unsaved)))
+        if unsaved:
+            self.embedding_index.schedule_index(user_id, session_id, first_seq, unsaved)
+        logger.info(f"세션에 메시지 추가: user_id={user_id}, session_id={session_id}, 메시지 수={len(unsaved)}"
+                    f"{f', 이미 저장됨={len(messages) - len(unsaved)}' if len(unsaved) < len(messages) else ''}")
+        return self._build_summary(session_id, doc)
+
+    async def _append_legacy(self, user_id: str, session_id: str, messages: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """
+        마이그레이션 전 레거시 세션의 messages 배열에 추가합니다. 묶음 전체가 문서 하나에 원자적으로 반영되므로
+        이미 저장된 묶음이면 추가하지 않습니다. 그사이 버킷 세션으로 전환됐으면 None을 반환합니다.
+        """
+        import logging
+        logger = logging.getLogger(__name__)
+
+        message_ids = [msg["message_id"] for msg in messages]
+        # 백필 전 문서는 message_count가 없으므로 $inc 대신 배열 크기에서 이어서 셈 (파이프라인 업데이트)
+        doc = await self.conversations_collection.find_one_and_update(
+            {
+                "user_id": user_id,
+                "session_id": session_id,
+                "storage": {"$ne": BUCKETED_STORAGE},
+                "messages.message_id": {"$nin": message_ids}
+            },
+            [{"$set": {
+                **self._counter_fields(messages),
+                "message_count": {"$add": [
+                    {"$ifNull": ["$message_count", {"$size": {"$ifNull": ["$messages", []]}}]},
+                    len(messages)
+                ]},
+                # 메시지 본문이 "$"로 시작해도 필드 경로로 해석되지 않도록 $literal로 감쌈
+                "messages": {"$concatArrays": [{"$ifNull": ["$messages", []]}, {"$literal": messages}]}
+            }}],
+            projection=SUMMARY_PROJECTION,
+            return_document=ReturnDocument.AFTER
+        )
+        if doc:
+            logger.info(f"레거시 세션에 메시지 추가: user_id={user_id}, session_id={session_id}, 메시지 수={len(messages)}")
+            return self._build_summary(session_id, doc)
+
+        doc = await self.conversations_collection.find_one(
+            {"user_id": user_id, "session_id": session_id, "messages.message_id": {"$in": message_ids}},
+            SUMMARY_PROJECTION
+        )
+        if doc:
+            logger.info(f"이미 저장된 메시지 묶음: user_id={user_id}, session_id={session_id}, 메시지 수={len(messages)}")
+            return self._build_summary(session_id, doc)
+        return None
+
+    @staticmethod
+    def _new_message(user_message: str, assistant_response: str) -> Dict[str, Any]:
+        """저장할 메시지 문서를 만듭니다. message_id는 대기 메시지와 저장된 메시지의 중복 제거에 사용됩니다."""
+        return {
+            "message_id": str(uuid.uuid4()),
+            "user_message": user_message,
+            "assistant_response": assistant_response,
+            "timestamp": datetime.now()
+        }
+
+    @staticmethod
+    def _unsaved(pending: List[Dict[str, Any]], persisted: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """대기 메시지 중 조회 결과에 아직 포함되지 않은 메시지만 반환합니다."""
+        if not pending:
+            return []
+        saved_ids = {msg.get("message_id") for msg in persisted}
+        return [msg for msg in pending if msg["message_id"] not in saved_ids]
+
+    @staticmethod
+    def _format_message(msg: Dict[str, Any]) -> Dict[str, Any]:
+        """저장된 메시지를 API 응답 형식으로 변환합니다."""
+        return {
+            "user": msg["user_message"],
+            "assistant": msg["assistant_response"],
+            "timestamp": msg["timestamp"].isoformat() if isinstance(msg["timestamp"], datetime) else msg["timestamp"]
+        }
+
+    @staticmethod
+    def _build_summary(session_id: str, doc: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """요약 필드만 담긴 세션 문서로 get_session_summary와 같은 형식의 요약을 만듭니다."""
+        if not doc:
+            return {
+                "session_id": session_id,
+                "session_name": "기본 대화",
+                "total_messages": 0,
+                "has_history": False,
+                "last_activity": None
+            }
+
+        total_count = doc.get("total_messages", 0)
+        updated_at = doc.get("updated_at")
+        return {
+            "session_id": session_id,
+            "session_name": doc.get("session_name", "기본 대화"),
+            "total_messages": total_count,
+            "has_history": total_count > 0,
+            "last_activity": updated_at.isoformat() if isinstance(updated_at, datetime) else updated_at
+        }
+
     async def clear_session_history(self, user_id: str, session_id: str) -> int:
         """특정 세션의 대화 히스토리를 초기화합니다."""
         try:
+            await self.write_queue.discard(user_id, session_id)
+            self.next_seq_cache.pop((user_id, session_id))
             result = await self.conversations_collection.update_one(
                 {"user_id": user_id, "session_id": session_id},
                 {
                     "$set": {
-                        "messages": [],
+                        "storage": BUCKETED_STORAGE,
+                        "message_count": 0,
+                        "last_message_preview": None,
+                        "last_activity": datetime.now(),
                         "updated_at": datetime.now()
-                    }
+                    },
+                    # 레거시 세션은 내장 메시지를 비우면서 버킷 세션으로 전환
+                    "$unset": {"messages": "", "context_summary": ""}
                 }
             )
+            await self.bucket_store.delete_session(user_id, session_id)
+            await self.embedding_index.delete_session(user_id, session_id)
             return result.modified_count
         except Exception as e:
             return 0
@@ -220,103 +758,139 @@ class ConversationManager:
             session_id = await self._get_or_create_default_session(user_id)
         
         try:
-            # 세션 문서 조회
+            # messages 배열 없이 카운터 필드만 조회
             conversation_doc = await self.conversations_collection.find_one(
-                {"user_id": user_id, "session_id": session_id}
+                {"user_id": user_id, "session_id": session_id},
+                {"_id": 0, "session_name": 1, "updated_at": 1, "message_count": 1}
             )
             
-            if not conversation_doc:
-                return {
-                    "session_id": session_id,
-                    "session_name": "기본 대화",
-                    "total_messages": 0,
-                    "has_history": False,
-                    "last_activity": None
-                }
-            
-            # 메시지 수 계산
-            messages = conversation_doc.get("messages", [])
-            total_count = len(messages)
-            
-            # 마지막 활동 시간
-            last_activity = None
-            if conversation_doc.get("updated_at"):
-                last_activity = conversation_doc["updated_at"].isoformat()
-            elif messages:
-                last_message = messages[-1]
-                if "timestamp" in last_message:
-                    timestamp = last_message["timestamp"]
-                    last_activity = timestamp.isoformat() if isinstance(timestamp, datetime) else timestamp
+            if conversation_doc and "message_count" not in conversation_doc:
+                # 백필 전 문서는 서버에서 배열 크기만 계산
+                docs = await self.conversations_collection.aggregate([
+                    {"$match": {"user_id": user_id, "session_id": session_id}},
+                    {"$limit": 1},
+                    {"$project": {"_id": 0, "message_count": {"$size": {"$ifNull": ["$messages", []]}}}}
+                ]).to_list(length=1)
+                conversation_doc["message_count"] = docs[0]["message_count"] if docs else 0
             
-            return {
-                "session_id": session_id,
-                "session_name": conversation_doc.get("session_name", "기본 대화"),
-                "total_messages": total_count,
-                "has_history": total_count > 0,
-                "last_activity": last_activity
-            }
+            # 아직 저장되지 않은 대기 메시지 수를 더함
+            pending_count = len(self.write_queue.snapshot(user_id, session_id))
+            if conversation_doc:
+                conversation_doc["total_messages"] = conversation_doc["message_count"] + pending_count
+            elif pending_count:
+                conversation_doc = {"total_messages": pending_count}
+            return self._build_summary(session_id, conversation_doc)
             
         except Exception as e:
             logger.error(f"세션 요약 조회 실패: {str(e)}")
-            return {
-                "session_id": session_id,
-                "session_name": "기본 대화",
-                "total_messages": 0,
-                "has_history": False,
-                "last_activity": None
-            }
+            return self._build_summary(session_id, None)
     
     async def _get_or_create_default_session(self, user_id: str) -> str:
-        """기본 세션을 찾거나 생성합니다."""
+        """
+        기본 세션 ID를 반환하고, 세션이 없으면 생성합니다.
+        캐시 → 사용자 문서의 default_session_id → 생성 순서로 확인하므로
+        일반적인 경우 DB 조회 없이 반환됩니다.
+        """
         import logging
         logger = logging.getLogger(__name__)
-        
-        # 먼저 기존 세션이 있는지 확인 (하위 호환성)
-        existing_doc = await self.conversations_collection.find_one(
-            {"user_id": user_id, "session_id": {"$exists": False}}
-        )
-        
-        if existing_doc:
-            # 기존 세션을 default로 변환
-            default_session_id = "default"
-            await self.conversations_collection.update_one(
-                {"_id": existing_doc["_id"]},
-                {
-                    "$set": {
-                        "session_id": default_session_id,
-                        "session_name": "기본 대화"
-                    }
-                }
+
+        cached = self.default_session_cache.get(user_id)
+        if cached:
+            return cached
+
+        user_uuid = self._user_uuid(user_id)
+        if user_uuid is not None:
+            user_doc = await self.users_collection.find_one({"_id": user_uuid}, {"_id": 0, "default_session_id": 1})
+            if user_doc and user_doc.get("default_session_id"):
+                self.default_session_cache.set(user_id, user_doc["default_session_id"])
+                return user_doc["default_session_id"]
+
+        default_session_id = await self._ensure_default_session(user_id)
+        if user_uuid is not None:
+            await self.users_collection.update_one(
+                {"_id": user_uuid},
+                {"$set": {"default_session_id": default_session_id}}
             )
-            logger.info(f"기존 세션을 default로 변환: user_id={user_id}")
-            return default_session_id
-        else:
-            # default 세션 찾기
-            default_doc = await self.conversations_collection.find_one(
-                {"user_id": user_id, "session_id": "default"}
+        self.default_session_cache.set(user_id, default_session_id)
+        logger.info(f"기본 세션 확인 및 사용자 문서 기록: user_id={user_id}")
+        return default_session_id
+
+    async def _ensure_default_session(self, user_id: str) -> str:
+        """
+        기본 세션 문서가 존재하도록 보장합니다.
+        (user_id, session_id) 유니크 인덱스와 upsert를 사용하므로 동시 요청에도 한 개만 생성됩니다.
+        """
+        import logging
+        logger = logging.getLogger(__name__)
+
+        # 기존 세션(session_id 없는 문서)이 있으면 default로 변환 (하위 호환성)
+        try:
+            result = await self.conversations_collection.update_one(
+                {"user_id": user_id, "session_id": {"$exists": False}},
+                {"$set": {"session_id": DEFAULT_SESSION_ID, "session_name": "기본 대화"}}
             )
-            
-            if default_doc:
-                logger.info(f"기존 default 세션 사용: user_id={user_id}")
-                return "default"
-            else:
-                # default 세션을 직접 생성 (UUID 대신 "default" 사용)
-                default_session_doc = {
-                    "user_id": user_id,
-                    "session_id": "default",
+            if result.modified_count > 0:
+                logger.info(f"기존 세션을 default로 변환: user_id={user_id}")
+                return DEFAULT_SESSION_ID
+        except DuplicateKeyError:
+            # default 세션이 이미 있으면 변환하지 않음
+            pass
+
+        now = datetime.now()
+        try:
+            result = await self.conversations_collection.update_one(
+                {"user_id": user_id, "session_id": DEFAULT_SESSION_ID},
+                {"$setOnInsert": {
                     "session_name": "기본 대화",
-                    "messages": [],
-                    "created_at": datetime.now(),
-                    "updated_at": datetime.now()
-                }
-                
-                try:
-                    result = await self.conversations_collection.insert_one(default_session_doc)
-                    logger.info(f"새 default 세션 생성: user_id={user_id}")
-                    return "default"
-                except Exception as e:
-                    logger.error(f"default 세션 생성 실패: {str(e)}")
-                    raise
+                    "storage": BUCKETED_STORAGE,
+                    "message_count": 0,
+                    "last_message_preview": None,
+                    "last_activity": None,
+                    "created_at": now,
+                    "updated_at": now
+                }},
+                upsert=True
+            )
+            if result.upserted_id is not None:
+                logger.info(f"새 default 세션 생성: user_id={user_id}")
+        except DuplicateKeyError:
+            # 동시에 다른 요청이 먼저 생성한 경우
+            logger.info(f"다른 요청이 생성한 default 세션 사용: user_id={user_id}")
+        except Exception as e:
+            logger.error(f"default 세션 생성 실패: {str(e)}")
+            raise
+        return DEFAULT_SESSION_ID
+
+    async def invalidate_default_session(self, user_id: str, clear_user_doc: bool = False):
+        """기본 세션 캐시를 무효화합니다. clear_user_doc이면 사용자 문서의 기록도 제거합니다."""
+        self.default_session_cache.pop(user_id)
+        user_uuid = self._user_uuid(user_id)
+        if clear_user_doc and user_uuid is not None:
+            await self.users_collection.update_one({"_id": user_uuid}, {"$unset": {"default_session_id": ""}})
+
+    async def create_indexes(self):
+        """
+        (user_id, session_id) 유니크 인덱스를 생성합니다. default 세션 동시 생성을 막는 데 사용됩니다.
+        session_id가 없는 변환 전 문서는 인덱스에서 제외합니다.
+        """
+        import logging
+        logger = logging.getLogger(__name__)
+        try:
+            await self.conversations_collection.create_index(
+                [("user_id", 1), ("session_id", 1)],
+                unique=True,
+                partialFilterExpression={"session_id": {"$exists": True}}
+            )
+        except Exception as e:
+            # 기존 데이터에 중복 세션이 있으면 생성 실패 (정리 후 재시작 필요)
+            logger.warning(f"세션 유니크 인덱스 생성 실패: {str(e)}")
+
+    @staticmethod
+    def _user_uuid(user_id: str) -> Optional[uuid.UUID]:
+        try:
+            return uuid.UUID(user_id)
+        except (ValueError, TypeError, AttributeError):
+            return None
 
     # 하위 호환성을 위한 기존 메서드들
     async def clear_conversation_history(self, user_id: str):
@@ -0,0 +1,182 @@
+import asyncio, logging
+from datetime import datetime
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+from bson.binary import Binary
+from pymongo import ASCENDING, UpdateOne
+from core.cache import TTLCache
+from core.config import settings
+from core.database import async_conversation_embeddings_collection
+from crud.message_buckets import bucket_seq_for
+
+# 로깅 설정
+logger = logging.getLogger(__name__)
+
+# 임베딩할 어시스턴트 응답 앞부분 길이 (소형 모델의 최대 입력 길이를 넘는 부분은 어차피 잘림)
+EMBED_ASSISTANT_CHARS = 500
+
+@lru_cache(maxsize=1)
+def _load_encoder(model_name: str):
+    """sentence-transformers 모델을 CPU로 한 번만 로드합니다. 사용할 수 없으면 None."""
+    try:
+        from sentence_transformers import SentenceTransformer
+        return SentenceTransformer(model_name, device="cpu")
+    except Exception as e:
+        logger.warning(f"임베딩 모델을 로드할 수 없어 관련 대화 검색을 사용하지 않습니다: {str(e)}")
+        return None
+
+def embedding_text(message: Dict[str, Any]) -> str:
+    """저장된 메시지 한 턴에서 임베딩할 텍스트를 만듭니다."""
+    user = message.get("user_message") or message.get("user") or ""
+    assistant = message.get("assistant_response") or message.get("assistant") or ""
+    return f"{user}\n{assistant[:EMBED_ASSISTANT_CHARS]}"
+
+class SessionEmbeddingIndex:
+    """
+    세션별 메시지 임베딩 인덱스.
+
+    메시지 한 턴을 CPU 로컬 모델로 정규화 벡터(float16)로 만들어 메시지 버킷과 같은 단위
+    (user_id, session_id, bucket_seq)로 저장하고, 조회 시 세션 전체를 NumPy 행렬 하나로 읽어
+    내적(코사인 유사도)으로 top-k 순번을 찾습니다. 로드한 행렬은 프로세스 내에 캐시합니다.
+    """
+
+    def __init__(self):
+        self.embeddings_collection = async_conversation_embeddings_collection
+        self.model_name = settings.CHAT_EMBEDDING_MODEL
+        # (user_id, session_id) -> (순번 배열, 벡터 행렬)
+        self._matrices = TTLCache(maxsize=settings.CHAT_RETRIEVAL_CACHE_SIZE, ttl=settings.CHAT_RETRIEVAL_CACHE_TTL)
+        self._tasks: set = set()
+
+    @property
+    def enabled(self) -> bool:
+        return settings.CHAT_RETRIEVAL_ENABLED and _load_encoder(self.model_name) is not None
+
+    async def warmup(self):
+        """모델 로드는 수 초가 걸리므로 시작 시 스레드에서 미리 로드합니다."""
+        if settings.CHAT_RETRIEVAL_ENABLED:
+            await asyncio.to_thread(_load_encoder, self.model_name)
+
+    async def create_indexes(self):
+        await self.embeddings_collection.create_index(
+            [("user_id", ASCENDING), ("session_id", ASCENDING), ("bucket_seq", ASCENDING)],
+            unique=True
+        )
+
+    async def embed(self, texts: List[str]):
+        """텍스트 목록을 정규화된 float32 벡터 행렬로 변환합니다 (이벤트 루프를 막지 않도록 스레드에서 실행)."""
+        encoder = _load_encoder(self.model_name)
+        return await asyncio.to_thread(
+            encoder.encode, texts, batch_size=32, normalize_embeddings=True, convert_to_numpy=True
+        )
+
+    def schedule_index(self, user_id: str, session_id: str, first_seq: int, messages: List[Dict[str, Any]]):
+        """메시지 저장 후 임베딩을 백그라운드에서 생성합니다. 저장 경로의 지연에는 영향을 주지 않습니다."""
+        if not self.enabled or not messages:
+            return
+        task = asyncio.create_task(self._index_safely(user_id, session_id, first_seq, messages))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _index_safely(self, user_id: str, session_id: str, first_seq: int, messages: List[Dict[str, Any]]):
+        try:
+            await self.index_messages(user_id, session_id, first_seq, messages)
+        except Exception as e:
+            logger.error(f"메시지 임베딩 저장 실패 - 사용자: {user_id}, 세션: {session_id}, 오류: {str(e)}")
+
+    async def index_messages(self, user_id: str, session_id: str, first_seq: int, messages: List[Dict[str, Any]]) -> int:
+        """first_seq부터 연속된 순번의 메시지를 임베딩해 저장합니다. 저장한 벡터 수를 반환합니다."""
+        import numpy as np
+
+        vectors = (await self.embed([embedding_text(m) for m in messages])).astype(np.float16)
+        grouped: Dict[int, Tuple[List[int], List[Binary]]] = {}
+        for i, vector in enumerate(vectors):
+            seq = first_seq + i
+            seqs, blobs = grouped.setdefault(bucket_seq_for(seq), ([], []))
+            seqs.append(seq)
+            blobs.append(Binary(vector.tobytes()))
+
+        now = datetime.now()
+        await self.embeddings_collection.bulk_write([
+            UpdateOne(
+                {"user_id": user_id, "session_id": session_id, "bucket_seq": bucket_seq},
+                {
+                    "$push": {"seqs": {"$each": seqs}, "vectors": {"$each": blobs}},
+                    "$set": {"dim": int(vectors.shape[1]), "updated_at": now}
+                },
+                upsert=True
+            )
+            for bucket_seq, (seqs, blobs) in grouped.items()
+        ], ordered=False)
+
+        # 캐시된 행렬이 있으면 다시 읽지 않고 새 행만 이어 붙임
+        key = (user_id, session_id)
+        cached = self._matrices.get(key)
+        if cached is not None:
+            seq_array, matrix = cached
+            new_seqs = np.arange(first_seq, first_seq + len(messages))
+            matrix = vectors if matrix is None else np.vstack([matrix, vectors])
+            self._matrices.set(key, (np.concatenate([seq_array, new_seqs]), matrix))
+        return len(messages)
+
+    async def _load_matrix(self, user_id: str, session_id: str):
+        """세션의 모든 벡터를 (순번 배열, float16 행렬)로 읽어옵니다."""
+        import numpy as np
+
+        key = (user_id, session_id)
+        cached = self._matrices.get(key)
+        if cached is not None:
+            return cached
+
+        seq_parts, vector_parts = [], []
+        cursor = self.embeddings_collection.find(
+            {"user_id": user_id, "session_id": session_id},
+            {"_id": 0, "seqs": 1, "vectors": 1, "dim": 1}
+        ).sort("bucket_seq", ASCENDING)
+        async for doc in cursor:
+            if not doc.get("seqs"):
+                continue
+            seq_parts.append(np.asarray(doc["seqs"], dtype=np.int64))
+            vector_parts.append(
+                np.frombuffer(b"".join(doc["vectors"]), dtype=np.float16).reshape(len(doc["seqs"]), doc["dim"])
+            )
+
+        if seq_parts:
+            loaded = (np.concatenate(seq_parts), np.vstack(vector_parts))
+        else:
+            loaded = (np.empty(0, dtype=np.int64), None)
+        self._matrices.set(key, loaded)
+        return loaded
+
+    async def search(self, user_id: str, session_id: str, query: str, top_k: int,
+                     before_seq: Optional[int] = None, min_score: float = 0.0) -> List[Tuple[int, float]]:
+        """
+        질문과 관련도가 높은 과거 메시지 순번을 (순번, 점수) 목록으로 반환합니다 (점수 내림차순).
+        before_seq가 주어지면 그보다 앞선 메시지만 대상으로 합니다 (최근 창과 중복 방지).
+        """
+        import numpy as np
+
+        if not self.enabled or top_k <= 0 or not query:
+            return []
+
+        seq_array, matrix = await self._load_matrix(user_id, session_id)
+        if matrix is None:
+            return []
+
+        query_vector = (await self.embed([query]))[0].astype(np.float32)
+        scores = matrix.astype(np.float32) @ query_vector
+        if before_seq is not None:
+            scores[seq_array >= before_seq] = -np.inf
+
+        k = min(top_k, len(scores))
+        candidates = np.argpartition(-scores, k - 1)[:k]
+        ranked = sorted(candidates, key=lambda i: -scores[i])
+        return [(int(seq_array[i]), float(scores[i])) for i in ranked if scores[i] >= min_score]
+
+    async def delete_session(self, user_id: str, session_id: str) -> int:
+        """세션의 임베딩을 모두 삭제합니다."""
+        self._matrices.pop((user_id, session_id))
+        result = await self.embeddings_collection.delete_many({"user_id": user_id, "session_id": session_id})
+        return result.deleted_count
+
+# 전역 인스턴스
+session_embedding_index = SessionEmbeddingIndex()
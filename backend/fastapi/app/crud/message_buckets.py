@@ -0,0 +1,224 @@
+from datetime import datetime
+from typing import List, Dict, Any, Optional
+from pymongo import ASCENDING, DESCENDING, UpdateOne
+from pymongo.errors import BulkWriteError
+from core.database import async_conversation_buckets_collection
+
+# 버킷 하나에 저장하는 최대 메시지 수
+# 메시지 순번(seq)으로 버킷 번호를 계산하므로 운영 중에는 변경하지 않습니다.
+BUCKET_SIZE = 100
+
+# 세션 문서의 storage 필드 값 (메시지를 버킷 컬렉션에 저장하는 세션)
+BUCKETED_STORAGE = "bucketed"
+
+def bucket_seq_for(message_seq: int) -> int:
+    """메시지 순번(0부터 시작)이 속하는 버킷 번호를 반환합니다."""
+    return message_seq // BUCKET_SIZE
+
+class MessageBucketStore:
+    """
+    세션 메시지를 (user_id, session_id, bucket_seq) 단위의 고정 크기 버킷 문서로 저장합니다.
+
+    세션 문서에는 메타데이터와 카운터만 남기고 메시지 본문은 버킷에 나누어 저장하므로,
+    세션이 길어져도 추가/최근 조회 비용이 일정하게 유지됩니다.
+    """
+
+    def __init__(self):
+        self.buckets_collection = async_conversation_buckets_collection
+
+    async def create_indexes(self):
+        """버킷 조회/추가에 필요한 인덱스를 생성합니다."""
+        await self.buckets_collection.create_index(
+            [("user_id", ASCENDING), ("session_id", ASCENDING), ("bucket_seq", DESCENDING)],
+            unique=True
+        )
+
+    async def append(self, user_id: str, session_id: str, message_seq: int, message: Dict[str, Any]) -> bool:
+        """
+        메시지를 순번에 해당하는 버킷에 추가합니다. 버킷이 없으면 생성합니다.
+        같은 순번이 이미 저장되어 있으면 추가하지 않고 False를 반환합니다.
+        """
+        return await self.append_many(user_id, session_id, message_seq, [message])
+
+    async def append_many(self, user_id: str, session_id: str, first_seq: int, messages: List[Dict[str, Any]]) -> bool:
+        """
+        first_seq부터 연속된 순번의 메시지들을 버킷별로 묶어 한 번의 bulk_write로 추가합니다.
+        순번 구간이 버킷 경계를 넘으면 버킷마다 UpdateOne 하나씩 생성됩니다.
+
+        버킷에 이미 같은 순번이 있으면(다른 쓰기가 먼저 사용) 그 버킷부터 추가하지 않고 False를 반환합니다.
+        순번이 겹치면 필터가 맞지 않아 upsert가 새 버킷을 만들려다 고유 인덱스 충돌로 실패하는 방식입니다.
+        """
+        if not messages:
+            return True
+
+        grouped: Dict[int, List[Dict[str, Any]]] = {}
+        for i, message in enumerate(messages):
+            seq = first_seq + i
+            grouped.setdefault(bucket_seq_for(seq), []).append({"seq": seq, **message})
+
+        now = datetime.now()
+        operations = [
+            UpdateOne(
+                {
+                    "user_id": user_id,
+                    "session_id": session_id,
+                    "bucket_seq": bucket_seq,
+                    "messages.seq": {"$nin": [msg["seq"] for msg in bucket_messages]}
+                },
+                {
+                    "$push": {"messages": {"$each": bucket_messages}},
+                    "$inc": {"count": len(bucket_messages)},
+                    "$set": {"updated_at": now},
+                    "$setOnInsert": {"created_at": now}
+                },
+                upsert=True
+            )
+            for bucket_seq, bucket_messages in grouped.items()
+        ]
+        try:
+            # 앞 버킷에서 충돌하면 뒤 버킷은 쓰지 않도록 순서대로 실행
+            await self.buckets_collection.bulk_write(operations, ordered=True)
+        except BulkWriteError as e:
+            if e.details.get("writeConcernErrors") or any(error.get("code") != 11000 for error in e.details.get("writeErrors", [])):
+                raise
+            return False
+        return True
+
+    async def remove_messages(self, user_id: str, session_id: str, first_seq: int, messages: List[Dict[str, Any]]) -> int:
+        """
+        append_many로 first_seq부터 추가한 메시지를 버킷에서 되돌립니다 (세션 카운터에 반영하지 못한 경우).
+        다른 쓰기의 메시지를 지우지 않도록 순번과 message_id가 모두 일치하는 메시지만 제거합니다.
+        """
+        if not messages:
+            return 0
+
+        now = datetime.now()
+        operations = []
+        for i, message in enumerate(messages):
+            key = {"seq": first_seq + i, "message_id": message["message_id"]}
+            operations.append(UpdateOne(
+                {
+                    "user_id": user_id,
+                    "session_id": session_id,
+                    "bucket_seq": bucket_seq_for(first_seq + i),
+                    "messages": {"$elemMatch": key}
+                },
+                {"$pull": {"messages": key}, "$inc": {"count": -1}, "$set": {"updated_at": now}}
+            ))
+        result = await self.buckets_collection.bulk_write(operations, ordered=False)
+        return result.modified_count
+
+    async def get_tail(self, user_id: str, session_id: str, from_seq: int) -> List[Dict[str, Any]]:
+        """from_seq 이후(포함) 순번으로 저장된 메시지의 seq, message_id를 순번 오름차순으로 반환합니다."""
+        cursor = self.buckets_collection.find(
+            {"user_id": user_id, "session_id": session_id, "bucket_seq": {"$gte": bucket_seq_for(from_seq)}},
+            {"_id": 0, "messages.seq": 1, "messages.message_id": 1}
+        )
+        collected: List[Dict[str, Any]] = []
+        async for bucket in cursor:
+            collected.extend(m for m in bucket.get("messages", []) if m["seq"] >= from_seq)
+        return sorted(collected, key=lambda m: m["seq"])
+
+    async def insert_many(self, user_id: str, session_id: str, messages: List[Dict[str, Any]]) -> int:
+        """
+        순서대로 정렬된 메시지 목록을 버킷으로 나누어 저장합니다 (마이그레이션용).
+        생성한 버킷 수를 반환합니다.
+        """
+        now = datetime.now()
+        buckets = []
+        for start in range(0, len(messages), BUCKET_SIZE):
+            chunk = messages[start:start + BUCKET_SIZE]
+            buckets.append({
+                "user_id": user_id,
+                "session_id": session_id,
+                "bucket_seq": bucket_seq_for(start),
+                "messages": [{"seq": start + i, **msg} for i, msg in enumerate(chunk)],
+                "count": len(chunk),
+                "created_at": now,
+                "updated_at": now
+            })
+        if buckets:
+            await self.buckets_collection.insert_many(buckets, ordered=True)
+        return len(buckets)
+
+    async def get_recent(self, user_id: str, session_id: str, limit: int,
+                         before_seq: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        최신 버킷부터 거꾸로 탐색하며 최근 limit개 메시지를 시간순으로 반환합니다.
+        before_seq가 주어지면 그보다 앞선 메시지만 반환합니다.
+        """
+        if limit <= 0:
+            return []
+
+        query: Dict[str, Any] = {"user_id": user_id, "session_id": session_id}
+        if before_seq is not None:
+            if before_seq <= 0:
+                return []
+            query["bucket_seq"] = {"$lte": bucket_seq_for(before_seq - 1)}
+
+        cursor = self.buckets_collection.find(
+            query, {"_id": 0, "messages": 1}
+        ).sort("bucket_seq", DESCENDING).batch_size(2)
+
+        collected: List[Dict[str, Any]] = []
+        async for bucket in cursor:
+            messages = bucket.get("messages", [])
+            if before_seq is not None:
+                messages = [m for m in messages if m["seq"] < before_seq]
+            # 동시 추가 시 버킷 내 순서가 섞일 수 있으므로 seq로 정렬
+            collected = sorted(messages, key=lambda m: m["seq"]) + collected
+            if len(collected) >= limit:
+                break
+
+        return collected[-limit:]
+
+    async def get_after(self, user_id: str, session_id: str, after_seq: int, limit: int) -> List[Dict[str, Any]]:
+        """after_seq 이후의 메시지를 오래된 순서로 최대 limit개 반환합니다."""
+        if limit <= 0:
+            return []
+
+        cursor = self.buckets_collection.find(
+            {"user_id": user_id, "session_id": session_id, "bucket_seq": {"$gte": bucket_seq_for(after_seq + 1)}},
+            {"_id": 0, "messages": 1}
+        ).sort("bucket_seq", ASCENDING).batch_size(2)
+
+        collected: List[Dict[str, Any]] = []
+        async for bucket in cursor:
+            messages = [m for m in bucket.get("messages", []) if m["seq"] > after_seq]
+            collected.extend(sorted(messages, key=lambda m: m["seq"]))
+            if len(collected) >= limit:
+                break
+
+        return collected[:limit]
+
+    async def get_by_seqs(self, user_id: str, session_id: str, seqs: List[int]) -> List[Dict[str, Any]]:
+        """지정한 순번의 메시지만 순번 오름차순으로 반환합니다 (관련 대화 검색 결과 조회용)."""
+        if not seqs:
+            return []
+
+        wanted = sorted(set(seqs))
+        cursor = self.buckets_collection.aggregate([
+            {"$match": {
+                "user_id": user_id,
+                "session_id": session_id,
+                "bucket_seq": {"$in": sorted({bucket_seq_for(seq) for seq in wanted})}
+            }},
+            {"$project": {"_id": 0, "messages": {"$filter": {
+                "input": "$messages",
+                "as": "m",
+                "cond": {"$in": ["$$m.seq", wanted]}
+            }}}}
+        ])
+
+        collected: List[Dict[str, Any]] = []
+        async for bucket in cursor:
+            collected.extend(bucket.get("messages", []))
+        return sorted(collected, key=lambda m: m["seq"])
+
+    async def delete_session(self, user_id: str, session_id: str) -> int:
+        """세션의 모든 버킷을 삭제합니다."""
+        result = await self.buckets_collection.delete_many({"user_id": user_id, "session_id": session_id})
+        return result.deleted_count
+
+# 전역 인스턴스
+message_bucket_store = MessageBucketStore()
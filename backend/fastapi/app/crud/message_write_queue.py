@@ -0,0 +1,204 @@
+import asyncio, logging, time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+# 로깅 설정
+logger = logging.getLogger(__name__)
+
+SessionKey = Tuple[str, str]
+FlushHandler = Callable[[str, str, List[Dict[str, Any]]], Awaitable[Any]]
+
+class MessageWriteQueue:
+    """
+    메시지 저장을 요청 경로에서 분리하는 프로세스 내 write-behind 큐.
+
+    추가된 메시지는 (user_id, session_id)별로 모였다가 개수(max_batch) 또는
+    시간(flush_interval) 조건을 만족하면 세션당 한 번의 bulk 쓰기로 저장됩니다.
+    저장 전 메시지는 snapshot()으로 조회할 수 있어 같은 프로세스의 히스토리 조회가
+    방금 추가한 메시지를 놓치지 않습니다 (read-your-writes).
+
+    저장에 실패한 묶음은 지수 백오프로 다시 시도하며, flush_handler는 같은 묶음을 다시 받아도
+    중복 저장하지 않아야 합니다 (ConversationManager.append_messages는 message_id로 건너뜀).
+    종료 시에는 재시도 횟수와 관계없이 drain_timeout 동안 남은 메시지를 계속 저장합니다.
+    """
+
+    def __init__(self, flush_handler: FlushHandler, max_batch: int = 50,
+                 flush_interval: float = 0.2, max_retries: int = 3,
+                 retry_backoff: float = 0.5, max_retry_backoff: float = 30.0, drain_timeout: float = 30.0):
+        self._flush_handler = flush_handler
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.max_retry_backoff = max_retry_backoff
+        self.drain_timeout = drain_timeout
+
+        # 저장 대기 중인 메시지와 저장 중(in-flight)인 메시지
+        self._pending: Dict[SessionKey, List[Dict[str, Any]]] = {}
+        self._inflight: Dict[SessionKey, List[Dict[str, Any]]] = {}
+        self._attempts: Dict[SessionKey, int] = {}
+        # 재시도 대기 중인 세션의 다음 시도 시각 (time.monotonic 기준)
+        self._retry_at: Dict[SessionKey, float] = {}
+        self._depth = 0
+
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+        self._stopping = False
+
+        # 메트릭
+        self._flush_count = 0
+        self._flushed_messages = 0
+        self._failed_flushes = 0
+        self._dropped_messages = 0
+        self._last_flush_ms = 0.0
+        self._max_flush_ms = 0.0
+        self._total_flush_ms = 0.0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done() and not self._stopping
+
+    def start(self):
+        """백그라운드 flush 루프를 시작합니다. 이벤트 루프 안에서 호출해야 합니다."""
+        if self.running:
+            return
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._stopping = False
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"메시지 write-behind 큐 시작: max_batch={self.max_batch}, flush_interval={self.flush_interval}s")
+
+    async def stop(self):
+        """새 메시지 수신을 멈추고 남은 메시지를 모두 저장한 뒤 종료합니다."""
+        if self._task is None:
+            return
+        self._stopping = True
+        self._wakeup.set()
+        await self._task
+        self._task = None
+
+        # 재시도 대기 중인 메시지까지 모두 비움 (DB 일시 장애 동안 버리지 않고 백오프하며 기다림)
+        deadline = time.monotonic() + self.drain_timeout
+        while self._pending and time.monotonic() < deadline:
+            await self.flush()
+            if self._pending:
+                await asyncio.sleep(max(min(self._next_retry_delay(), deadline - time.monotonic()), 0))
+        if self._depth:
+            self._dropped_messages += self._depth
+            logger.error(f"종료 시 {self.drain_timeout:.0f}초 안에 저장하지 못한 메시지: {self._depth}개")
+        logger.info("메시지 write-behind 큐 종료")
+
+    def put(self, user_id: str, session_id: str, message: Dict[str, Any]):
+        """메시지를 세션 대기열에 추가합니다. 대기 메시지가 max_batch에 도달하면 즉시 flush를 깨웁니다."""
+        self._pending.setdefault((user_id, session_id), []).append(message)
+        self._depth += 1
+        if self._depth >= self.max_batch and self._wakeup is not None:
+            self._wakeup.set()
+
+    def snapshot(self, user_id: str, session_id: str) -> List[Dict[str, Any]]:
+        """아직 저장이 끝나지 않은 세션 메시지를 추가된 순서대로 반환합니다."""
+        key = (user_id, session_id)
+        return list(self._inflight.get(key, [])) + list(self._pending.get(key, []))
+
+    async def discard(self, user_id: str, session_id: str) -> int:
+        """
+        세션 초기화/삭제 시 대기 중인 메시지를 버립니다. 버린 개수를 반환합니다.
+        진행 중인 flush가 끝난 뒤에 버리므로 반환 후에는 해당 세션에 대한 쓰기가 남아 있지 않습니다.
+        """
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+        async with self._flush_lock:
+            key = (user_id, session_id)
+            dropped = self._pending.pop(key, [])
+            self._attempts.pop(key, None)
+            self._retry_at.pop(key, None)
+            self._depth -= len(dropped)
+            return len(dropped)
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"write-behind flush 루프 오류: {str(e)}")
+        await self.flush()
+
+    def _next_retry_delay(self) -> float:
+        """재시도 대기 중인 세션 중 가장 먼저 다시 시도할 때까지 남은 시간(초)을 반환합니다."""
+        if not self._retry_at:
+            return 0.0
+        return max(min(self._retry_at.values()) - time.monotonic(), 0.0)
+
+    async def flush(self):
+        """대기 중인 세션 메시지를 세션별 bulk 쓰기로 동시에 저장합니다 (백오프 중인 세션은 다음 시도 시각까지 제외)."""
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+        async with self._flush_lock:
+            now = time.monotonic()
+            ready = [key for key in self._pending if self._retry_at.get(key, 0) <= now]
+            if not ready:
+                return
+            batches = {key: self._pending.pop(key) for key in ready}
+            self._inflight.update(batches)
+
+            started = time.perf_counter()
+            await asyncio.gather(*(self._flush_session(key, messages) for key, messages in batches.items()))
+            elapsed_ms = (time.perf_counter() - started) * 1000
+
+            self._flush_count += 1
+            self._last_flush_ms = elapsed_ms
+            self._max_flush_ms = max(self._max_flush_ms, elapsed_ms)
+            self._total_flush_ms += elapsed_ms
+
+    async def _flush_session(self, key: SessionKey, messages: List[Dict[str, Any]]):
+        user_id, session_id = key
+        try:
+            await self._flush_handler(user_id, session_id, messages)
+            self._depth -= len(messages)
+            self._flushed_messages += len(messages)
+            self._attempts.pop(key, None)
+            self._retry_at.pop(key, None)
+        except Exception as e:
+            self._failed_flushes += 1
+            attempts = self._attempts.get(key, 0) + 1
+            # 종료 중에는 stop()이 drain_timeout까지 계속 시도
+            if attempts > self.max_retries and not self._stopping:
+                logger.error(f"메시지 저장 재시도 초과로 폐기 - 사용자: {user_id}, 세션: {session_id}, "
+                             f"메시지 수: {len(messages)}, 오류: {str(e)}")
+                self._depth -= len(messages)
+                self._dropped_messages += len(messages)
+                self._attempts.pop(key, None)
+                self._retry_at.pop(key, None)
+            else:
+                delay = min(self.retry_backoff * 2 ** (attempts - 1), self.max_retry_backoff)
+                progress = f"{attempts}/{self.max_retries}" if attempts <= self.max_retries else f"{attempts}, 종료 대기 중"
+                logger.warning(f"메시지 저장 실패, {delay:.1f}초 후 재시도({progress}) - "
+                               f"사용자: {user_id}, 세션: {session_id}, 오류: {str(e)}")
+                # 이후에 들어온 메시지보다 앞에 오도록 대기열 맨 앞에 되돌림
+                self._pending[key] = messages + self._pending.get(key, [])
+                self._attempts[key] = attempts
+                self._retry_at[key] = time.monotonic() + delay
+        finally:
+            self._inflight.pop(key, None)
+
+    def metrics(self) -> Dict[str, Any]:
+        """큐 깊이와 flush 지연 시간 메트릭을 반환합니다."""
+        return {
+            "running": self.running,
+            "queue_depth": self._depth,
+            "pending_sessions": len(self._pending),
+            "retrying_sessions": len(self._retry_at),
+            "inflight_sessions": len(self._inflight),
+            "flush_count": self._flush_count,
+            "flushed_messages": self._flushed_messages,
+            "failed_flushes": self._failed_flushes,
+            "dropped_messages": self._dropped_messages,
+            "last_flush_ms": round(self._last_flush_ms, 2),
+            "max_flush_ms": round(self._max_flush_ms, 2),
+            "avg_flush_ms": round(self._total_flush_ms / self._flush_count, 2) if self._flush_count else 0.0
+        }
@@ -8,9 +8,11 @@ from cryptography.fernet import Fernet
 from base64 import urlsafe_b64encode
 import hashlib
 from models.mcp_nosql import UserCreate, MCPCreate, MCPUpdate, EnvUpdate
-from core.security import get_password_hash, verify_password
+from core.security import password_hasher, PasswordHashOverloaded
 from core.database import async_db, codec_options
 from core.config import settings
+from crud.message_buckets import message_bucket_store
+from crud.principal_cache import principal_cache, PRINCIPAL_PROJECTION
 
 # 공개 ID 생성 함수
 def generate_public_id(prefix="mcp_", length=6):
@@ -101,6 +103,19 @@ async def create_nosql_indexes():
     # 대화 인덱스 추가
     await conversations.create_index("user_id")
     await conversations.create_index([("user_id", 1), ("updated_at", -1)])
+    # 대화 메시지 버킷 인덱스 (최신 버킷 조회/추가)
+    await message_bucket_store.create_indexes()
+    # 세션 유니크 인덱스 (default 세션 동시 생성 방지)
+    from crud.conversation import conversation_manager
+    await conversation_manager.create_indexes()
+    # Pod 프로비저닝 작업 인덱스
+    from crud.pod_jobs import pod_job_store
+    await pod_job_store.create_indexes()
+    from crud.agent_activity import agent_activity_store
+    await agent_activity_store.create_indexes()
+    # 대화 임베딩 인덱스 (관련 대화 검색 사용 시)
+    if settings.CHAT_RETRIEVAL_ENABLED:
+        await conversation_manager.embedding_index.create_indexes()
 
 # ======== 사용자 관련 CRUD ========
 
@@ -112,6 +127,21 @@ async def get_user_by_email(email: str):
     """이메일로 사용자를 조회합니다."""
     return await users.find_one({"email": email})
 
+async def get_principal_by_email(email: str):
+    """
+    인증된 요청에서 사용할 슬림 사용자 레코드를 반환합니다.
+    캐시에 없으면 필요한 필드만 조회해 캐시에 저장합니다.
+    """
+    principal = principal_cache.get(email)
+    if principal is not None:
+        return principal
+    
+    generation = principal_cache.generation
+    principal = await users.find_one({"email": email}, PRINCIPAL_PROJECTION)
+    if principal is not None:
+        principal_cache.set(principal, generation)
+    return principal
+
 async def get_user_by_id(user_id: str):
     """ID로 사용자를 조회합니다."""
     try:
@@ -133,7 +163,7 @@ async def create_user(user: UserCreate):
         return None
     
     # 새 사용자 생성
-    hashed_password = get_password_hash(user.password)
+    hashed_password = await password_hasher.hash(user.password)
     user_id = uuid.uuid4()
     user_dict = {
         "_id": user_id,
@@ -155,7 +185,7 @@ async def authenticate_user(email: str, password: str):
     user = await get_user_by_email(email)
     if not user:
         return False
-    if not verify_password(password, user["hashed_password"]):
+    if not await password_hasher.verify(password, user["hashed_password"]):
         return False
     return user
 
@@ -164,6 +194,10 @@ async def delete_user(user_id: str):
     try:
         uuid_id = uuid.UUID(user_id)
         result = await users.delete_one({"_id": uuid_id})
+        principal_cache.invalidate_user(user_id)
+        # 기본 세션 캐시 무효화
+        from crud.conversation import conversation_manager
+        await conversation_manager.invalidate_default_session(user_id)
         return result.deleted_count > 0
     except Exception as e:
         print(f"사용자 삭제 중 오류 발생: {e}")
@@ -244,6 +278,7 @@ async def delete_mcp(public_id: str):
             {"selected_mcps.public_id": mcp.get("public_id", "")},
             {"$pull": {"selected_mcps": {"public_id": mcp.get("public_id", "")}}}
         )
+        principal_cache.invalidate_all()
         
         # unset을 사용하여 환경 변수 설정에서 제거
         # 이전에는 UUID를 키로 사용했을 수 있으므로 두 가지 방법 모두 시도
@@ -314,6 +349,7 @@ async def select_mcp_for_user(user_id: str, public_id: str):
                 {"_id": uuid_user_id},
                 {"$push": {"selected_mcps": mcp_info}}
             )
+            principal_cache.invalidate_user(user_id)
         except Exception as e:
             print(f"MCP 정보 추가 오류: {e}")
             return {"success": False, "message": f"오류 발생: {str(e)}"}
@@ -339,6 +375,7 @@ async def deselect_mcp(user_id: str, public_id: str):
                 {"_id": uuid_user_id},
                 {"$pull": {"selected_mcps": {"public_id": mcp.get("public_id", "")}}}
             )
+            principal_cache.invalidate_user(user_id)
             return result.modified_count > 0
         
         # 직접 공개 ID로 시도
@@ -346,6 +383,7 @@ async def deselect_mcp(user_id: str, public_id: str):
             {"_id": uuid_user_id},
             {"$pull": {"selected_mcps": {"public_id": public_id}}}
         )
+        principal_cache.invalidate_user(user_id)
         
         return result.modified_count > 0
     except Exception as e:
@@ -533,6 +571,7 @@ async def update_pod_name(user_id: str, pod_name: str) -> bool:
             {"_id": uuid_user_id},
             {"$set": {"pod_name": pod_name}}
         )
+        principal_cache.invalidate_user(user_id)
         # 업데이트 결과 확인 - matched_count도 확인
         return result.modified_count > 0 or result.matched_count > 0
     except Exception as e:
@@ -564,11 +603,11 @@ async def change_user_password(user_id: str, current_password: str, new_password
             return {"success": False, "message": "사용자를 찾을 수 없습니다."}
         
         # 현재 비밀번호 확인
-        if not verify_password(current_password, user["hashed_password"]):
+        if not await password_hasher.verify(current_password, user["hashed_password"]):
             return {"success": False, "message": "현재 비밀번호가 일치하지 않습니다."}
         
         # 새 비밀번호 해시 생성
-        hashed_password = get_password_hash(new_password)
+        hashed_password = await password_hasher.hash(new_password)
         
         # 비밀번호 업데이트
         uuid_id = uuid.UUID(user_id)
@@ -576,12 +615,15 @@ async def change_user_password(user_id: str, current_password: str, new_password
             {"_id": uuid_id},
             {"$set": {"hashed_password": hashed_password}}
         )
+        principal_cache.invalidate_user(user_id)
         
         if result.modified_count > 0:
             return {"success": True, "message": "비밀번호가 성공적으로 변경되었습니다."}
         else:
             return {"success": False, "message": "비밀번호 변경 중 오류가 발생했습니다."}
     
+    except PasswordHashOverloaded:
+        raise
     except Exception as e:
         print(f"비밀번호 변경 중 오류 발생: {e}")
         return {"success": False, "message": f"오류 발생: {str(e)}"}
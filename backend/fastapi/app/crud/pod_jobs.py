@@ -0,0 +1,132 @@
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional, Tuple
+import uuid
+from pymongo import ASCENDING, DESCENDING, ReturnDocument
+from pymongo.errors import DuplicateKeyError
+from core.config import settings
+from core.database import async_pod_jobs_collection
+
+# 프로비저닝 단계
+PHASE_QUEUED = "queued"
+PHASE_DEPLOYING = "deploying"
+PHASE_STARTING_MCP = "starting_mcp"
+PHASE_READY = "ready"
+PHASE_FAILED = "failed"
+
+ACTIVE_PHASES = (PHASE_QUEUED, PHASE_DEPLOYING, PHASE_STARTING_MCP)
+FINAL_PHASES = (PHASE_READY, PHASE_FAILED)
+
+# 단계별 기본 안내 메시지
+PHASE_MESSAGES = {
+    PHASE_QUEUED: "Pod 생성 요청이 대기 중입니다.",
+    PHASE_DEPLOYING: "에이전트 Pod를 배포하는 중입니다.",
+    PHASE_STARTING_MCP: "MCP 서버를 시작하는 중입니다.",
+    PHASE_READY: "에이전트가 준비되었습니다.",
+    PHASE_FAILED: "Pod 생성에 실패했습니다."
+}
+
+class PodJobStore:
+    """
+    사용자별 Pod 프로비저닝 작업 상태 저장소.
+
+    작업 상태를 MongoDB에 저장하므로 작업을 실행하지 않은 backend 워커도 상태를 조회할 수 있습니다.
+    진행 중인 작업은 사용자당 하나만 존재하며(active 필드 부분 유니크 인덱스),
+    일정 시간 갱신되지 않은 작업은 실행하던 워커가 종료된 것으로 보고 새 작업을 허용합니다.
+    """
+
+    def __init__(self):
+        self.jobs_collection = async_pod_jobs_collection
+
+    async def create_indexes(self):
+        await self.jobs_collection.create_index("job_id", unique=True)
+        await self.jobs_collection.create_index([("user_id", ASCENDING), ("created_at", DESCENDING)])
+        # 사용자당 진행 중 작업 하나
+        await self.jobs_collection.create_index(
+            "user_id",
+            name="user_id_active_unique",
+            unique=True,
+            partialFilterExpression={"active": True}
+        )
+
+    async def create_or_get_active(self, user_id: str) -> Tuple[Dict[str, Any], bool]:
+        """
+        진행 중인 작업이 있으면 그 작업을, 없으면 새 작업을 반환합니다.
+        (작업 문서, 새로 생성 여부) 튜플을 반환합니다.
+        """
+        active = await self._get_active(user_id)
+        if active:
+            return active, False
+
+        now = datetime.now()
+        job = {
+            "job_id": str(uuid.uuid4()),
+            "user_id": user_id,
+            "phase": PHASE_QUEUED,
+            "message": PHASE_MESSAGES[PHASE_QUEUED],
+            "pod_name": None,
+            "active": True,
+            "history": [{"phase": PHASE_QUEUED, "at": now}],
+            "created_at": now,
+            "updated_at": now
+        }
+        try:
+            await self.jobs_collection.insert_one(job)
+        except DuplicateKeyError:
+            # 다른 워커가 동시에 작업을 만든 경우
+            active = await self._get_active(user_id)
+            if active:
+                return active, False
+            raise
+        job.pop("_id", None)
+        return job, True
+
+    async def _get_active(self, user_id: str) -> Optional[Dict[str, Any]]:
+        job = await self.jobs_collection.find_one({"user_id": user_id, "active": True}, {"_id": 0})
+        if not job:
+            return None
+        stale_before = datetime.now() - timedelta(seconds=settings.POD_JOB_STALE_SECONDS)
+        if job["updated_at"] < stale_before:
+            await self.update_phase(job["job_id"], PHASE_FAILED, "작업이 중단되었습니다. 다시 시도해주세요.",
+                                    expected_updated_at=job["updated_at"])
+            return None
+        return job
+
+    async def update_phase(self, job_id: str, phase: str, message: Optional[str] = None,
+                           expected_updated_at: Optional[datetime] = None, **fields) -> Optional[Dict[str, Any]]:
+        """
+        진행 중인 작업의 단계를 갱신하고 갱신된 작업을 반환합니다 (이미 끝난 작업이면 None).
+        최종 단계가 되면 진행 중 표시를 해제합니다.
+        """
+        now = datetime.now()
+        # 이미 끝난 작업(다른 워커가 중단 처리한 경우 포함)은 갱신하지 않음
+        query: Dict[str, Any] = {"job_id": job_id, "active": True}
+        if expected_updated_at is not None:
+            query["updated_at"] = expected_updated_at
+        update: Dict[str, Any] = {
+            "$set": {"phase": phase, "message": message or PHASE_MESSAGES[phase], "updated_at": now, **fields},
+            "$push": {"history": {"phase": phase, "at": now}}
+        }
+        if phase in FINAL_PHASES:
+            update["$unset"] = {"active": ""}
+            update["$set"]["finished_at"] = now
+        return await self.jobs_collection.find_one_and_update(
+            query, update, projection={"_id": 0}, return_document=ReturnDocument.AFTER
+        )
+
+    async def touch(self, job_id: str):
+        """진행 중인 작업의 updated_at을 갱신합니다 (실행 중인 워커가 살아 있음을 표시)."""
+        await self.jobs_collection.update_one(
+            {"job_id": job_id, "active": True},
+            {"$set": {"updated_at": datetime.now()}}
+        )
+
+    async def get(self, user_id: str, job_id: str) -> Optional[Dict[str, Any]]:
+        return await self.jobs_collection.find_one({"user_id": user_id, "job_id": job_id}, {"_id": 0})
+
+    async def get_latest(self, user_id: str) -> Optional[Dict[str, Any]]:
+        return await self.jobs_collection.find_one(
+            {"user_id": user_id}, {"_id": 0}, sort=[("created_at", DESCENDING)]
+        )
+
+# 전역 인스턴스
+pod_job_store = PodJobStore()
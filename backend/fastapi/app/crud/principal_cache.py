@@ -0,0 +1,110 @@
+import asyncio, logging
+from typing import Any, Dict, Optional
+from core.cache import TTLCache
+from core.config import settings
+from core.database import async_db, codec_options
+
+# 로깅 설정
+logger = logging.getLogger(__name__)
+
+# 인증된 요청에서 사용하는 사용자 필드만 조회 (hashed_password, env_settings 제외)
+PRINCIPAL_PROJECTION = {
+    "_id": 1,
+    "username": 1,
+    "email": 1,
+    "is_admin": 1,
+    "pod_name": 1,
+    "selected_mcps": 1
+}
+
+class PrincipalCache:
+    """
+    JWT subject(email) → 슬림 사용자 레코드 캐시.
+
+    get_current_user가 매 요청마다 사용자 문서 전체를 읽지 않도록 인증 주체를 TTL/LRU로 캐시합니다.
+    비밀번호 변경, 사용자 삭제, MCP 선택, Pod 갱신 시 명시적으로 무효화하며,
+    여러 워커를 쓰는 경우 users 컬렉션 change stream으로 다른 프로세스의 변경도 반영할 수 있습니다.
+    """
+
+    def __init__(self):
+        self._principals = TTLCache(maxsize=settings.PRINCIPAL_CACHE_SIZE, ttl=settings.PRINCIPAL_CACHE_TTL)
+        # user_id -> email (ID 기준 무효화용)
+        self._emails_by_id: Dict[str, str] = {}
+        # 무효화가 일어날 때마다 증가 (조회 도중 무효화된 값을 저장하지 않기 위함)
+        self.generation = 0
+        self._watch_task: Optional[asyncio.Task] = None
+
+    def get(self, email: str) -> Optional[Dict[str, Any]]:
+        return self._principals.get(email)
+
+    def set(self, principal: Dict[str, Any], generation: Optional[int] = None):
+        """
+        사용자 레코드를 저장합니다. generation은 DB 조회 전에 읽은 값으로,
+        조회 도중 무효화가 있었다면 오래된 값일 수 있으므로 저장하지 않습니다.
+        """
+        if generation is not None and generation != self.generation:
+            return
+        email = principal["email"]
+        self._principals.set(email, principal)
+        self._emails_by_id[str(principal["_id"])] = email
+        # 캐시에서 밀려난 항목의 역색인이 쌓이지 않도록 정리
+        if len(self._emails_by_id) > 2 * self._principals.maxsize:
+            self._emails_by_id = {uid: e for uid, e in self._emails_by_id.items() if self._principals.get(e) is not None}
+
+    def invalidate_user(self, user_id: str):
+        """사용자 ID로 캐시 항목을 무효화합니다."""
+        self.generation += 1
+        email = self._emails_by_id.pop(str(user_id), None)
+        if email:
+            self._principals.pop(email)
+
+    def invalidate_all(self):
+        """여러 사용자 문서가 한 번에 바뀐 경우(MCP 삭제 등) 전체를 무효화합니다."""
+        self.generation += 1
+        self._principals.clear()
+        self._emails_by_id.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return self._principals.stats()
+
+    def start_change_stream(self):
+        """users 컬렉션 change stream 구독을 시작합니다 (레플리카 셋 필요)."""
+        if self._watch_task is None or self._watch_task.done():
+            self._watch_task = asyncio.create_task(self._watch())
+
+    async def stop(self):
+        if self._watch_task is not None:
+            self._watch_task.cancel()
+            try:
+                await self._watch_task
+            except asyncio.CancelledError:
+                pass
+            self._watch_task = None
+
+    async def _watch(self):
+        users = async_db.get_collection("users_nosql", codec_options=codec_options)
+        resume_token = None
+        retry_delay = 1
+        while True:
+            try:
+                async with users.watch(
+                    [{"$match": {"operationType": {"$in": ["update", "replace", "delete"]}}}],
+                    resume_after=resume_token
+                ) as stream:
+                    logger.info("사용자 change stream 구독 시작")
+                    retry_delay = 1
+                    async for change in stream:
+                        resume_token = stream.resume_token
+                        self.invalidate_user(str(change["documentKey"]["_id"]))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # 재개 지점을 잃었을 수 있으므로 그동안의 변경을 반영하기 위해 전체 무효화
+                self.invalidate_all()
+                resume_token = None
+                logger.warning(f"사용자 change stream 오류, {retry_delay}초 후 재시도: {str(e)}")
+                await asyncio.sleep(retry_delay)
+                retry_delay = min(retry_delay * 2, 60)
+
+# 전역 인스턴스
+principal_cache = PrincipalCache()
@@ -1,4 +1,5 @@
-from fastapi import FastAPI
+from fastapi import Depends, FastAPI, Request
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 import sys
 import os
@@ -7,6 +8,13 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 from routers import nosql_auth, nosql_user, nosql_mcp, nosql_select, nosql_env, conversational_chat_bot,chat_bot
 from core.config import settings
 from crud.nosql import create_nosql_indexes
+from core.agent_client import agent_client
+from crud.conversation import conversation_manager
+from crud.principal_cache import principal_cache
+from core.security import password_hasher, PasswordHashOverloaded, require_metrics_token
+from core.pod_provisioner import pod_provisioner
+from core.idle_reaper import idle_reaper
+from core.agent_config_sync import agent_config_sync
 
 import logging
 
@@ -30,6 +38,11 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# 비밀번호 해싱 대기열이 가득 찬 경우 503으로 응답
+@app.exception_handler(PasswordHashOverloaded)
+async def password_hash_overloaded_handler(request: Request, exc: PasswordHashOverloaded):
+    return JSONResponse(status_code=503, content={"detail": str(exc)}, headers={"Retry-After": "1"})
+
 # 라우터 포함
 app.include_router(nosql_user.router)
 app.include_router(nosql_mcp.router)
@@ -38,16 +51,46 @@ app.include_router(nosql_env.router)
 app.include_router(chat_bot.router)
 # app.include_router(conversational_chat_bot.router)
 
-# 시작 시 인덱스 생성
+# 시작 시 인덱스 생성 및 메시지 write-behind 큐 시작
 @app.on_event("startup")
 async def startup_event():
     await create_nosql_indexes()
+    if settings.MESSAGE_WRITE_BEHIND_ENABLED:
+        conversation_manager.write_queue.start()
+    # 관련 대화 검색용 임베딩 모델 미리 로드
+    await conversation_manager.embedding_index.warmup()
+    if settings.PRINCIPAL_CACHE_CHANGE_STREAM:
+        principal_cache.start_change_stream()
+    # 유휴 agent Pod scale-to-zero
+    if settings.AGENT_IDLE_REAPER_ENABLED:
+        idle_reaper.start()
+
+# 종료 시 대기 중인 메시지를 모두 저장하고 agent 커넥션 풀 정리
+@app.on_event("shutdown")
+async def shutdown_event():
+    await idle_reaper.stop()
+    await pod_provisioner.stop()
+    await conversation_manager.write_queue.stop()
+    await principal_cache.stop()
+    password_hasher.shutdown()
+    await agent_client.close()
 
 @app.get("/")
 def read_root():
     """API 루트 엔드포인트"""
     return {"message": "MCP API에 오신 것을 환영합니다"}
 
+@app.get("/metrics", dependencies=[Depends(require_metrics_token)], include_in_schema=False)
+def read_metrics():
+    """프로세스 내부 메트릭 엔드포인트 (METRICS_TOKEN 필요)"""
+    return {
+        "message_write_queue": conversation_manager.write_queue.metrics(),
+        "principal_cache": principal_cache.stats(),
+        "password_hasher": password_hasher.metrics(),
+        "idle_reaper": idle_reaper.metrics(),
+        "agent_config_sync": agent_config_sync.metrics()
+    }
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run("main:app", host="localhost", port=8000, reload=True)
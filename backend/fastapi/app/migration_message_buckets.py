@@ -0,0 +1,75 @@
+"""
+문서 내 messages 배열에 메시지를 저장하던 기존 세션을 버킷 저장 방식으로 옮기는 마이그레이션 스크립트
+
+세션마다 messages 배열을 BUCKET_SIZE 단위 버킷 문서로 나누어 저장한 뒤,
+세션 문서에서 messages 배열을 제거하고 storage 필드를 bucketed로 표시합니다.
+중간에 중단되어도 다시 실행하면 남은 세션부터 이어서 처리합니다.
+"""
+import asyncio
+from core.database import async_conversations_collection
+from crud.message_buckets import message_bucket_store, BUCKETED_STORAGE
+from crud.conversation import make_preview
+import logging
+
+# 로깅 설정
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+async def migrate_to_message_buckets():
+    """레거시 세션 문서를 버킷 저장 방식으로 마이그레이션"""
+    await message_bucket_store.create_indexes()
+
+    query = {
+        "session_id": {"$exists": True},
+        "storage": {"$ne": BUCKETED_STORAGE}
+    }
+    target_count = await async_conversations_collection.count_documents(query)
+    logger.info(f"마이그레이션 대상 세션: {target_count}개")
+
+    migrated_sessions = 0
+    migrated_messages = 0
+
+    # 큰 세션이 많을 수 있으므로 한 번에 소량씩 가져와 처리
+    cursor = async_conversations_collection.find(
+        query, {"user_id": 1, "session_id": 1, "messages": 1, "updated_at": 1}
+    ).batch_size(10)
+
+    async for doc in cursor:
+        user_id = doc["user_id"]
+        session_id = doc["session_id"]
+        messages = doc.get("messages", [])
+
+        try:
+            # 이전 실행에서 일부만 저장된 버킷 정리 후 다시 저장
+            await message_bucket_store.delete_session(user_id, session_id)
+            bucket_count = await message_bucket_store.insert_many(user_id, session_id, messages)
+
+            last_message = messages[-1] if messages else None
+            # 마이그레이션 도중 메시지가 추가되었다면 전환하지 않고 다음 실행에서 다시 처리
+            result = await async_conversations_collection.update_one(
+                {"_id": doc["_id"], "storage": {"$ne": BUCKETED_STORAGE}, "messages": {"$size": len(messages)}},
+                {
+                    "$set": {
+                        "storage": BUCKETED_STORAGE,
+                        "message_count": len(messages),
+                        "last_message_preview": make_preview(last_message.get("user_message")) if last_message else None,
+                        "last_activity": last_message.get("timestamp") if last_message else doc.get("updated_at")
+                    },
+                    "$unset": {"messages": ""}
+                }
+            )
+            if result.matched_count == 0:
+                await message_bucket_store.delete_session(user_id, session_id)
+                logger.warning(f"세션이 마이그레이션 중 변경되어 건너뜀: user_id={user_id}, session_id={session_id}")
+                continue
+            migrated_sessions += 1
+            migrated_messages += len(messages)
+            logger.info(f"세션 마이그레이션 완료: user_id={user_id}, session_id={session_id}, "
+                        f"메시지 {len(messages)}개 → 버킷 {bucket_count}개")
+        except Exception as e:
+            logger.error(f"세션 마이그레이션 실패: user_id={user_id}, session_id={session_id}, 오류: {str(e)}")
+
+    logger.info(f"마이그레이션 완료: 세션 {migrated_sessions}개, 메시지 {migrated_messages}개")
+
+if __name__ == "__main__":
+    asyncio.run(migrate_to_message_buckets())
@@ -0,0 +1,58 @@
+"""
+기존 대화 세션 문서에 message_count, last_message_preview, last_activity 필드를 채우는 백필 스크립트
+
+세션 목록 API는 messages 배열 대신 위 필드만 조회하므로,
+배포 후 한 번 실행해 이전에 만들어진 세션 문서를 보정합니다.
+"""
+import asyncio
+from core.database import async_conversations_collection
+from crud.conversation import PREVIEW_LENGTH
+from crud.message_buckets import BUCKETED_STORAGE
+import logging
+
+# 로깅 설정
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+async def backfill_session_counters():
+    """카운터 필드가 없거나 레거시(messages 배열) 세션 문서를 서버 측 파이프라인 업데이트로 보정"""
+
+    # 레거시 문서는 messages 배열이 전체 메시지이므로 카운터가 이미 있어도 배열 크기로 다시 계산
+    # (이전 버전에서 백필 전에 $inc로 만들어진 잘못된 카운터 보정)
+    query = {"$or": [{"message_count": {"$exists": False}}, {"storage": {"$ne": BUCKETED_STORAGE}}]}
+    target_count = await async_conversations_collection.count_documents(query)
+    logger.info(f"백필 대상 세션: {target_count}개")
+
+    if target_count == 0:
+        return
+
+    # 메시지 본문을 애플리케이션으로 가져오지 않도록 업데이트 파이프라인으로 처리
+    last_message = {"$arrayElemAt": [{"$ifNull": ["$messages", []]}, -1]}
+    result = await async_conversations_collection.update_many(
+        query,
+        [
+            {"$set": {
+                "message_count": {"$size": {"$ifNull": ["$messages", []]}},
+                "last_message_preview": {
+                    "$let": {
+                        "vars": {"last": last_message},
+                        "in": {"$cond": [
+                            {"$ifNull": ["$$last", False]},
+                            {"$substrCP": [{"$ifNull": ["$$last.user_message", ""]}, 0, PREVIEW_LENGTH]},
+                            None
+                        ]}
+                    }
+                },
+                "last_activity": {
+                    "$let": {
+                        "vars": {"last": last_message},
+                        "in": {"$ifNull": ["$$last.timestamp", "$updated_at"]}
+                    }
+                }
+            }}
+        ]
+    )
+    logger.info(f"백필 완료: {result.modified_count}개 세션 업데이트")
+
+if __name__ == "__main__":
+    asyncio.run(backfill_session_counters())
@@ -74,6 +74,9 @@ class EnvUpdate(BaseModel):
 class Token(BaseModel):
     access_token: str
     token_type: str
+    # 로그인 시 등록된 Pod 프로비저닝 작업 (GET /pod/status로 진행 상황 조회)
+    provisioning_job_id: Optional[str] = None
+    provisioning_phase: Optional[str] = None
 
 class TokenData(BaseModel):
     username: Optional[str] = None
@@ -125,6 +128,8 @@ class SessionInfo(BaseModel):
     session_id: str
     session_name: str
     message_count: int
+    last_message_preview: Optional[str] = None  # 마지막 사용자 메시지 미리보기
+    last_activity: Optional[str] = None  # 마지막 대화 시각 (ISO 형식)
 
 # 세션 목록 응답 모델
 class SessionListResponse(BaseModel):
@@ -148,4 +153,6 @@ class ConversationalChatResponse(BaseModel):
     session_name: Optional[str] = None
     conversation_count: int = 0  # 총 대화 수
     used_history: bool = False   # 히스토리를 사용했는지 여부
-    had_context: bool = False    # 하위 호환성을 위해
\ No newline at end of file
+    had_context: bool = False    # 하위 호환성을 위해
+    agent_state: Optional[str] = None             # 유휴 정리 후 재기동 중이면 "waking", MCP 서버 연결 중이면 "starting"
+    provisioning_job_id: Optional[str] = None     # 재기동 작업 ID (GET /pod/status로 진행 확인)
\ No newline at end of file
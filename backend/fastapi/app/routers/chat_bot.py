@@ -1,5 +1,7 @@
-import asyncio, subprocess, json
-from fastapi import APIRouter, Depends, HTTPException, status
+import asyncio, json
+import httpx
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import StreamingResponse
 from typing import Dict, Any, List, Optional
 from pydantic import BaseModel
 from datetime import datetime
@@ -10,46 +12,13 @@ from models.mcp_nosql import (
     SessionInfo, SessionListResponse
 )
 from core.config import settings
-from crud.conversation import conversation_manager
+from core.agent_client import agent_client
+from crud.conversation import conversation_manager, decode_history_cursor
+from crud.pod_jobs import pod_job_store, FINAL_PHASES, PHASE_READY
+from crud.agent_activity import agent_activity_store, STATE_WAKING
+from core.pod_provisioner import pod_provisioner
 import logging
 
-# 비동기적으로 kubectl 명령을 실행하는 함수
-async def run_kubectl_command(cmd, timeout=60):
-    """비동기적으로 kubectl 명령을 실행합니다."""
-    logger.info(f"실행 명령어: {' '.join(cmd)}")
-    
-    try:
-        # 명령 실행을 위한 프로세스 생성
-        process = await asyncio.create_subprocess_exec(
-            *cmd,
-            stdout=asyncio.subprocess.PIPE,
-            stderr=asyncio.subprocess.PIPE
-        )
-        
-        # 타임아웃 적용하여 완료 대기
-        try:
-            stdout, stderr = await asyncio.wait_for(process.communicate(), timeout=timeout)
-        except asyncio.TimeoutError:
-            # 타임아웃 발생 시 프로세스 종료 시도
-            try:
-                process.kill()
-            except:
-                pass
-            logger.error(f"kubectl 명령 타임아웃")
-            raise asyncio.TimeoutError("명령 실행 시간이 초과되었습니다.")
-        
-        # 결과 반환
-        return {
-            "returncode": process.returncode,
-            "stdout": stdout.decode('utf-8'),
-            "stderr": stderr.decode('utf-8')
-        }
-    except Exception as e:
-        if isinstance(e, asyncio.TimeoutError):
-            raise
-        logger.exception(f"kubectl 명령 실행 중 오류: {str(e)}")
-        raise RuntimeError(f"명령 실행 중 오류 발생: {str(e)}")
-
 # 커스텀 JSON 인코더
 class DateTimeEncoder(json.JSONEncoder):
     def default(self, obj):
@@ -59,10 +28,44 @@ class DateTimeEncoder(json.JSONEncoder):
 
 logger = logging.getLogger(__name__)
 
+# agent Pod는 떠 있지만 MCP 서버 연결이 끝나지 않아 채팅을 처리할 수 없는 상태 (응답용)
+AGENT_STATE_STARTING = "starting"
+
 class ChatHistoryResponse(BaseModel):
     history: List[Dict[str, Any]]
     session_active: bool
     conversation_summary: Dict[str, Any]
+    # 키셋 페이지네이션 커서 (이전/이후 페이지 요청 시 before/after로 전달)
+    older_cursor: Optional[str] = None
+    newer_cursor: Optional[str] = None
+    has_older: bool = False
+    has_newer: bool = False
+
+async def _load_history_page(user_id: str, session_id: str, limit: int,
+                             before: Optional[str], after: Optional[str]) -> ChatHistoryResponse:
+    """커서 파라미터를 해석해 히스토리 한 페이지를 응답 모델로 만듭니다."""
+    if before and after:
+        raise HTTPException(status_code=400, detail="before와 after는 함께 사용할 수 없습니다.")
+    try:
+        before_seq = decode_history_cursor(before) if before else None
+        after_seq = decode_history_cursor(after) if after else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    page = await conversation_manager.get_history_page(
+        user_id, session_id, limit=limit, before_seq=before_seq, after_seq=after_seq
+    )
+    summary = await conversation_manager.get_session_summary(user_id, session_id)
+    
+    return ChatHistoryResponse(
+        history=page["messages"],
+        session_active=summary["has_history"],
+        conversation_summary=summary,
+        older_cursor=page.get("older_cursor") if page["has_older"] else None,
+        newer_cursor=page.get("newer_cursor") if page["has_newer"] else None,
+        has_older=page["has_older"],
+        has_newer=page["has_newer"]
+    )
 
 router = APIRouter(
     tags=["챗봇"],
@@ -187,23 +190,18 @@ async def reset_session(
 @router.get("/sessions/{session_id}/history", response_model=ChatHistoryResponse)
 async def get_session_history(
     session_id: str,
+    limit: int = Query(50, ge=1, le=200, description="페이지 크기"),
+    before: Optional[str] = Query(None, description="이 커서보다 오래된 메시지 조회"),
+    after: Optional[str] = Query(None, description="이 커서보다 최근 메시지 조회"),
     current_user: dict = Depends(get_current_user)
 ):
-    """특정 세션의 대화 히스토리를 조회합니다."""
+    """특정 세션의 대화 히스토리를 커서 기반으로 조회합니다. 커서가 없으면 최근 메시지를 반환합니다."""
     user_id = str(current_user["_id"])
     
     try:
-        # 세션 대화 히스토리 가져오기
-        history = await conversation_manager.get_conversation_history(
-            user_id, limit=50, session_id=session_id
-        )
-        summary = await conversation_manager.get_session_summary(user_id, session_id)
-        
-        return ChatHistoryResponse(
-            history=history,
-            session_active=summary["has_history"],
-            conversation_summary=summary
-        )
+        return await _load_history_page(user_id, session_id, limit, before, after)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"세션 히스토리 조회 오류: {e}")
         return ChatHistoryResponse(
@@ -212,6 +210,18 @@ async def get_session_history(
             conversation_summary={"error": str(e), "has_history": False}
         )
 
+async def _wake_agent_if_sleeping(user_id: str, wait_seconds: float) -> Optional[Dict[str, Any]]:
+    """
+    유휴 정리로 중지된 agent면 다시 띄우고 wait_seconds 동안 준비를 기다립니다.
+    agent가 실행 중이거나 기다리는 동안 준비되면 None, 아니면 재기동 작업 문서를 반환합니다.
+    """
+    if not await agent_activity_store.is_asleep(user_id):
+        return None
+    job = await pod_provisioner.wake(user_id)
+    logger.info(f"유휴 agent 재기동 - 사용자: {user_id}, 작업: {job['job_id']}")
+    job = await pod_provisioner.wait_for_job(user_id, job["job_id"], wait_seconds) or job
+    return None if job["phase"] == PHASE_READY else job
+
 @router.post("/sessions/{session_id}/chat", response_model=ConversationalChatResponse)
 async def session_chat(
     session_id: str,
@@ -225,53 +235,61 @@ async def session_chat(
     try:
         logger.info(f"세션 대화 요청 - 사용자: {user_id}, 세션: {session_id}, 메시지: {message_request.message}")
         
-        # 사용자 정보 조회
-        from crud.nosql import get_user_by_id
-        user = await get_user_by_id(user_id)
-        
-        if not user.get("pod_name"):
+        # 인증 단계에서 조회한 사용자 문서 사용
+        if not current_user.get("pod_name"):
             raise HTTPException(
                 status_code=400, 
                 detail="Pod가 생성되지 않았습니다. 먼저 /pod 엔드포인트를 호출해주세요."
             )
         
-        pod_name = user["pod_name"]
+        pod_name = current_user["pod_name"]
         
-        # 특정 세션의 대화 히스토리 가져오기
-        conversation_history = await conversation_manager.get_conversation_history(
-            user_id, limit=6, session_id=session_id
-        )
+        # 유휴 정리로 중지된 agent면 다시 띄우고, 짧게 기다려도 준비되지 않으면 waking 상태를 반환
+        wake_job = await _wake_agent_if_sleeping(user_id, settings.AGENT_WAKE_WAIT_SECONDS)
+        if wake_job:
+            return ConversationalChatResponse(
+                response="에이전트를 다시 시작하는 중입니다. 잠시 후 다시 시도해주세요.",
+                timestamp=datetime.now(),
+                session_id=session_id,
+                agent_state=STATE_WAKING,
+                provisioning_job_id=wake_job["job_id"]
+            )
+        # MCP 서버 연결이 끝날 때까지 채팅을 보류 (준비 중인 agent에 보내 실패시키지 않음)
+        if not await agent_client.wait_ready(user_id, settings.AGENT_READY_WAIT_SECONDS):
+            logger.info(f"agent 준비 대기 시간 초과 - 사용자: {user_id}, 세션: {session_id}")
+            return ConversationalChatResponse(
+                response="MCP 서버를 준비하는 중입니다. 잠시 후 다시 시도해주세요.",
+                timestamp=datetime.now(),
+                session_id=session_id,
+                agent_state=AGENT_STATE_STARTING
+            )
+        await agent_activity_store.touch(user_id)
         
-        # 세션 정보 가져오기
-        session_summary = await conversation_manager.get_session_summary(user_id, session_id)
+        # 토큰 예산에 맞춘 최근 대화 히스토리와 누적 요약, 세션 정보를 가져오기
+        chat_context = await conversation_manager.build_agent_context(
+            user_id, session_id, query=message_request.message
+        )
+        conversation_history = chat_context["history"]
+        session_summary = chat_context["summary"]
         
         # Agent에 요청
         agent_request = {
             "text": message_request.message,
             "user_id": user_id,
             "conversation_history": conversation_history,
+            "conversation_summary": chat_context["conversation_summary"],
+            "relevant_history": chat_context["relevant_history"],
             "use_conversation_context": True,
             "session_id": session_id
         }
         
         logger.info(f"세션 메시지 처리 - 사용자: {user_id}, 세션: {session_id}, 히스토리: {len(conversation_history)}개")
         
-        cmd = [
-            "kubectl", "exec", pod_name, 
-            "-n", "agent-env", 
-            "-c", "agent", 
-            "--", 
-            "curl", "-s", "-X", "POST", 
-            settings.AGENT_URL,
-            "-H", "Content-Type: application/json",
-            "-d", json.dumps(agent_request, cls=DateTimeEncoder)
-        ]
-        
         try:
-            # 비동기 함수로 kubectl 명령 실행
-            result = await run_kubectl_command(cmd, timeout=60)
-        except asyncio.TimeoutError:
-            logger.error(f"kubectl 명령 타임아웃 - 사용자: {user_id}, 세션: {session_id}")
+            # agent Service로 직접 요청
+            response_data = await agent_client.query(user_id, agent_request, timeout=60)
+        except httpx.TimeoutException:
+            logger.error(f"agent 요청 타임아웃 - 사용자: {user_id}, 세션: {session_id}")
             return ConversationalChatResponse(
                 response="요청 처리 시간이 초과되었습니다. 다시 시도해주세요.",
                 timestamp=datetime.now(),
@@ -279,10 +297,8 @@ async def session_chat(
                 session_name=session_summary.get("session_name", "알 수 없음"),
                 had_context=True
             )
-        
-        if result["returncode"] != 0:
-            logger.error(f"kubectl 명령 실패 - 반환 코드: {result['returncode']}")
-            logger.error(f"오류 내용: {result['stderr']}")
+        except (httpx.HTTPError, json.JSONDecodeError) as e:
+            logger.error(f"agent 요청 실패 - 사용자: {user_id}, Pod: {pod_name}, 오류: {str(e)}")
             return ConversationalChatResponse(
                 response=f"MCP 서버가 현재 준비 중입니다. 잠시 후 다시 시도해주세요.",
                 timestamp=datetime.now(),
@@ -292,85 +308,56 @@ async def session_chat(
             )
         
         # 응답 처리
-        try:
-            if result["stdout"].strip():
-                response_data = json.loads(result["stdout"])
-                bot_response = response_data.get("response", result["stdout"].strip())
-                
-                # 응답에 에러가 포함되어 있는지 확인
-                if "error" in response_data.get("error", "").lower() or "Error" in bot_response:
-                    # 에러 메시지를 요약하기 위해 다시 Agent에 요청
-                    error_summary_request = {
-                        "text": f"""다음 에러 메시지를 사용자에게 친근하고 간결하게 설명해주세요:
+        bot_response = response_data.get("response")
+        if bot_response:
+            # 응답에 에러가 포함되어 있는지 확인
+            if "error" in str(response_data.get("error", "")).lower() or "Error" in bot_response:
+                # 에러 메시지를 요약하기 위해 다시 Agent에 요청
+                error_summary_request = {
+                    "text": f"""다음 에러 메시지를 사용자에게 친근하고 간결하게 설명해주세요:
 
-                            에러 메시지: {bot_response}
+                        에러 메시지: {bot_response}
 
-                            요구사항:
-                            1. '문제 상황:', '해결 방법:' 같은 반복적인 라벨은 사용하지 말고 자연스럽게 설명하세요
-                            2. 최대 2문장으로 요약하세요
-                            3. 예시: "필요한 자료를 찾을 수 없어 작업을 진행할 수 없습니다. 저장소 이름이나 경로가 정확한지 다시 확인하고, 올바른 경로나 이름을 입력해 주세요."
-                            """,
-                        "user_id": user_id,
-                        "conversation_history": [],
-                        "use_conversation_context": False,
-                        "is_error_summary": True
-                    }
-                    
-                    # 에러 요약 요청
-                    error_cmd = [
-                        "kubectl", "exec", pod_name, 
-                        "-n", "agent-env", 
-                        "-c", "agent", 
-                        "--", 
-                        "curl", "-s", "-X", "POST", 
-                        settings.AGENT_URL,
-                        "-H", "Content-Type: application/json",
-                        "-d", json.dumps(error_summary_request, cls=DateTimeEncoder)
-                    ]
-                    
-                    try:
-                        error_result = await run_kubectl_command(error_cmd, timeout=30)
-                        if error_result["returncode"] == 0 and error_result["stdout"].strip():
-                            error_response_data = json.loads(error_result["stdout"])
-                            summarized_error = error_response_data.get("response", bot_response)
-                            logger.info(f"에러 메시지 요약 완료: user_id={user_id}")
-                            bot_response = summarized_error
-                        else:
-                            logger.warning(f"에러 요약 실패, 원본 메시지 사용: user_id={user_id}")
-                    except Exception as e:
-                        logger.warning(f"에러 요약 중 오류, 원본 메시지 사용: {str(e)}")
-                        
-            else:
-                logger.warning(f"빈 응답 - 사용자: {user_id}, 세션: {session_id}")
-                bot_response = "죄송합니다. 응답을 생성할 수 없었습니다. 다시 시도해 주세요."
-        except json.JSONDecodeError as e:
-            logger.error(f"JSON 파싱 오류: {e}")
-            logger.error(f"원본 응답: {result['stdout']}")
-            bot_response = "Agent 응답을 파싱할 수 없습니다."
+                        요구사항:
+                        1. '문제 상황:', '해결 방법:' 같은 반복적인 라벨은 사용하지 말고 자연스럽게 설명하세요
+                        2. 최대 2문장으로 요약하세요
+                        3. 예시: "필요한 자료를 찾을 수 없어 작업을 진행할 수 없습니다. 저장소 이름이나 경로가 정확한지 다시 확인하고, 올바른 경로나 이름을 입력해 주세요."
+                        """,
+                    "user_id": user_id,
+                    "conversation_history": [],
+                    "use_conversation_context": False,
+                    "is_error_summary": True
+                }
+                
+                # 에러 요약 요청
+                try:
+                    error_response_data = await agent_client.query(user_id, error_summary_request, timeout=30)
+                    bot_response = error_response_data.get("response", bot_response)
+                    logger.info(f"에러 메시지 요약 완료: user_id={user_id}")
+                except Exception as e:
+                    logger.warning(f"에러 요약 중 오류, 원본 메시지 사용: {str(e)}")
+        else:
+            logger.warning(f"빈 응답 - 사용자: {user_id}, 세션: {session_id}")
+            bot_response = "죄송합니다. 응답을 생성할 수 없었습니다. 다시 시도해 주세요."
         
-        # 세션에 대화 저장
+        # 세션에 대화 저장 (갱신된 세션 요약을 함께 반환)
+        updated_summary = session_summary
         if bot_response is not None:
             try:
                 logger.info(f"세션 대화 저장 - 사용자: {user_id}, 세션: {session_id}")
                 
-                await conversation_manager.add_message(
+                updated_summary = await conversation_manager.enqueue_message(
                     user_id=user_id,
+                    session_id=session_id,
                     user_message=message_request.message,
                     assistant_response=bot_response,
-                    session_id=session_id
+                    base_summary=session_summary
                 )
                 
                 logger.info(f"세션 대화 저장 성공 - 사용자: {user_id}, 세션: {session_id}")
             except Exception as save_error:
                 logger.error(f"세션 대화 저장 오류 - 사용자: {user_id}, 세션: {session_id}, 오류: {str(save_error)}")
         
-        # 업데이트된 세션 요약 정보 가져오기
-        try:
-            updated_summary = await conversation_manager.get_session_summary(user_id, session_id)
-        except Exception as summary_error:
-            logger.error(f"세션 요약 조회 오류: {summary_error}")
-            updated_summary = session_summary
-        
         return ConversationalChatResponse(
             response=bot_response if bot_response is not None else "알 수 없는 오류가 발생했습니다.",
             timestamp=datetime.now(),
@@ -400,34 +387,212 @@ async def session_chat(
             had_context=False
         )
 
+def _sse_event(event: str, data: Dict[str, Any]) -> str:
+    """SSE 형식의 이벤트 문자열을 만듭니다."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, cls=DateTimeEncoder)}\n\n"
+
+@router.post("/sessions/{session_id}/chat/stream")
+async def session_chat_stream(
+    session_id: str,
+    message_request: MessageRequest,
+    current_user: dict = Depends(get_current_user)
+):
+    """특정 세션에서 대화를 진행하고 Agent 응답을 SSE로 스트리밍합니다."""
+    user_id = str(current_user["_id"])
+    
+    logger.info(f"세션 스트리밍 대화 요청 - 사용자: {user_id}, 세션: {session_id}, 메시지: {message_request.message}")
+    
+    # 인증 단계에서 조회한 사용자 문서 사용
+    if not current_user.get("pod_name"):
+        raise HTTPException(
+            status_code=400, 
+            detail="Pod가 생성되지 않았습니다. 먼저 /pod 엔드포인트를 호출해주세요."
+        )
+    
+    # 토큰 예산에 맞춘 최근 대화 히스토리와 누적 요약 가져오기
+    chat_context = await conversation_manager.build_agent_context(
+        user_id, session_id, query=message_request.message
+    )
+    conversation_history = chat_context["history"]
+    
+    agent_request = {
+        "text": message_request.message,
+        "user_id": user_id,
+        "conversation_history": conversation_history,
+        "conversation_summary": chat_context["conversation_summary"],
+        "relevant_history": chat_context["relevant_history"],
+        "use_conversation_context": True,
+        "session_id": session_id
+    }
+    
+    async def event_generator():
+        # 스트리밍 중 받은 텍스트 조각으로 최종 메시지를 조립
+        chunks: List[str] = []
+        bot_response = None
+        
+        # 유휴 정리로 중지된 agent면 waking 이벤트를 보내고 준비될 때까지 기다린 뒤 이어서 처리
+        if await agent_activity_store.is_asleep(user_id):
+            wake_job = await pod_provisioner.wake(user_id)
+            yield _sse_event("waking", {"job_id": wake_job["job_id"], "phase": wake_job["phase"]})
+            wake_job = await pod_provisioner.wait_for_job(
+                user_id, wake_job["job_id"], settings.POD_DEPLOY_TIMEOUT + settings.POD_READY_TIMEOUT
+            ) or wake_job
+            if wake_job["phase"] != PHASE_READY:
+                yield _sse_event("error", {"message": "에이전트를 다시 시작하지 못했습니다. 잠시 후 다시 시도해주세요."})
+                return
+        # MCP 서버 연결 중이면 starting 이벤트를 보내고 준비될 때까지 보류
+        if not await agent_client.wait_ready(user_id, 0):
+            yield _sse_event(AGENT_STATE_STARTING, {"message": "MCP 서버를 준비하는 중입니다."})
+            if not await agent_client.wait_ready(user_id, settings.AGENT_READY_WAIT_SECONDS):
+                yield _sse_event("error", {"message": "MCP 서버가 현재 준비 중입니다. 잠시 후 다시 시도해주세요."})
+                return
+        await agent_activity_store.touch(user_id)
+        
+        try:
+            async for event in agent_client.stream(user_id, agent_request, timeout=60):
+                event_type = event.get("type")
+                if event_type == "delta":
+                    chunks.append(event.get("text", ""))
+                    yield _sse_event("delta", {"text": event.get("text", "")})
+                elif event_type in ("tool_call", "tool_output"):
+                    yield _sse_event(event_type, event)
+                elif event_type == "done":
+                    bot_response = event.get("response") or "".join(chunks)
+                elif event_type == "error":
+                    logger.error(f"agent 스트림 오류 - 사용자: {user_id}, 세션: {session_id}, 오류: {event.get('message')}")
+                    yield _sse_event("error", {"message": "응답 생성 중 오류가 발생했습니다. 다시 시도해주세요."})
+                    return
+        except httpx.TimeoutException:
+            logger.error(f"agent 스트림 타임아웃 - 사용자: {user_id}, 세션: {session_id}")
+            yield _sse_event("error", {"message": "요청 처리 시간이 초과되었습니다. 다시 시도해주세요."})
+            return
+        except (httpx.HTTPError, json.JSONDecodeError) as e:
+            logger.error(f"agent 스트림 실패 - 사용자: {user_id}, 세션: {session_id}, 오류: {str(e)}")
+            yield _sse_event("error", {"message": "MCP 서버가 현재 준비 중입니다. 잠시 후 다시 시도해주세요."})
+            return
+        
+        if bot_response is None:
+            # done 이벤트 없이 스트림이 끝난 경우 받은 조각까지만 사용
+            bot_response = "".join(chunks) or "죄송합니다. 응답을 생성할 수 없었습니다. 다시 시도해 주세요."
+        
+        # 세션에 대화 저장 (갱신된 세션 요약을 함께 반환)
+        try:
+            updated_summary = await conversation_manager.enqueue_message(
+                user_id=user_id,
+                session_id=session_id,
+                user_message=message_request.message,
+                assistant_response=bot_response,
+                base_summary=chat_context["summary"]
+            )
+            logger.info(f"세션 스트리밍 대화 저장 성공 - 사용자: {user_id}, 세션: {session_id}")
+        except Exception as save_error:
+            logger.error(f"세션 스트리밍 대화 저장 오류 - 사용자: {user_id}, 세션: {session_id}, 오류: {str(save_error)}")
+            updated_summary = chat_context["summary"]
+        
+        yield _sse_event("done", {
+            "response": bot_response,
+            "timestamp": datetime.now(),
+            "session_id": session_id,
+            "session_name": updated_summary.get("session_name", "알 수 없음"),
+            "conversation_count": updated_summary.get("total_messages", 0),
+            "had_context": True
+        })
+    
+    return StreamingResponse(
+        event_generator(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            # nginx 프록시 버퍼링 비활성화
+            "X-Accel-Buffering": "no"
+        }
+    )
+
 # 기존 엔드포인트들
 @router.post("/pod")
 async def create_pod(current_user: dict = Depends(get_current_user)):
+    """Pod 생성 작업을 등록하고 작업 티켓을 바로 반환합니다. 진행 상황은 GET /pod/status로 확인합니다."""
     user_id = str(current_user["_id"])
     
-    # Pod 생성 함수 호출
-    from core.create_pod import create_pod as c_create_pod
     try:
-        pod_result = await c_create_pod(user_id)
-        
-        if pod_result.get("success", False):
-            logger.info(f"Pod 생성 성공 - 사용자: {user_id}, Pod: {pod_result.get('pod_name')}")
-        else:
-            logger.warning(f"Pod 생성 실패 - 사용자: {user_id}, 오류: {pod_result.get('message')}")
-        
+        job = await pod_provisioner.submit(user_id)
         return {
             "success": True,
-            "message": pod_result["message"]
+            "message": job["message"],
+            "job_id": job["job_id"],
+            "phase": job["phase"]
         }
     
     except Exception as e:
-        logger.error(f"Pod 생성 중 예외 발생 - 사용자: {user_id}, 오류: {str(e)}")
+        logger.error(f"Pod 생성 작업 등록 중 예외 발생 - 사용자: {user_id}, 오류: {str(e)}")
         return {
             "success": False,
             "message": f"Pod 생성 중 오류 발생: {str(e)}",
             "pod_name": None
         }
 
+def _pod_job_response(job: Dict[str, Any]) -> Dict[str, Any]:
+    """프로비저닝 작업 문서를 응답 형식으로 변환합니다."""
+    return {
+        "job_id": job["job_id"],
+        "phase": job["phase"],
+        "message": job.get("message"),
+        "pod_name": job.get("pod_name"),
+        "created_at": job.get("created_at"),
+        "updated_at": job.get("updated_at")
+    }
+
+async def _find_pod_job(user_id: str, job_id: Optional[str]) -> Dict[str, Any]:
+    job = await (pod_job_store.get(user_id, job_id) if job_id else pod_job_store.get_latest(user_id))
+    if not job:
+        raise HTTPException(status_code=404, detail="Pod 생성 작업을 찾을 수 없습니다.")
+    return job
+
+@router.get("/pod/status")
+async def get_pod_status(
+    job_id: Optional[str] = Query(None, description="작업 ID (없으면 가장 최근 작업)"),
+    current_user: dict = Depends(get_current_user)
+):
+    """Pod 프로비저닝 작업의 현재 단계를 반환합니다."""
+    user_id = str(current_user["_id"])
+    job = await _find_pod_job(user_id, job_id)
+    return _pod_job_response(job)
+
+@router.get("/pod/status/stream")
+async def stream_pod_status(
+    job_id: Optional[str] = Query(None, description="작업 ID (없으면 가장 최근 작업)"),
+    current_user: dict = Depends(get_current_user)
+):
+    """Pod 프로비저닝 단계가 바뀔 때마다 SSE phase 이벤트를 보내고 ready/failed에서 종료합니다."""
+    user_id = str(current_user["_id"])
+    job = await _find_pod_job(user_id, job_id)
+    
+    async def event_generator():
+        current = job
+        last_phase = None
+        deadline = asyncio.get_running_loop().time() + settings.POD_DEPLOY_TIMEOUT + settings.POD_READY_TIMEOUT
+        while True:
+            if current["phase"] != last_phase:
+                last_phase = current["phase"]
+                yield _sse_event("phase", _pod_job_response(current))
+            if current["phase"] in FINAL_PHASES:
+                return
+            if asyncio.get_running_loop().time() > deadline:
+                yield _sse_event("error", {"message": "Pod 상태 확인 시간이 초과되었습니다."})
+                return
+            # 다른 워커가 실행 중인 작업일 수 있으므로 MongoDB에서 다시 조회
+            await asyncio.sleep(1)
+            current = await pod_job_store.get(user_id, current["job_id"]) or current
+    
+    return StreamingResponse(
+        event_generator(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"
+        }
+    )
+
 @router.post("/chat", response_model=ConversationalChatResponse)
 async def conversational_chat(
     chat_request: ChatRequest,  # ChatRequest 사용 (session_id 포함 가능)
@@ -448,8 +613,13 @@ async def conversational_chat(
     return await session_chat(session_id, message_request, current_user)
 
 @router.get("/chat/history", response_model=ChatHistoryResponse)
-async def get_conversation_history(current_user: dict = Depends(get_current_user)):
-    """기본 세션의 대화 히스토리를 조회합니다."""
+async def get_conversation_history(
+    limit: int = Query(50, ge=1, le=200, description="페이지 크기"),
+    before: Optional[str] = Query(None, description="이 커서보다 오래된 메시지 조회"),
+    after: Optional[str] = Query(None, description="이 커서보다 최근 메시지 조회"),
+    current_user: dict = Depends(get_current_user)
+):
+    """기본 세션의 대화 히스토리를 커서 기반으로 조회합니다."""
     user_id = str(current_user["_id"])
     
     try:
@@ -457,16 +627,9 @@ async def get_conversation_history(current_user: dict = Depends(get_current_user
         default_session = await conversation_manager._get_or_create_default_session(user_id)
         
         # 기본 세션 히스토리 조회
-        history = await conversation_manager.get_conversation_history(
-            user_id, limit=50, session_id=default_session
-        )
-        summary = await conversation_manager.get_session_summary(user_id, default_session)
-        
-        return ChatHistoryResponse(
-            history=history,
-            session_active=summary["has_history"],
-            conversation_summary=summary
-        )
+        return await _load_history_page(user_id, default_session, limit, before, after)
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"대화 히스토리 조회 오류: {e}")
         return ChatHistoryResponse(
@@ -30,7 +30,8 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
     except JWTError:
         raise credentials_exception
     
-    user = await nosql_crud.get_user_by_email(email)
+    # 캐시된 슬림 사용자 레코드 사용 (hashed_password, env_settings 미포함)
+    user = await nosql_crud.get_principal_by_email(email)
     if user is None:
         raise credentials_exception
     
@@ -2,6 +2,7 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from typing import Dict, Any
 from models.mcp_nosql import EnvUpdate
 from routers.nosql_auth import get_current_user
+from core.agent_config_sync import agent_config_sync
 import crud.nosql as nosql_crud
 
 router = APIRouter(
@@ -12,8 +13,11 @@ router = APIRouter(
 
 @router.post("/", response_model=Dict[str, Any])
 async def update_env_variable(env_update: EnvUpdate, current_user: dict = Depends(get_current_user)):
-    """사용자의 MCP 환경 변수를 업데이트합니다."""
-    result = await nosql_crud.update_env_var(str(current_user["_id"]), env_update)
+    """사용자의 MCP 환경 변수를 업데이트합니다. 실행 중인 agent에는 재배포 없이 바로 반영합니다."""
+    user_id = str(current_user["_id"])
+    result = await nosql_crud.update_env_var(user_id, env_update)
+    if result.get("success"):
+        result["agent_sync"] = await agent_config_sync.sync(user_id)
     return result
 
 @router.get("/{public_id}", response_model=Dict[str, Any])
@@ -32,8 +36,9 @@ async def get_all_env_variables(current_user: dict = Depends(get_current_user)):
 
 @router.delete("/{public_id}", response_model=Dict[str, Any])
 async def delete_env_variable(public_id: str, current_user: dict = Depends(get_current_user)):
-    """사용자의 MCP 환경 변수를 삭제합니다."""
-    success = await nosql_crud.delete_env_var(str(current_user["_id"]), public_id)
+    """사용자의 MCP 환경 변수를 삭제합니다. 실행 중인 agent에는 재배포 없이 바로 반영합니다."""
+    user_id = str(current_user["_id"])
+    success = await nosql_crud.delete_env_var(user_id, public_id)
     if not success:
         raise HTTPException(status_code=404, detail="환경 변수를 찾을 수 없습니다.")
-    return {"success": True}
+    return {"success": True, "agent_sync": await agent_config_sync.sync(user_id)}
@@ -1,6 +1,7 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from typing import List, Dict, Any
 from routers.nosql_auth import get_current_user
+from core.agent_config_sync import agent_config_sync
 import crud.nosql as nosql_crud
 
 router = APIRouter(
@@ -11,8 +12,11 @@ router = APIRouter(
 
 @router.post("/{public_id}", response_model=Dict[str, Any])
 async def select_mcp(public_id: str, current_user: dict = Depends(get_current_user)):
-    """사용자가 MCP를 선택합니다."""
-    result = await nosql_crud.select_mcp_for_user(str(current_user["_id"]), public_id)
+    """사용자가 MCP를 선택합니다. 실행 중인 agent에는 재배포 없이 바로 반영합니다."""
+    user_id = str(current_user["_id"])
+    result = await nosql_crud.select_mcp_for_user(user_id, public_id)
+    if result.get("success"):
+        result["agent_sync"] = await agent_config_sync.sync(user_id)
     return result
 
 @router.get("/", response_model=List[Dict[str, Any]])
@@ -29,8 +33,9 @@ async def get_selected_mcps(current_user: dict = Depends(get_current_user)):
 
 @router.delete("/{public_id}", response_model=Dict[str, Any])
 async def deselect_mcp(public_id: str, current_user: dict = Depends(get_current_user)):
-    """사용자의 MCP 선택을 취소합니다."""
-    success = await nosql_crud.deselect_mcp(str(current_user["_id"]), public_id)
+    """사용자의 MCP 선택을 취소합니다. 실행 중인 agent에는 재배포 없이 바로 반영합니다."""
+    user_id = str(current_user["_id"])
+    success = await nosql_crud.deselect_mcp(user_id, public_id)
     if not success:
         raise HTTPException(status_code=404, detail="선택된 MCP를 찾을 수 없습니다.")
-    return {"success": True}
+    return {"success": True, "agent_sync": await agent_config_sync.sync(user_id)}
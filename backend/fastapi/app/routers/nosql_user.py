@@ -61,27 +61,27 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends()):
         expires_delta=access_token_expires
     )
 
-    ##################### Pod 생성 호출 #####################
+    ##################### Pod 생성 작업 등록 #####################
     # 사용자 정보
     user_id = str(user["_id"])
     
-    # Pod 생성 함수 호출
-    from core.create_pod import create_pod
+    # Pod 생성은 백그라운드 작업으로 진행하고 작업 티켓만 반환 (GET /pod/status로 진행 상황 조회)
+    from core.pod_provisioner import pod_provisioner
+    job = None
     try:
-        # user_id만 전달하여 Pod 생성 함수 호출
-        pod_result = await create_pod(user_id)
-        
-        if pod_result.get("success", False):
-            logger.info(f"Pod 생성 성공 - 사용자: {user_id}, Pod: {pod_result.get('pod_name')}")
-        else:
-            logger.warning(f"Pod 생성 실패 - 사용자: {user_id}, 오류: {pod_result.get('message')}")
-    
+        job = await pod_provisioner.submit(user_id)
+        logger.info(f"Pod 프로비저닝 작업 - 사용자: {user_id}, 작업: {job['job_id']}, 단계: {job['phase']}")
     except Exception as e:
         # Pod 생성 오류가 로그인을 방해하지 않도록 예외 처리
-        logger.error(f"Pod 생성 중 예외 발생 - 사용자: {user_id}, 오류: {str(e)}")
-    ##################### Pod 생성 호출 #####################
+        logger.error(f"Pod 프로비저닝 작업 등록 중 예외 발생 - 사용자: {user_id}, 오류: {str(e)}")
+    ##################### Pod 생성 작업 등록 #####################
     
-    return {"access_token": access_token, "token_type": "bearer"}
+    return {
+        "access_token": access_token,
+        "token_type": "bearer",
+        "provisioning_job_id": job["job_id"] if job else None,
+        "provisioning_phase": job["phase"] if job else None
+    }
 
 @router.post("/logout", response_model=Dict[str, Any])
 async def log_out(current_user: dict = Depends(get_current_user)):
@@ -0,0 +1,45 @@
+"""
+core/context_builder.py 토큰 예산 불변식 검사
+
+실행 (backend/fastapi에서):
+    python -m pytest tests
+"""
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "app"))
+
+from bench_context_tokens import make_turn, percentile, simulate
+from core.context_builder import build_context, count_tokens
+
+BUDGET = 3000
+SUMMARY_TOKENS = 600
+MESSAGE_TOKENS = 800
+
+def test_prompt_tokens_stay_within_budget():
+    _, budgeted, summary_sizes, _ = simulate(300, BUDGET, SUMMARY_TOKENS, MESSAGE_TOKENS)
+    assert percentile(budgeted, 0.95) <= BUDGET
+    # 가장 최근 메시지 하나는 예산을 넘어도 잘린 길이로 포함
+    assert max(budgeted) <= BUDGET + 2 * MESSAGE_TOKENS
+    assert max(summary_sizes) <= SUMMARY_TOKENS
+
+def test_summary_state_is_none_when_nothing_left_the_window():
+    rng = random.Random(7)
+    history = [make_turn(i, rng) for i in range(20)]
+    built = build_context(history, 20, None, token_budget=BUDGET,
+                          summary_tokens=SUMMARY_TOKENS, message_tokens=MESSAGE_TOKENS)
+    # 같은 입력으로 다시 구성하면 저장할 변경이 없어야 함
+    again = build_context(history, 20, built["summary_state"], token_budget=BUDGET,
+                          summary_tokens=SUMMARY_TOKENS, message_tokens=MESSAGE_TOKENS)
+    assert again["summary_state"] is None
+    assert again["summary"] == built["summary"]
+
+def test_turns_before_fetch_window_are_marked_as_skipped():
+    history = [{"user": f"질문 {i}", "assistant": "답변 " * 400, "timestamp": None} for i in range(5)]
+    built = build_context(history, 100, None, token_budget=BUDGET,
+                          summary_tokens=SUMMARY_TOKENS, message_tokens=MESSAGE_TOKENS)
+    state = built["summary_state"]
+    assert state["covered_count"] == 100 - len(built["history"])
+    assert "이전 대화 95턴 생략" in built["summary"]
+    assert count_tokens(built["summary"]) <= SUMMARY_TOKENS
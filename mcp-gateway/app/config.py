@@ -0,0 +1,26 @@
+# 공통 설정
+import os
+
+GATEWAY_PORT = 8003                    # gateway 컨테이너(uvicorn) 포트
+
+# 사용자별 자격 증명이 필요 없는 MCP 서버 (agent의 load_mcp_server_config와 같은 실행 명령)
+SHARED_MCP_SERVERS = {
+    "duckduckgo-search": {"command": "duckduckgo-mcp-server", "args": [], "env": {}},
+    "sequentialthinking": {"command": "mcp-server-sequential-thinking", "args": [], "env": {}},
+    "korean-spell-checker": {"command": "mcp-korean-spell", "args": [], "env": {}},
+    "airbnb": {"command": "mcp-server-airbnb", "args": ["--ignore-robots-txt"], "env": {}},
+    "paper-search": {
+        "command": "uv",
+        "args": ["run", "--directory", "/srv/paper-search-mcp", "-m", "paper_search_mcp.server"],
+        "env": {}
+    },
+}
+# 이 레플리카에서 제공할 서버 (쉼표 구분, 비어 있으면 전체)
+GATEWAY_SERVERS = [s.strip() for s in os.getenv("GATEWAY_SERVERS", "").split(",") if s.strip()]
+
+# upstream(stdio MCP 프로세스) 풀
+UPSTREAM_POOL_SIZE = int(os.getenv("UPSTREAM_POOL_SIZE", "2"))                   # 서버당 실행할 프로세스 수 (레플리카별)
+UPSTREAM_MAX_IN_FLIGHT = int(os.getenv("UPSTREAM_MAX_IN_FLIGHT", "16"))          # 프로세스당 동시 호출 수 (초과분은 대기)
+UPSTREAM_CONNECT_TIMEOUT = float(os.getenv("UPSTREAM_CONNECT_TIMEOUT", "60"))    # 프로세스 시작·initialize 대기 시간 (초)
+UPSTREAM_CALL_TIMEOUT = float(os.getenv("UPSTREAM_CALL_TIMEOUT", "120"))         # 도구 호출 하나의 최대 시간 (초)
+UPSTREAM_ACQUIRE_TIMEOUT = float(os.getenv("UPSTREAM_ACQUIRE_TIMEOUT", "30"))    # 사용 가능한 프로세스를 기다리는 시간 (초)
@@ -0,0 +1,82 @@
+import logging
+from contextlib import AsyncExitStack
+from typing import Any, Dict
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+from mcp.server.lowlevel import Server
+from mcp.server.streamable_http_manager import StreamableHTTPSessionManager
+import mcp.types as types
+from app.config import SHARED_MCP_SERVERS, GATEWAY_SERVERS, UPSTREAM_POOL_SIZE
+from app.upstream import UpstreamPool
+
+logger = logging.getLogger(__name__)
+
+class UpstreamToolError(Exception):
+    """upstream 도구가 isError 결과를 반환한 경우 (클라이언트에도 isError로 전달)"""
+    pass
+
+def _build_server(pool: UpstreamPool) -> Server:
+    """upstream 풀로 요청을 전달하는 MCP 서버를 만듭니다."""
+    server = Server(pool.name)
+
+    @server.list_tools()
+    async def list_tools() -> list[types.Tool]:
+        return await pool.list_tools()
+
+    @server.call_tool()
+    async def call_tool(name: str, arguments: Dict[str, Any]):
+        result = await pool.call_tool(name, arguments)
+        if result.isError:
+            raise UpstreamToolError(" ".join(c.text for c in result.content if isinstance(c, types.TextContent)))
+        return result.content
+
+    return server
+
+def _asgi_handler(manager: StreamableHTTPSessionManager):
+    async def handle(scope, receive, send):
+        await manager.handle_request(scope, receive, send)
+    return handle
+
+app = FastAPI()
+
+# 서버별 upstream 풀과 Streamable HTTP 엔드포인트 (/mcp/{서버 이름}/)
+pools: Dict[str, UpstreamPool] = {}
+managers: Dict[str, StreamableHTTPSessionManager] = {}
+for name, params in SHARED_MCP_SERVERS.items():
+    if GATEWAY_SERVERS and name not in GATEWAY_SERVERS:
+        continue
+    pools[name] = UpstreamPool(name, params, UPSTREAM_POOL_SIZE)
+    # 세션 상태를 gateway에 두지 않으므로 어느 레플리카로 요청이 가도 처리 가능 (수평 확장)
+    managers[name] = StreamableHTTPSessionManager(app=_build_server(pools[name]), json_response=True, stateless=True)
+    app.mount(f"/mcp/{name}", _asgi_handler(managers[name]))
+
+_exit_stack = AsyncExitStack()
+
+@app.on_event("startup")
+async def startup_event():
+    for pool in pools.values():
+        pool.start()
+    for manager in managers.values():
+        await _exit_stack.enter_async_context(manager.run())
+    logger.info(f"MCP gateway 시작 - 서버: {list(pools)}, 서버당 프로세스: {UPSTREAM_POOL_SIZE}")
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await _exit_stack.aclose()
+    for pool in pools.values():
+        await pool.stop()
+
+@app.get("/health")
+def health_check():
+    return {"status": "ok"}
+
+@app.get("/ready")
+def readiness_check():
+    """모든 서버에 준비된 프로세스가 하나 이상 있으면 200, 아니면 503."""
+    servers = {name: pool.ready for name, pool in pools.items()}
+    ready = all(servers.values())
+    return JSONResponse(status_code=200 if ready else 503, content={"ready": ready, "servers": servers})
+
+@app.get("/metrics")
+def metrics():
+    return {name: pool.metrics() for name, pool in pools.items()}
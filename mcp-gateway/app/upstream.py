@@ -0,0 +1,200 @@
+import asyncio, logging, time
+from collections import deque
+from typing import Any, Dict, List, Optional
+import anyio
+from mcp import ClientSession, StdioServerParameters, McpError
+from mcp.client.stdio import stdio_client
+from mcp.types import CallToolResult, Tool, CONNECTION_CLOSED
+from app.config import (
+    UPSTREAM_MAX_IN_FLIGHT, UPSTREAM_CONNECT_TIMEOUT, UPSTREAM_CALL_TIMEOUT, UPSTREAM_ACQUIRE_TIMEOUT
+)
+
+logger = logging.getLogger(__name__)
+
+def percentile(values, p: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * p), len(ordered) - 1)] if ordered else 0.0
+
+class UpstreamUnavailable(Exception):
+    """사용할 수 있는 upstream 프로세스가 없는 경우"""
+    pass
+
+class UpstreamSession:
+    """
+    stdio MCP 서버 프로세스 하나와의 세션.
+
+    MCP 세션은 연 태스크에서 닫아야 하므로 전용 태스크가 세션을 소유하며,
+    프로세스가 종료되거나 연결이 끊기면 간격을 늘려 가며 다시 시작합니다.
+    하나의 세션에서 여러 요청을 동시에 보내고 JSON-RPC id로 응답을 구분합니다.
+    """
+
+    def __init__(self, name: str, params: StdioServerParameters):
+        self.name = name
+        self.params = params
+        self.session: Optional[ClientSession] = None
+        self.ready = asyncio.Event()
+        self.in_flight = 0
+        self.restarts = 0
+        self._broken = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def mark_broken(self):
+        self._broken.set()
+
+    async def _run(self):
+        retry_delay = 1
+        while True:
+            try:
+                async with stdio_client(self.params) as (read, write):
+                    async with ClientSession(read, write) as session:
+                        await asyncio.wait_for(session.initialize(), timeout=UPSTREAM_CONNECT_TIMEOUT)
+                        self.session = session
+                        self._broken.clear()
+                        self.ready.set()
+                        retry_delay = 1
+                        await self._broken.wait()
+                logger.warning(f"upstream 연결 끊김, 다시 시작 - {self.name}")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"upstream 시작 실패 - {self.name}, {retry_delay}초 후 재시도: {str(e)}")
+            finally:
+                self.session = None
+                self.ready.clear()
+            self.restarts += 1
+            await asyncio.sleep(retry_delay)
+            retry_delay = min(retry_delay * 2, 30)
+
+def _is_connection_error(e: BaseException) -> bool:
+    if isinstance(e, (anyio.ClosedResourceError, anyio.BrokenResourceError, anyio.EndOfStream)):
+        return True
+    return isinstance(e, McpError) and e.error.code == CONNECTION_CLOSED
+
+class UpstreamPool:
+    """
+    같은 MCP 서버 프로세스 여러 개를 묶은 풀.
+
+    여러 agent의 호출을 진행 중인 호출이 가장 적은 프로세스로 보내고,
+    프로세스당 동시 호출 수를 UPSTREAM_MAX_IN_FLIGHT로 제한합니다 (초과분은 대기).
+    한도는 프로세스마다 따로 적용하므로 일부 프로세스가 재시작 중이어도 남은 프로세스에 한도 이상 몰리지 않습니다.
+    """
+
+    def __init__(self, name: str, params: Dict[str, Any], size: int):
+        self.name = name
+        self.size = size
+        self.sessions = [UpstreamSession(name, StdioServerParameters(**params)) for _ in range(size)]
+        # 호출이 끝나 자리가 난 경우 대기 중인 호출을 깨움
+        self._slot_freed = asyncio.Event()
+        self._tools: Optional[List[Tool]] = None
+        # 메트릭
+        self.calls = 0
+        self.errors = 0
+        self.timeouts = 0
+        self._latency_ms = deque(maxlen=2000)
+
+    def start(self):
+        for upstream in self.sessions:
+            upstream.start()
+
+    async def stop(self):
+        await asyncio.gather(*(upstream.stop() for upstream in self.sessions))
+
+    @property
+    def ready(self) -> bool:
+        return any(upstream.session is not None for upstream in self.sessions)
+
+    async def _acquire(self) -> UpstreamSession:
+        """
+        준비됐고 동시 호출 여유가 있는 프로세스 중 진행 중인 호출이 가장 적은 프로세스의 자리를 잡습니다 (_release로 반환).
+        준비된 프로세스가 없으면 UPSTREAM_ACQUIRE_TIMEOUT까지만 기다리고, 모두 한도에 찬 경우에는 자리가 날 때까지 기다립니다.
+        """
+        deadline = time.monotonic() + UPSTREAM_ACQUIRE_TIMEOUT
+        while True:
+            available = [
+                upstream for upstream in self.sessions
+                if upstream.session is not None and upstream.in_flight < UPSTREAM_MAX_IN_FLIGHT
+            ]
+            if available:
+                upstream = min(available, key=lambda upstream: upstream.in_flight)
+                upstream.in_flight += 1
+                return upstream
+            timeout = None
+            if not self.ready:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    raise UpstreamUnavailable(f"{self.name} MCP 서버를 사용할 수 없습니다.")
+            self._slot_freed.clear()
+            # 이미 준비된 프로세스의 ready 이벤트는 바로 끝나므로 준비되지 않은 프로세스만 기다림
+            waiters = [asyncio.create_task(self._slot_freed.wait())] + [
+                asyncio.create_task(upstream.ready.wait()) for upstream in self.sessions if upstream.session is None
+            ]
+            try:
+                await asyncio.wait(waiters, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                for waiter in waiters:
+                    waiter.cancel()
+
+    def _release(self, upstream: UpstreamSession):
+        upstream.in_flight -= 1
+        self._slot_freed.set()
+
+    async def list_tools(self) -> List[Tool]:
+        # 도구 목록은 프로세스가 달라도 같으므로 처음 한 번만 조회
+        if self._tools is None:
+            upstream = await self._acquire()
+            try:
+                result = await asyncio.wait_for(upstream.session.list_tools(), timeout=UPSTREAM_CALL_TIMEOUT)
+            finally:
+                self._release(upstream)
+            self._tools = result.tools
+        return self._tools
+
+    async def call_tool(self, tool_name: str, arguments: Optional[Dict[str, Any]]) -> CallToolResult:
+        upstream = await self._acquire()
+        started = time.perf_counter()
+        try:
+            result = await asyncio.wait_for(
+                upstream.session.call_tool(tool_name, arguments), timeout=UPSTREAM_CALL_TIMEOUT
+            )
+            self.calls += 1
+            if result.isError:
+                self.errors += 1
+            return result
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise
+        except Exception as e:
+            self.errors += 1
+            if _is_connection_error(e):
+                upstream.mark_broken()
+            raise
+        finally:
+            self._release(upstream)
+            self._latency_ms.append((time.perf_counter() - started) * 1000)
+
+    def metrics(self) -> Dict[str, Any]:
+        latency = list(self._latency_ms)
+        return {
+            "processes": self.size,
+            "ready": sum(1 for upstream in self.sessions if upstream.session is not None),
+            "in_flight": sum(upstream.in_flight for upstream in self.sessions),
+            "restarts": sum(upstream.restarts for upstream in self.sessions),
+            "calls": self.calls,
+            "errors": self.errors,
+            "timeouts": self.timeouts,
+            "latency_ms": {
+                "p50": round(percentile(latency, 0.5), 1),
+                "p95": round(percentile(latency, 0.95), 1),
+                "max": round(max(latency), 1) if latency else 0.0
+            }
+        }
@@ -0,0 +1,118 @@
+"""
+공유 MCP gateway의 절감 효과와 처리량을 측정하는 스크립트
+
+1) 메모리: gateway로 옮긴 MCP 서버를 agent Pod처럼 stdio로 직접 실행해 프로세스 트리의 RSS를 합산합니다.
+   이 값이 gateway를 사용할 때 agent Pod 하나에서 줄어드는 메모리입니다 (MCP 서버 실행 파일이 있는 gateway 이미지 안에서 실행).
+2) 처리량: 동시 agent 수만큼 Streamable HTTP 세션을 열어 지정한 시간 동안 도구를 반복 호출하고,
+   초당 호출 수와 지연 분포, gateway의 /metrics를 출력합니다.
+
+사용법 (mcp-gateway 디렉터리에서 실행):
+    python bench_gateway.py [gateway URL] [동시 agent 수] [측정 시간(초)]
+"""
+import asyncio
+import os
+import sys
+import time
+import httpx
+from mcp import ClientSession, StdioServerParameters
+from mcp.client.stdio import stdio_client
+from mcp.client.streamable_http import streamablehttp_client
+from app.config import SHARED_MCP_SERVERS
+from app.upstream import percentile
+
+# 외부 API를 호출하지 않아 gateway 자체의 처리량을 볼 수 있는 도구
+BENCH_SERVER = "sequentialthinking"
+BENCH_TOOL = "sequentialthinking"
+BENCH_ARGUMENTS = {"thought": "부하 테스트", "thoughtNumber": 1, "totalThoughts": 1, "nextThoughtNeeded": False}
+
+def _descendant_rss_kb(root_pid: int) -> int:
+    """root_pid의 모든 자식 프로세스 RSS 합계(kB)를 /proc에서 계산합니다."""
+    parents = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                parents[int(entry)] = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+    descendants, frontier = set(), [root_pid]
+    while frontier:
+        pid = frontier.pop()
+        children = [child for child, parent in parents.items() if parent == pid]
+        descendants.update(children)
+        frontier.extend(children)
+
+    total = 0
+    for pid in descendants:
+        try:
+            with open(f"/proc/{pid}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        total += int(line.split()[1])
+        except OSError:
+            continue
+    return total
+
+async def measure_memory():
+    print("[메모리] agent Pod 안에서 직접 실행할 때의 MCP 서버별 RSS")
+    total_kb = 0
+    for name, params in SHARED_MCP_SERVERS.items():
+        try:
+            async with stdio_client(StdioServerParameters(**params)) as (read, write):
+                async with ClientSession(read, write) as session:
+                    await asyncio.wait_for(session.initialize(), timeout=60)
+                    tools = await session.list_tools()
+                    rss_kb = _descendant_rss_kb(os.getpid())
+        except Exception as e:
+            print(f"  {name:<24} 실행 실패: {str(e)}")
+            continue
+        total_kb += rss_kb
+        print(f"  {name:<24} {rss_kb / 1024:>8.1f}MB  (도구 {len(tools.tools)}개)")
+    print(f"  Pod당 절감: {total_kb / 1024:.1f}MB (해당 MCP를 모두 선택한 사용자 기준)")
+
+async def measure_throughput(gateway_url: str, agents: int, duration: float):
+    url = f"{gateway_url.rstrip('/')}/mcp/{BENCH_SERVER}/"
+    latencies, errors = [], []
+    deadline = time.monotonic() + duration
+
+    async def agent_loop():
+        # agent Pod 하나가 gateway에 세션 하나를 열고 순차적으로 도구를 호출하는 상황
+        async with streamablehttp_client(url) as (read, write, _):
+            async with ClientSession(read, write) as session:
+                await session.initialize()
+                while time.monotonic() < deadline:
+                    started = time.perf_counter()
+                    try:
+                        result = await session.call_tool(BENCH_TOOL, BENCH_ARGUMENTS)
+                        if result.isError:
+                            errors.append("isError")
+                        latencies.append((time.perf_counter() - started) * 1000)
+                    except Exception as e:
+                        errors.append(str(e))
+
+    print(f"[처리량] {url}, 동시 agent: {agents}, 측정 시간: {duration}초")
+    started = time.perf_counter()
+    results = await asyncio.gather(*(agent_loop() for _ in range(agents)), return_exceptions=True)
+    elapsed = time.perf_counter() - started
+    failed_sessions = [r for r in results if isinstance(r, Exception)]
+
+    print(f"  호출: {len(latencies)}건, 처리량: {len(latencies) / elapsed:.1f}건/초, "
+          f"지연 p50: {percentile(latencies, 0.5):.1f}ms, p95: {percentile(latencies, 0.95):.1f}ms, "
+          f"p99: {percentile(latencies, 0.99):.1f}ms, 오류: {len(errors)}, 세션 실패: {len(failed_sessions)}")
+    if errors or failed_sessions:
+        print(f"  오류 예시: {(errors or [str(failed_sessions[0])])[0]}")
+
+    async with httpx.AsyncClient(timeout=5) as client:
+        response = await client.get(f"{gateway_url.rstrip('/')}/metrics")
+        print(f"  gateway 메트릭 ({BENCH_SERVER}): {response.json().get(BENCH_SERVER)}")
+
+async def main(gateway_url: str, agents: int, duration: float):
+    await measure_memory()
+    await measure_throughput(gateway_url, agents, duration)
+
+if __name__ == "__main__":
+    gateway_url = sys.argv[1] if len(sys.argv) > 1 else "http://localhost:8003"
+    agents = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    duration = float(sys.argv[3]) if len(sys.argv) > 3 else 30.0
+    asyncio.run(main(gateway_url, agents, duration))